@@ -1,4 +1,24 @@
 """MCP Scholar package."""
-from mcp_scholar.server import cli_main
 
-__all__ = ["cli_main"]
\ No newline at end of file
+__all__ = ["cli_main"]
+
+
+def cli_main():
+    """CLI入口点，服务模块在真正启动时才导入，避免导入本包时加载FastMCP"""
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "export":
+        # mcp-scholar export ...：批量导出，不启动STDIO服务
+        from mcp_scholar.export import main as _export_main
+
+        return _export_main(sys.argv[2:])
+
+    if len(sys.argv) > 1 and sys.argv[1] == "refresh":
+        # mcp-scholar refresh ...：刷新本地记录中过期的引用量
+        from mcp_scholar.refresh import main as _refresh_main
+
+        return _refresh_main(sys.argv[2:])
+
+    from mcp_scholar.server import cli_main as _cli_main
+
+    return _cli_main()
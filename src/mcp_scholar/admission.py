@@ -0,0 +1,178 @@
+"""
+准入控制
+限制全局和每个会话同时执行的工具调用数，等待队列有上限，排队超时或队列已满时
+直接拒绝并给出建议的重试时间，避免单个智能体的大量并发调用拖慢所有人
+
+通过环境变量配置:
+    MCP_SCHOLAR_MAX_CONCURRENT_CALLS: 全局最大并发工具调用数，默认32
+    MCP_SCHOLAR_MAX_SESSION_CALLS: 每个会话最大并发工具调用数，默认8
+    MCP_SCHOLAR_ADMISSION_QUEUE: 全局最多排队的调用数，默认64
+    MCP_SCHOLAR_SESSION_QUEUE: 每个会话最多排队的调用数，默认16
+    MCP_SCHOLAR_ADMISSION_TIMEOUT: 排队最长等待时间(秒)，默认10
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+from mcp_scholar import deadline
+from mcp_scholar.config import get_env
+from mcp_scholar.metrics import metrics
+
+
+class ServerBusy(Exception):
+    """调用被准入控制拒绝"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"服务繁忙({reason})，请在{retry_after:.0f}秒后重试")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _SessionSlot:
+    __slots__ = ("semaphore", "waiting", "users")
+
+    def __init__(self, limit: int):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.waiting = 0
+        self.users = 0
+
+
+class AdmissionController:
+    """全局 + 每会话两级并发限制"""
+
+    def __init__(
+        self,
+        max_concurrent: int = 32,
+        max_per_session: int = 8,
+        max_queue: int = 64,
+        max_session_queue: int = 16,
+        queue_timeout: float = 10.0,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_per_session = max_per_session
+        self.max_queue = max_queue
+        self.max_session_queue = max_session_queue
+        self.queue_timeout = queue_timeout
+        self._global = asyncio.Semaphore(max_concurrent)
+        self._sessions: Dict[str, _SessionSlot] = {}
+        self.running = 0
+        self.waiting = 0
+        # 调用耗时的指数滑动平均，用于估算重试时间
+        self._avg_duration = 1.0
+
+    def retry_after(self) -> float:
+        """按当前排队长度和平均耗时估算多久后可能有空位"""
+        backlog = (self.waiting + self.running) / max(1, self.max_concurrent)
+        return round(max(1.0, backlog * self._avg_duration), 1)
+
+    def _reject(self, reason: str) -> ServerBusy:
+        metrics.inc("admission.rejected", reason=reason)
+        return ServerBusy(reason, self.retry_after())
+
+    def _publish(self) -> None:
+        metrics.set_gauge("admission.running", self.running)
+        metrics.set_gauge("admission.queue_depth", self.waiting)
+        metrics.set_gauge("admission.sessions", len(self._sessions))
+
+    async def _acquire(self, slot: _SessionSlot) -> None:
+        # 先占会话名额再占全局名额，排队中的会话不会占住全局名额
+        await slot.semaphore.acquire()
+        try:
+            await self._global.acquire()
+        except BaseException:
+            slot.semaphore.release()
+            raise
+
+    @asynccontextmanager
+    async def admit(self, session_key: str) -> AsyncIterator[None]:
+        """
+        在准入控制下执行一次调用
+
+        Raises:
+            ServerBusy: 队列已满、排队超时或调用的时间预算已经用完
+        """
+        left = deadline.remaining()
+        if left is not None and left <= 0:
+            # 预算已经用完，不再排队占用队列名额
+            raise self._reject("deadline")
+
+        slot = self._sessions.get(session_key)
+        if slot is None:
+            slot = self._sessions[session_key] = _SessionSlot(self.max_per_session)
+
+        must_wait = slot.semaphore.locked() or self._global.locked()
+        if must_wait:
+            if self.waiting >= self.max_queue:
+                self._cleanup(session_key, slot)
+                raise self._reject("queue_full")
+            if slot.waiting >= self.max_session_queue:
+                self._cleanup(session_key, slot)
+                raise self._reject("session_queue_full")
+
+        slot.users += 1
+        slot.waiting += 1
+        self.waiting += 1
+        self._publish()
+        queued_at = time.monotonic()
+        timeout = self.queue_timeout
+        if left is not None:
+            # 排队时间也计入工具调用的时间预算
+            timeout = max(0.0, min(timeout, left))
+        try:
+            await asyncio.wait_for(self._acquire(slot), timeout)
+        except BaseException as e:
+            slot.users -= 1
+            self._cleanup(session_key, slot)
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._reject("timeout")
+            raise
+        finally:
+            slot.waiting -= 1
+            self.waiting -= 1
+            metrics.inc("admission.wait_seconds", time.monotonic() - queued_at)
+            self._publish()
+
+        self.running += 1
+        metrics.inc("admission.admitted")
+        self._publish()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._global.release()
+            slot.semaphore.release()
+            self._avg_duration = 0.8 * self._avg_duration + 0.2 * (
+                time.monotonic() - started
+            )
+            slot.users -= 1
+            self._cleanup(session_key, slot)
+            self._publish()
+
+    def _cleanup(self, session_key: str, slot: _SessionSlot) -> None:
+        if slot.users == 0 and self._sessions.get(session_key) is slot:
+            del self._sessions[session_key]
+
+
+_controller: Optional[AdmissionController] = None
+
+
+def get_controller() -> AdmissionController:
+    """按环境变量惰性创建全局准入控制器"""
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController(
+            max_concurrent=int(get_env("MCP_SCHOLAR_MAX_CONCURRENT_CALLS", "32")),
+            max_per_session=int(get_env("MCP_SCHOLAR_MAX_SESSION_CALLS", "8")),
+            max_queue=int(get_env("MCP_SCHOLAR_ADMISSION_QUEUE", "64")),
+            max_session_queue=int(get_env("MCP_SCHOLAR_SESSION_QUEUE", "16")),
+            queue_timeout=float(get_env("MCP_SCHOLAR_ADMISSION_TIMEOUT", "10")),
+        )
+    return _controller
+
+
+def set_controller(controller: Optional[AdmissionController]) -> None:
+    """替换全局准入控制器，传入None时下次使用会按环境变量重新创建"""
+    global _controller
+    _controller = controller
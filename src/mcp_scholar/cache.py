@@ -0,0 +1,208 @@
+"""
+上游响应缓存
+内存LRU缓存 + 可选的SQLite磁盘缓存，磁盘缓存可以在多个工作进程之间共享
+
+通过环境变量配置:
+    MCP_SCHOLAR_CACHE_TTL: 缓存有效期(秒)，默认3600，0表示关闭缓存
+    MCP_SCHOLAR_CACHE_SIZE: 内存缓存最多保存的响应数，默认1024
+    MCP_SCHOLAR_CACHE_PATH: SQLite缓存文件路径，为空时只使用内存缓存
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+from mcp_scholar.config import get_env
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedResponse:
+    """缓存的HTTP响应"""
+
+    status_code: int
+    content_type: str
+    body: bytes
+    expires_at: float
+
+
+class MemoryCache:
+    """带过期时间的LRU缓存"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at < time.time():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def set(self, key: str, entry: CachedResponse) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SqliteCache:
+    """
+    基于SQLite的磁盘缓存
+
+    使用WAL模式，多个进程可以同时读写同一个文件；每个线程使用独立连接
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, status_code INTEGER, content_type TEXT, "
+            "body BLOB, expires_at REAL)"
+        )
+        conn.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        row = (
+            self._connect()
+            .execute(
+                "SELECT status_code, content_type, body, expires_at "
+                "FROM responses WHERE key = ? AND expires_at >= ?",
+                (key, time.time()),
+            )
+            .fetchone()
+        )
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return CachedResponse(row[0], row[1], row[2], row[3])
+
+    def set(self, key: str, entry: CachedResponse) -> None:
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+            (key, entry.status_code, entry.content_type, entry.body, entry.expires_at),
+        )
+        conn.commit()
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+class ResponseCache:
+    """
+    两级响应缓存
+
+    先查内存，未命中再查磁盘；磁盘读写放到线程中执行，不阻塞事件循环
+    """
+
+    def __init__(
+        self,
+        ttl: float = 3600.0,
+        max_entries: int = 1024,
+        path: Optional[str] = None,
+    ):
+        self.ttl = ttl
+        self.memory = MemoryCache(max_entries)
+        self.disk: Optional[SqliteCache] = None
+        if path:
+            try:
+                self.disk = SqliteCache(path)
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"无法打开磁盘缓存 {path}，只使用内存缓存: {str(e)}")
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        if not self.enabled:
+            return None
+        entry = self.memory.get(key)
+        if entry is None and self.disk is not None:
+            try:
+                entry = await asyncio.to_thread(self.disk.get, key)
+            except sqlite3.Error as e:
+                logger.warning(f"读取磁盘缓存失败: {str(e)}")
+                entry = None
+            if entry is not None:
+                self.memory.set(key, entry)
+        return entry
+
+    async def set(
+        self, key: str, status_code: int, content_type: str, body: bytes
+    ) -> None:
+        if not self.enabled:
+            return
+        entry = CachedResponse(status_code, content_type, body, time.time() + self.ttl)
+        self.memory.set(key, entry)
+        if self.disk is not None:
+            try:
+                await asyncio.to_thread(self.disk.set, key, entry)
+            except sqlite3.Error as e:
+                logger.warning(f"写入磁盘缓存失败: {str(e)}")
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """返回各级缓存的条目数和命中情况"""
+        result = {
+            "memory": {
+                "entries": len(self.memory),
+                "hits": self.memory.hits,
+                "misses": self.memory.misses,
+            }
+        }
+        if self.disk is not None:
+            result["disk"] = {"hits": self.disk.hits, "misses": self.disk.misses}
+        return result
+
+
+_cache: Optional[ResponseCache] = None
+
+
+def get_cache() -> ResponseCache:
+    """按环境变量惰性创建全局响应缓存"""
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache(
+            ttl=float(get_env("MCP_SCHOLAR_CACHE_TTL", "3600")),
+            max_entries=int(get_env("MCP_SCHOLAR_CACHE_SIZE", "1024")),
+            path=get_env("MCP_SCHOLAR_CACHE_PATH").strip() or None,
+        )
+    return _cache
+
+
+def set_cache(cache: Optional[ResponseCache]) -> None:
+    """替换全局响应缓存，传入None时下次使用会按环境变量重新创建"""
+    global _cache
+    _cache = cache
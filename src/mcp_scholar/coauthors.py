@@ -0,0 +1,265 @@
+"""
+合作者网络
+按页流式获取一位作者的全部作品，用作品的 authorships 构建以OpenAlex作者ID为节点、
+合作次数为权重的合作者图，返回合作最多的合作者及其合作年份范围
+
+内存只与合作者数量有关，与作品数量无关：每页作品处理完即丢弃，图中的作者用整数下标表示，
+计数和年份存放在紧凑数组中，合作者之间的边用打包成一个整数的下标对作为键。
+作者很多的大团队论文只计入与目标作者的合作次数，不展开合作者之间的边
+
+结果按作者写入响应缓存（与上游响应共用有效期和磁盘缓存），重复分析同一作者不再请求上游
+
+通过环境变量配置:
+    MCP_SCHOLAR_COAUTHOR_MAX_TEAM: 展开合作者之间的边的论文作者数上限，默认20
+"""
+
+import functools
+import json
+import logging
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from mcp_scholar import deadline, upstream, workers
+from mcp_scholar.cache import get_cache
+from mcp_scholar.config import get_env
+from mcp_scholar.deadline import DeadlineExceeded
+from mcp_scholar.scholar import (
+    OPENALEX_API,
+    _http_get,
+    _mailto,
+    author_filter,
+)
+from mcp_scholar.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 200
+# 只请求构建合作图需要的字段
+SELECT_FIELDS = "id,publication_year,authorships"
+# 缓存中保存的合作者数上限，工具请求的top_n不超过这个值
+CACHED_COLLABORATORS = 200
+_OPENALEX_PREFIX = "https://openalex.org/"
+
+
+def _short_id(value: Optional[str]) -> str:
+    return (value or "").replace(_OPENALEX_PREFIX, "")
+
+
+class CoauthorGraph:
+    """
+    加权合作者图
+
+    每个合作者对应一个整数下标；与目标作者的合作次数、首次和最近合作年份按下标存放在数组中，
+    合作者之间的边以 (小下标 << 32) | 大下标 为键记录合作次数
+    """
+
+    def __init__(self, max_team: int = 20):
+        self.max_team = max_team
+        self.ids: List[str] = []
+        self.names: List[str] = []
+        self._index: Dict[str, int] = {}
+        self.counts = array("I")
+        # 0表示年份未知
+        self.first_year = array("H")
+        self.last_year = array("H")
+        self.edges: Dict[int, int] = {}
+        self.works = 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _node(self, author_id: str, name: str) -> int:
+        index = self._index.get(author_id)
+        if index is None:
+            index = len(self.ids)
+            self._index[author_id] = index
+            self.ids.append(author_id)
+            self.names.append(name)
+            self.counts.append(0)
+            self.first_year.append(0)
+            self.last_year.append(0)
+        return index
+
+    def add_work(
+        self, coauthors: Iterable[Tuple[str, str]], year: Optional[int]
+    ) -> None:
+        """
+        记录一篇作品
+
+        Args:
+            coauthors: 除目标作者外的 (作者ID, 姓名)
+            year: 发表年份，可选
+        """
+        self.works += 1
+        year = year if isinstance(year, int) and 0 < year < 65536 else 0
+        indexes = sorted({self._node(author_id, name) for author_id, name in coauthors})
+        for index in indexes:
+            self.counts[index] += 1
+            if year:
+                if not self.first_year[index] or year < self.first_year[index]:
+                    self.first_year[index] = year
+                self.last_year[index] = max(self.last_year[index], year)
+        if len(indexes) <= self.max_team:
+            for i, low in enumerate(indexes):
+                for high in indexes[i + 1 :]:
+                    key = (low << 32) | high
+                    self.edges[key] = self.edges.get(key, 0) + 1
+
+    def top(self, n: int) -> List[int]:
+        """合作次数最多的n个合作者的下标，次数相同时最近合作的在前"""
+        order = sorted(
+            range(len(self.ids)),
+            key=lambda i: (-self.counts[i], -self.last_year[i], self.ids[i]),
+        )
+        return order[: max(0, n)]
+
+    def summary(self, n: int) -> Dict[str, Any]:
+        """
+        前n个合作者及他们之间的合作边
+
+        Returns:
+            Dict: collaborators 为 {id, name, works, first_year, last_year} 列表，
+                edges 为前n个合作者之间的 [下标, 下标, 次数]，下标对应collaborators中的位置
+        """
+        top = self.top(n)
+        position = {index: i for i, index in enumerate(top)}
+        collaborators = [
+            {
+                "id": self.ids[i],
+                "name": self.names[i],
+                "works": self.counts[i],
+                "first_year": self.first_year[i] or None,
+                "last_year": self.last_year[i] or None,
+            }
+            for i in top
+        ]
+        edges = []
+        for key, weight in self.edges.items():
+            low, high = key >> 32, key & 0xFFFFFFFF
+            if low in position and high in position:
+                edges.append([position[low], position[high], weight])
+        edges.sort(key=lambda edge: (-edge[2], edge[0], edge[1]))
+        return {"collaborators": collaborators, "edges": edges}
+
+
+def _is_target(author: Dict[str, Any], target: str) -> bool:
+    kind, _, value = target.partition(":")
+    if kind == "author.orcid":
+        return (author.get("orcid") or "").endswith(value)
+    return _short_id(author.get("id")) == value
+
+
+def _coauthors(work: Dict[str, Any], target: str) -> List[Tuple[str, str]]:
+    result = []
+    for authorship in work.get("authorships") or []:
+        author = authorship.get("author") or {}
+        author_id = _short_id(author.get("id"))
+        if author_id and not _is_target(author, target):
+            result.append((author_id, author.get("display_name") or ""))
+    return result
+
+
+def _work_coauthors(
+    work: Dict[str, Any], target: str
+) -> Tuple[Optional[int], List[Tuple[str, str]]]:
+    return work.get("publication_year"), _coauthors(work, target)
+
+
+async def build_graph(
+    target: str, max_works: int, max_team: int
+) -> Tuple[CoauthorGraph, bool, bool]:
+    """
+    按cursor逐页获取作者作品并构建合作图
+
+    Args:
+        target: author_filter返回的过滤条件
+        max_works: 最多处理的作品数
+        max_team: 展开合作者之间的边的论文作者数上限
+
+    Returns:
+        Tuple[CoauthorGraph, bool, bool]: 合作图；是否处理完了全部作品（达到max_works或
+            时间预算用完时为False）；是否因时间预算用完而中断（这样的结果不完整，不应缓存）
+    """
+    graph = CoauthorGraph(max_team)
+    url = (
+        f"{OPENALEX_API}/works?filter={target}&select={SELECT_FIELDS}"
+        f"{_mailto('&')}&per_page={PAGE_SIZE}"
+    )
+    cursor: Optional[str] = "*"
+    async with upstream.session(timeout=30.0) as client:
+        while cursor and graph.works < max_works:
+            try:
+                # 每页只读一次，不写入响应缓存；合作图本身会被缓存
+                response = await _http_get(
+                    client,
+                    f"{url}&cursor={cursor}",
+                    "/works?filter={author}&select={coauthors}",
+                    use_cache=False,
+                )
+            except DeadlineExceeded:
+                deadline.mark_partial("coauthors_truncated")
+                return graph, False, True
+            if response.status_code != 200:
+                raise RuntimeError(f"OpenAlex API错误: {response.status_code}")
+            # 大页交给解析工作池，只送回每篇作品的年份和合作者
+            data, results, _ = await workers.get_pool().parse(
+                response.content, functools.partial(_work_coauthors, target=target)
+            )
+            results = results[: max_works - graph.works]
+            for year, coauthors in results:
+                graph.add_work(coauthors, year)
+            cursor = data.get("meta", {}).get("next_cursor") if results else None
+    return graph, cursor is None, False
+
+
+@traced("coauthors.coauthor_network")
+async def coauthor_network(
+    author: str, top_n: int = 20, max_works: int = 5000
+) -> Dict[str, Any]:
+    """
+    分析作者的合作者网络
+
+    Args:
+        author: OpenAlex作者ID、OpenAlex/ORCID/谷歌学术主页URL或谷歌学术ID
+        top_n: 返回的合作者数
+        max_works: 最多处理的作品数
+
+    Returns:
+        Dict: author、works（处理的作品数）、total_coauthors、collaborators、edges，
+            complete表示是否处理完了全部作品（达到max_works时为False，结果仍会缓存）
+
+    Raises:
+        ValueError: 无法解析作者
+        RuntimeError: 上游返回错误
+    """
+    target = await author_filter(author)
+    top_n = max(1, min(top_n, CACHED_COLLABORATORS))
+    key = f"coauthors:{target}:{max_works}"
+    cache = get_cache()
+    cached = await cache.get(key)
+    if cached is not None:
+        result = json.loads(cached.body)
+    else:
+        max_team = int(get_env("MCP_SCHOLAR_COAUTHOR_MAX_TEAM", "20"))
+        graph, complete, expired = await build_graph(target, max_works, max_team)
+        result = {
+            "author": target.partition(":")[2],
+            "works": graph.works,
+            "total_coauthors": len(graph),
+            "complete": complete,
+            **graph.summary(CACHED_COLLABORATORS),
+        }
+        logger.info(
+            f"作者 {result['author']} 的 {graph.works} 篇作品中有 {len(graph)} 位合作者"
+        )
+        # 达到max_works的结果是确定的，可以缓存；时间预算用完时中断的结果不缓存，下次调用重新获取
+        if not expired:
+            await cache.set(
+                key, 200, "application/json", json.dumps(result).encode("utf-8")
+            )
+
+    # 只保留前top_n个合作者之间的边，下标不变
+    result["collaborators"] = result["collaborators"][:top_n]
+    result["edges"] = [
+        edge for edge in result["edges"] if edge[0] < top_n and edge[1] < top_n
+    ]
+    return result
@@ -0,0 +1,142 @@
+"""
+紧凑响应格式
+列表类工具默认每篇论文返回一个字典，键名在每篇论文中重复，空的venue、doi_url和完整摘要
+也会原样返回。论文数较多时这是智能体调用中序列化、传输和模型token的主要开销
+
+format="compact" 时论文列表改为表格编码：
+    {"columns": [...], "rows": [[...], ...], "common": {...}}
+
+- 所有论文都为空的列不输出，个别论文为空的值记为null
+- 所有论文取值相同的列（多于一篇时）移到common中，只输出一次
+- url与paper_id重复（OpenAlex链接）时不输出
+- 摘要按detail级别处理：minimal不返回，summary截取前SUMMARY_CHARS个字符，full返回全文
+
+两种格式的响应都带有estimated_tokens，便于智能体估算上下文预算
+"""
+
+import json
+from typing import Any, Dict, List
+
+FORMATS = ("full", "compact")
+DETAIL_LEVELS = ("minimal", "summary", "full")
+# summary级别保留的摘要字符数
+SUMMARY_CHARS = 300
+_OPENALEX_PREFIX = "https://openalex.org/"
+
+
+def validate(format: str, detail: str) -> None:
+    """
+    Raises:
+        ValueError: 格式或详细程度无效
+    """
+    if format not in FORMATS:
+        raise ValueError(f"不支持的响应格式: {format}，可选: {', '.join(FORMATS)}")
+    if detail not in DETAIL_LEVELS:
+        raise ValueError(
+            f"不支持的详细程度: {detail}，可选: {', '.join(DETAIL_LEVELS)}"
+        )
+
+
+def estimate_tokens(value: Any) -> int:
+    """
+    粗略估算一个JSON值序列化后的token数：ASCII字符约4个一个token，其他字符（中文等）约一个一个token
+
+    Args:
+        value: 可以JSON序列化的值
+
+    Returns:
+        int: 估算的token数
+    """
+    text = json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def _summarize(abstract: str) -> str:
+    if len(abstract) <= SUMMARY_CHARS:
+        return abstract
+    cut = abstract[:SUMMARY_CHARS]
+    # 尽量在单词边界截断
+    space = cut.rfind(" ")
+    if space > SUMMARY_CHARS // 2:
+        cut = cut[:space]
+    return cut.rstrip() + "…"
+
+
+def _empty(value: Any) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+
+def compact_papers(papers: List[Dict[str, Any]], detail: str) -> Dict[str, Any]:
+    """
+    把论文字典列表编码为表格
+
+    Args:
+        papers: 工具原本返回的论文列表
+        detail: 摘要的详细程度，见DETAIL_LEVELS
+
+    Returns:
+        Dict: columns、rows，以及所有论文取值相同的common（没有时不输出）
+    """
+    rows: List[Dict[str, Any]] = []
+    for paper in papers:
+        row = dict(paper)
+        if detail == "minimal":
+            row.pop("abstract", None)
+        elif detail == "summary" and isinstance(row.get("abstract"), str):
+            row["abstract"] = _summarize(row["abstract"])
+        if row.get("url") == f"{_OPENALEX_PREFIX}{row.get('paper_id')}":
+            del row["url"]
+        rows.append(row)
+
+    columns: List[str] = []
+    common: Dict[str, Any] = {}
+    seen = set()
+    for row in rows:
+        for key in row:
+            if key in seen:
+                continue
+            seen.add(key)
+            values = [other.get(key) for other in rows]
+            if all(_empty(value) for value in values):
+                continue
+            if len(rows) > 1 and all(value == values[0] for value in values):
+                common[key] = values[0]
+            else:
+                columns.append(key)
+
+    result: Dict[str, Any] = {
+        "columns": columns,
+        "rows": [
+            [None if _empty(row.get(key)) else row.get(key) for key in columns]
+            for row in rows
+        ],
+    }
+    if common:
+        result["common"] = common
+    return result
+
+
+def shape_response(
+    response: Dict[str, Any],
+    key: str,
+    format: str = "full",
+    detail: str = "summary",
+) -> Dict[str, Any]:
+    """
+    按请求的格式整理列表类工具的响应，并加上estimated_tokens
+
+    Args:
+        response: 工具的成功响应
+        key: 论文列表在响应中的键，如 "papers"、"references"
+        format: "full" 保持原样，"compact" 把论文列表编码为表格
+        detail: compact格式下摘要的详细程度
+
+    Returns:
+        Dict: 整理后的响应
+    """
+    if format == "compact":
+        response[key] = compact_papers(response.get(key) or [], detail)
+        response["format"] = "compact"
+    response["estimated_tokens"] = estimate_tokens(response)
+    return response
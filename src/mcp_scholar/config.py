@@ -0,0 +1,68 @@
+"""
+配置加载
+.env文件在第一次需要配置时才读取，避免在导入阶段访问文件系统
+"""
+
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# 配置默认值
+DEFAULT_EMAIL = "your-email@example.com"
+
+_env_loaded = False
+_env_lock = threading.Lock()
+
+
+# 获取配置文件路径
+def get_env_file() -> Optional[str]:
+    """获取.env文件路径"""
+    # 首先检查当前工作目录
+    if os.path.exists(".env"):
+        return ".env"
+
+    # 检查项目根目录
+    root_dir = Path(__file__).parent.parent.parent
+    env_path = root_dir / ".env"
+    if env_path.exists():
+        return str(env_path)
+
+    return None
+
+
+def load_env() -> None:
+    """加载.env中的环境变量，多次调用只会加载一次"""
+    global _env_loaded
+    if _env_loaded:
+        return
+    with _env_lock:
+        if _env_loaded:
+            return
+        env_file = get_env_file()
+        if env_file:
+            from dotenv import load_dotenv
+
+            load_dotenv(env_file)
+        else:
+            logger.warning("未找到.env文件,使用默认配置")
+        _env_loaded = True
+
+
+def get_env(name: str, default: str = "") -> str:
+    """读取环境变量，必要时先加载.env"""
+    load_env()
+    return os.environ.get(name, default)
+
+
+def debug_enabled() -> bool:
+    """MCP_SCHOLAR_DEBUG为1、true或yes时开启FastMCP和网络服务的调试模式，默认关闭"""
+    return get_env("MCP_SCHOLAR_DEBUG").strip().lower() in ("1", "true", "yes")
+
+
+def get_email() -> str:
+    """从环境变量读取email,如果没有则使用默认值"""
+    return get_env("OPENALEX_EMAIL", DEFAULT_EMAIL)
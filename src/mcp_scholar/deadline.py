@@ -0,0 +1,110 @@
+"""
+调用时间预算
+每次工具调用都有一个截止时间，沿着协程调用链传递到每个上游请求；
+预算不足时跳过可选步骤（摘要补全、模糊搜索回退），并把结果标记为部分结果
+
+通过环境变量配置:
+    MCP_SCHOLAR_TOOL_TIMEOUT: 工具调用未指定timeout_seconds时的默认预算(秒)，默认30
+"""
+
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+from mcp_scholar.config import get_env
+
+# 可选步骤至少需要的剩余时间(秒)，低于此值时跳过
+OPTIONAL_STAGE_MIN_SECONDS = 2.0
+
+# 截止时间（time.monotonic()的绝对值），None表示不限
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "mcp_scholar_deadline", default=None
+)
+# 当前调用被跳过或截断的步骤，由各层代码追加
+_partial: contextvars.ContextVar[Optional[List[str]]] = contextvars.ContextVar(
+    "mcp_scholar_partial", default=None
+)
+
+
+class DeadlineExceeded(Exception):
+    """时间预算已用完"""
+
+
+def default_budget() -> float:
+    return float(get_env("MCP_SCHOLAR_TOOL_TIMEOUT", "30"))
+
+
+@contextmanager
+def budget(seconds: Optional[float] = None) -> Iterator[List[str]]:
+    """
+    在给定时间预算内执行
+
+    嵌套使用时取更早的截止时间。返回的列表收集本次调用中被跳过的步骤
+
+    Args:
+        seconds: 时间预算(秒)，为None时使用默认预算
+    """
+    if seconds is None or seconds <= 0:
+        seconds = default_budget()
+    new_deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        new_deadline = min(new_deadline, current)
+
+    reasons: List[str] = []
+    deadline_token = _deadline.set(new_deadline)
+    partial_token = _partial.set(reasons)
+    try:
+        yield reasons
+    finally:
+        _deadline.reset(deadline_token)
+        _partial.reset(partial_token)
+
+
+def remaining() -> Optional[float]:
+    """剩余时间(秒)，没有预算时返回None"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def clamp_timeout(timeout: float) -> float:
+    """
+    把请求超时限制在剩余预算内
+
+    Raises:
+        DeadlineExceeded: 预算已用完
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("时间预算已用完")
+    return min(timeout, left)
+
+
+def has_time_for_optional_stage(
+    min_seconds: float = OPTIONAL_STAGE_MIN_SECONDS,
+) -> bool:
+    """剩余预算是否足够执行一个可选步骤"""
+    left = remaining()
+    return left is None or left > min_seconds
+
+
+def mark_partial(reason: str) -> None:
+    """记录一个被跳过或截断的步骤，结果将带上partial标记"""
+    reasons = _partial.get()
+    if reasons is not None and reason not in reasons:
+        reasons.append(reason)
+
+
+def is_expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def mark_if_expired(error: BaseException) -> None:
+    """请求因预算用完而失败时，记录deadline_exceeded"""
+    if isinstance(error, DeadlineExceeded) or is_expired():
+        mark_partial("deadline_exceeded")
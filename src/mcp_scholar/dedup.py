@@ -0,0 +1,242 @@
+"""
+近似重复论文合并
+同一篇论文的预印本和正式发表版本在OpenAlex中往往是两条记录。这里对规范化后的标题
+和作者集合计算MinHash签名，用LSH分桶找出候选对，只比较同桶的论文，
+因此几千篇候选论文也不需要两两比较
+
+每组近似重复的论文合并为一条规范记录（优先有DOI的、引用量最高的），
+其余记录的ID保留在alternate_ids中
+
+通过环境变量配置:
+    MCP_SCHOLAR_DEDUP: 是否在搜索和引用列表中合并近似重复论文，默认1
+"""
+
+import hashlib
+import re
+import unicodedata
+import zlib
+from itertools import islice
+from typing import Any, Dict, List, Sequence, Tuple
+from mcp_scholar import ranking
+from mcp_scholar.config import get_env
+
+NUM_PERM = 64
+# 16个band，每个band 4行：估计相似度约0.5以上的论文对大概率落入同一个桶
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERM // LSH_BANDS
+# 签名估计的Jaccard相似度不低于此值才认为是同一篇论文
+DEFAULT_THRESHOLD = 0.7
+# 一个桶内最多比较的次数，避免常见标题形成大桶时退化为两两比较
+_MAX_BUCKET_COMPARISONS = 32
+
+# 哈希函数族 (a*x + b) mod P，x为32位的特征哈希；a、b、x都小于2^32，计算不会超过64位
+_PRIME = (1 << 32) - 5
+_PERMUTATIONS: List[Tuple[int, int]] = [
+    (
+        int.from_bytes(hashlib.blake2b(b"a%d" % i, digest_size=4).digest(), "big")
+        % (_PRIME - 1)
+        + 1,
+        int.from_bytes(hashlib.blake2b(b"b%d" % i, digest_size=4).digest(), "big")
+        % _PRIME,
+    )
+    for i in range(NUM_PERM)
+]
+_WORD_RE = re.compile(r"\w+")
+_PLACEHOLDER_TITLES = {"", "未知标题"}
+
+
+def dedup_enabled() -> bool:
+    return get_env("MCP_SCHOLAR_DEDUP", "1").strip().lower() not in (
+        "0",
+        "false",
+        "no",
+    )
+
+
+def _normalize(text: str) -> List[str]:
+    """转小写、去掉重音符号和标点，返回词列表"""
+    text = text.lower()
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _WORD_RE.findall(text)
+
+
+def shingles(paper: Dict[str, Any]) -> List[str]:
+    """
+    论文的特征集合：标题的单词和相邻词对，加上每位作者的姓
+
+    Returns:
+        List[str]: 特征列表，标题为空或占位标题时返回空列表
+    """
+    title = paper.get("title") or ""
+    if title.strip() in _PLACEHOLDER_TITLES:
+        return []
+    words = _normalize(title)
+    features = set(words)
+    features.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+
+    authors = paper.get("authors") or ""
+    if isinstance(authors, str):
+        authors = authors.split(",")
+    for name in authors:
+        if name.strip().startswith(("…", "+")):
+            # 截断作者列表的省略标记
+            continue
+        parts = _normalize(name)
+        if parts:
+            features.add(f"author:{parts[-1]}")
+    return sorted(features)
+
+
+def _shingle_hashes(features: Sequence[str]) -> List[int]:
+    # crc32在不同进程间结果稳定，不受PYTHONHASHSEED影响
+    return [zlib.crc32(f.encode("utf-8")) for f in features]
+
+
+def minhash_signatures(
+    feature_sets: Sequence[Sequence[str]],
+) -> List[Tuple[int, ...]]:
+    """
+    计算每个特征集合的MinHash签名
+
+    安装了NumPy时所有论文的特征一次性按矩阵计算，否则逐个计算，结果相同
+
+    Returns:
+        List[Tuple[int, ...]]: 每个集合长度为NUM_PERM的签名，空集合的签名为空元组
+    """
+    hashes = [_shingle_hashes(features) for features in feature_sets]
+    np = ranking.optional_numpy()
+    if np is not None and any(hashes):
+        a = np.array([p[0] for p in _PERMUTATIONS], dtype=np.uint64)
+        b = np.array([p[1] for p in _PERMUTATIONS], dtype=np.uint64)
+        flat = np.array([h for row in hashes for h in row], dtype=np.uint64)
+        values = (flat[:, None] * a + b) % np.uint64(_PRIME)
+        lengths = [len(row) for row in hashes]
+        starts = np.cumsum([0] + lengths[:-1])
+        nonempty = [i for i, n in enumerate(lengths) if n]
+        minima = np.minimum.reduceat(values, starts[nonempty], axis=0)
+        signatures: List[Tuple[int, ...]] = [()] * len(hashes)
+        for i, row in zip(nonempty, minima.tolist()):
+            signatures[i] = tuple(row)
+        return signatures
+
+    return [
+        (
+            tuple(min((a * h + b) % _PRIME for h in row) for a, b in _PERMUTATIONS)
+            if row
+            else ()
+        )
+        for row in hashes
+    ]
+
+
+def similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+    """用签名中相同位置的比例估计Jaccard相似度"""
+    if not first or not second:
+        return 0.0
+    return sum(x == y for x, y in zip(first, second)) / len(first)
+
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i: int, j: int) -> None:
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            # 以较早出现的论文为根，保持原有排名
+            self.parent[max(ri, rj)] = min(ri, rj)
+
+
+def cluster(
+    papers: Sequence[Dict[str, Any]], threshold: float = DEFAULT_THRESHOLD
+) -> List[List[int]]:
+    """
+    把近似重复的论文分组
+
+    Args:
+        papers: 论文列表
+        threshold: 签名估计的Jaccard相似度阈值
+
+    Returns:
+        List[List[int]]: 每组论文在papers中的下标，按组内最早出现的位置排序
+    """
+    signatures = minhash_signatures([shingles(paper) for paper in papers])
+    groups = _UnionFind(len(papers))
+
+    buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+    for i, signature in enumerate(signatures):
+        if not signature:
+            continue
+        for start in range(0, NUM_PERM, LSH_ROWS):
+            key = (start, signature[start : start + LSH_ROWS])
+            members = buckets.get(key)
+            if members is None:
+                # 绝大多数桶只有一篇论文，不需要比较
+                buckets[key] = [i]
+                continue
+            root = groups.find(i)
+            for j in islice(members, _MAX_BUCKET_COMPARISONS):
+                if groups.find(j) == root:
+                    break
+                if similarity(signature, signatures[j]) >= threshold:
+                    groups.union(i, j)
+                    break
+            members.append(i)
+
+    clusters: Dict[int, List[int]] = {}
+    for i in range(len(papers)):
+        clusters.setdefault(groups.find(i), []).append(i)
+    return sorted(clusters.values(), key=lambda members: members[0])
+
+
+def _canonical_key(paper: Dict[str, Any]) -> Tuple[bool, int]:
+    citations = paper.get("citations") or 0
+    return bool(paper.get("doi")), citations if isinstance(citations, int) else 0
+
+
+def dedupe_papers(
+    papers: List[Dict[str, Any]], threshold: float = DEFAULT_THRESHOLD
+) -> List[Dict[str, Any]]:
+    """
+    合并近似重复的论文
+
+    每组保留一条规范记录（优先有DOI的，其次引用量最高的），放在该组最早出现的位置；
+    其余记录的paper_id记入alternate_ids
+
+    Args:
+        papers: 论文列表
+        threshold: 签名估计的Jaccard相似度阈值
+
+    Returns:
+        List[Dict]: 合并后的论文列表
+    """
+    if len(papers) < 2:
+        return papers
+
+    results = []
+    for members in cluster(papers, threshold):
+        if len(members) == 1:
+            results.append(papers[members[0]])
+            continue
+        best = max(members, key=lambda i: _canonical_key(papers[i]))
+        canonical = dict(papers[best])
+        alternates = []
+        for i in members:
+            paper_id = papers[i].get("paper_id")
+            if i != best and paper_id and paper_id != canonical.get("paper_id"):
+                alternates.append(paper_id)
+        for i in members:
+            for paper_id in papers[i].get("alternate_ids", []):
+                if paper_id not in alternates:
+                    alternates.append(paper_id)
+        canonical["alternate_ids"] = alternates
+        results.append(canonical)
+    return results
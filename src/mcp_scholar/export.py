@@ -0,0 +1,377 @@
+"""
+批量导出
+把作者全部作品、引用某篇论文的全部文献、搜索结果等大结果集按页流式写入文件，
+供下游分析使用。每页解析后立即写出，同时只在内存中保留一两页数据
+
+支持的格式:
+    jsonl: 每行一个JSON对象（不需要额外依赖）
+    arrow: Arrow IPC文件，每页一个record batch（需要pyarrow）
+    parquet: Parquet文件，每页一个row group（需要pyarrow）
+
+通过环境变量配置:
+    MCP_SCHOLAR_EXPORT_DIR: MCP工具导出文件的目录，默认 ~/.cache/mcp_scholar/exports
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+from mcp_scholar import deadline, upstream, workers
+from mcp_scholar.config import get_env
+from mcp_scholar.deadline import DeadlineExceeded
+from mcp_scholar.scholar import (
+    OPENALEX_API,
+    _http_get,
+    _mailto,
+    _select,
+    author_filter,
+    build_search_url,
+    parse_work,
+)
+from mcp_scholar.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("jsonl", "arrow", "parquet")
+SOURCES = ("search", "author", "citing")
+# OpenAlex单页最多返回的结果数
+PAGE_SIZE = 200
+# 导出的列及其Arrow类型
+COLUMNS = (
+    ("paper_id", "string"),
+    ("title", "string"),
+    ("authors", "string"),
+    ("year", "int64"),
+    ("citations", "int64"),
+    ("venue", "string"),
+    ("doi", "string"),
+    ("url", "string"),
+    ("abstract", "string"),
+)
+_FILE_NAME_RE = re.compile(r"^[\w\-.]{1,128}$")
+
+
+def _row(paper: Dict[str, Any]) -> Dict[str, Any]:
+    """把论文信息转换为固定列的一行，缺失或非数字的年份和引用量记为None"""
+    row = {}
+    for name, kind in COLUMNS:
+        value = paper.get(name)
+        if kind == "int64":
+            value = value if isinstance(value, int) else None
+        elif value is None:
+            value = ""
+        row[name] = value
+    return row
+
+
+def parse_row(work: Dict[str, Any]) -> Dict[str, Any]:
+    """把OpenAlex的work记录解析为导出的一行（模块级函数，可以在解析进程中执行）"""
+    return _row(parse_work(work))
+
+
+class JsonlWriter:
+    def __init__(self, path: str):
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write_batch(self, rows: List[Dict[str, Any]]) -> None:
+        self._file.writelines(
+            json.dumps(row, ensure_ascii=False) + "\n" for row in rows
+        )
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ArrowWriter:
+    """Arrow IPC或Parquet写入器，每次写入一个record batch"""
+
+    def __init__(self, path: str, fmt: str):
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise RuntimeError(
+                f"{fmt}格式需要pyarrow，请安装: pip install 'mcp_scholar[export]'"
+            )
+        self._pa = pa
+        self.schema = pa.schema([(name, getattr(pa, kind)()) for name, kind in COLUMNS])
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+        else:
+            self._writer = pa.ipc.new_file(path, self.schema)
+
+    def write_batch(self, rows: List[Dict[str, Any]]) -> None:
+        batch = self._pa.RecordBatch.from_pylist(rows, schema=self.schema)
+        if hasattr(self._writer, "write_batch"):
+            self._writer.write_batch(batch)
+        else:
+            self._writer.write(batch)
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+def open_writer(path: str, fmt: str) -> Any:
+    """
+    按格式创建写入器
+
+    Raises:
+        ValueError: 不支持的格式
+        RuntimeError: 缺少pyarrow
+    """
+    if fmt == "jsonl":
+        return JsonlWriter(path)
+    if fmt in ("arrow", "parquet"):
+        return ArrowWriter(path, fmt)
+    raise ValueError(f"不支持的导出格式: {fmt}，可选: {', '.join(FORMATS)}")
+
+
+async def source_url(
+    source: str,
+    value: str,
+    fuzzy_search: bool = False,
+    year_start: Optional[int] = None,
+    year_end: Optional[int] = None,
+) -> str:
+    """
+    构建导出来源的第一页URL（不含cursor参数）
+
+    Args:
+        source: "search"（value为关键词）、"author"（value为OpenAlex作者ID、
+            谷歌学术主页URL或ID）、"citing"（value为被引论文的OpenAlex ID）
+        value: 关键词或ID
+        fuzzy_search: 搜索时是否使用模糊搜索
+        year_start: 开始年份，可选
+        year_end: 结束年份，可选
+
+    Raises:
+        ValueError: 来源无效或无法解析作者
+    """
+    if source == "search":
+        return build_search_url(
+            value,
+            PAGE_SIZE,
+            fuzzy_search=fuzzy_search,
+            year_start=year_start,
+            year_end=year_end,
+        )
+
+    filters = []
+    if year_start is not None:
+        filters.append(f"publication_year:>{year_start-1}")
+    if year_end is not None:
+        filters.append(f"publication_year:<{year_end+1}")
+
+    value = value.strip()
+    if source == "author":
+        filters.insert(0, await author_filter(value))
+    elif source == "citing":
+        value = value.replace("https://openalex.org/", "")
+        if not value.startswith("W"):
+            value = f"W{value}"
+        filters.insert(0, f"cites:{value}")
+    else:
+        raise ValueError(f"不支持的导出来源: {source}，可选: {', '.join(SOURCES)}")
+
+    return (
+        f"{OPENALEX_API}/works?filter={','.join(filters)}"
+        f"{_mailto('&')}&per_page={PAGE_SIZE}{_select()}"
+    )
+
+
+async def iter_pages(
+    url: str, max_rows: Optional[int] = None
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    按OpenAlex cursor逐页获取结果，每次产出一页解析后的行
+
+    Args:
+        url: 第一页URL（不含cursor参数）
+        max_rows: 最多获取的行数，为None时取完为止
+    """
+    cursor: Optional[str] = "*"
+    fetched = 0
+    async with upstream.session(timeout=30.0) as client:
+        while cursor and (max_rows is None or fetched < max_rows):
+            # 大结果集的每一页只读一次，不写入响应缓存
+            response = await _http_get(
+                client,
+                f"{url}&cursor={cursor}",
+                "/works?filter={export}",
+                use_cache=False,
+            )
+            if response.status_code != 200:
+                raise RuntimeError(f"OpenAlex API错误: {response.status_code}")
+            # 大页交给解析工作池，写文件和解析都不阻塞事件循环
+            data, rows, _ = await workers.get_pool().parse(response.content, parse_row)
+            if max_rows is not None:
+                rows = rows[: max_rows - fetched]
+            if rows:
+                fetched += len(rows)
+                yield rows
+            cursor = data.get("meta", {}).get("next_cursor") if rows else None
+
+
+@traced("export.export_results")
+async def export_results(
+    source: str,
+    value: str,
+    path: str,
+    fmt: str = "jsonl",
+    max_rows: Optional[int] = None,
+    fuzzy_search: bool = False,
+    year_start: Optional[int] = None,
+    year_end: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    把一个结果集流式导出到文件
+
+    写出上一页的同时请求下一页，内存中最多同时保留两页
+
+    Args:
+        source: 导出来源，见source_url
+        value: 关键词或ID
+        path: 输出文件路径
+        fmt: 输出格式，jsonl / arrow / parquet
+        max_rows: 最多导出的行数，为None时全部导出
+        fuzzy_search: 搜索时是否使用模糊搜索
+        year_start: 开始年份，可选
+        year_end: 结束年份，可选
+
+    Returns:
+        Dict: path、format、rows（行数）、pages（页数）、complete（时间预算内是否导出完整）、
+            bytes（文件大小）、seconds
+    """
+    started = time.monotonic()
+    url = await source_url(
+        source,
+        value,
+        fuzzy_search=fuzzy_search,
+        year_start=year_start,
+        year_end=year_end,
+    )
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+
+    writer = open_writer(path, fmt)
+    rows = 0
+    pages = 0
+    complete = True
+    pending: Optional[asyncio.Future] = None
+    try:
+        # 批量翻页按后台请求调度，不影响同时进行的交互请求
+        with upstream.background():
+            try:
+                async for batch in iter_pages(url, max_rows):
+                    if pending is not None:
+                        await pending
+                    # 写文件（以及Parquet编码）在线程中进行，不阻塞事件循环
+                    pending = asyncio.ensure_future(
+                        asyncio.to_thread(writer.write_batch, batch)
+                    )
+                    rows += len(batch)
+                    pages += 1
+            except DeadlineExceeded:
+                # 已写出的页仍是有效文件，按部分结果返回
+                complete = False
+                deadline.mark_partial("export_truncated")
+        if pending is not None:
+            await pending
+    finally:
+        if pending is not None and not pending.done():
+            await asyncio.gather(pending, return_exceptions=True)
+        await asyncio.to_thread(writer.close)
+
+    return {
+        "path": os.path.abspath(path),
+        "format": fmt,
+        "rows": rows,
+        "pages": pages,
+        "complete": complete,
+        "bytes": os.path.getsize(path),
+        "seconds": round(time.monotonic() - started, 3),
+    }
+
+
+def export_dir() -> str:
+    return get_env("MCP_SCHOLAR_EXPORT_DIR").strip() or os.path.join(
+        os.path.expanduser("~"), ".cache", "mcp_scholar", "exports"
+    )
+
+
+def output_path(source: str, fmt: str, file_name: str = "") -> str:
+    """
+    MCP工具的输出路径：只能写入导出目录，file_name为空时按来源和时间生成
+
+    Raises:
+        ValueError: 文件名包含路径或非法字符
+    """
+    extension = {"jsonl": ".jsonl", "arrow": ".arrow", "parquet": ".parquet"}[fmt]
+    if not file_name:
+        file_name = f"{source}-{time.strftime('%Y%m%d-%H%M%S')}{extension}"
+    elif not _FILE_NAME_RE.match(file_name) or file_name.startswith("."):
+        raise ValueError("文件名只能包含字母、数字和 -_.，不能包含路径")
+    elif not file_name.endswith(extension):
+        file_name += extension
+    return os.path.join(export_dir(), file_name)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    命令行入口: mcp-scholar export <source> <value> -o <path> [--format ...]
+    """
+    from mcp_scholar.logs import configure_logging
+
+    parser = argparse.ArgumentParser(
+        prog="mcp-scholar export", description="把大结果集流式导出到文件"
+    )
+    parser.add_argument("source", choices=SOURCES, help="导出来源")
+    parser.add_argument("value", help="搜索关键词、作者ID/主页URL或被引论文ID")
+    parser.add_argument("-o", "--output", required=True, help="输出文件路径")
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        default=None,
+        help="输出格式，默认按输出文件扩展名推断，无法推断时为jsonl",
+    )
+    parser.add_argument("--max-rows", type=int, default=None, help="最多导出的行数")
+    parser.add_argument("--fuzzy", action="store_true", help="搜索时使用模糊搜索")
+    parser.add_argument("--year-start", type=int, default=None, help="开始年份")
+    parser.add_argument("--year-end", type=int, default=None, help="结束年份")
+    args = parser.parse_args(argv)
+
+    fmt = args.format
+    if fmt is None:
+        extension = os.path.splitext(args.output)[1].lstrip(".").lower()
+        fmt = extension if extension in FORMATS else "jsonl"
+
+    configure_logging()
+
+    async def run() -> Dict[str, Any]:
+        try:
+            return await export_results(
+                args.source,
+                args.value,
+                args.output,
+                fmt=fmt,
+                max_rows=args.max_rows,
+                fuzzy_search=args.fuzzy,
+                year_start=args.year_start,
+                year_end=args.year_end,
+            )
+        finally:
+            await upstream.aclose()
+
+    try:
+        result = asyncio.run(run())
+    except (ValueError, RuntimeError) as e:
+        logger.error(f"导出失败: {str(e)}")
+        return 1
+    # 结果摘要写到stdout，便于脚本读取
+    print(json.dumps(result, ensure_ascii=False))
+    return 0
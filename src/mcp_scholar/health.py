@@ -0,0 +1,252 @@
+"""
+深度健康检查
+汇总服务是否就绪的各项信号：
+
+- 上游探测：后台任务定期向OpenAlex发出一个极小的请求（per_page=1，只取id），
+  记录延迟和结果；健康检查只读取最近一次的结果，本身不发出上游请求。
+  探测按交互请求以独立的会话排队，不会被后台份额饿死；在本地排队时预算用完
+  说明本进程繁忙而不是上游故障，这样的探测不计入失败
+- 上游拥塞状态：自适应并发窗口的当前值，以及最近一次限流/过载/超时信号
+- 响应缓存和本地记录存储的大小与命中率
+- 准入控制和上游调度的排队长度、事件循环延迟
+
+就绪状态:
+    ready: 一切正常
+    degraded: 能提供服务但有问题（最近一次探测失败、上游最近限流、事件循环延迟高、排队过长）
+    unavailable: 连续多次探测失败，上游很可能不可达
+
+通过环境变量配置:
+    MCP_SCHOLAR_HEALTH_PROBE_INTERVAL: 上游探测间隔(秒)，默认60，0表示不探测
+"""
+
+import asyncio
+import contextvars
+import logging
+import time
+import weakref
+from typing import Any, Dict, List, Optional
+import httpx
+from mcp_scholar import admission, deadline, monitor, store, upstream
+from mcp_scholar.cache import get_cache
+from mcp_scholar.config import get_env
+from mcp_scholar.deadline import DeadlineExceeded
+from mcp_scholar.metrics import metrics
+from mcp_scholar.scholar import OPENALEX_API, _mailto
+
+logger = logging.getLogger(__name__)
+
+# 单次探测的超时(秒)
+PROBE_TIMEOUT = 10.0
+# 连续失败多少次视为上游不可用
+UNAVAILABLE_AFTER = 3
+# 最近多少秒内出现过拥塞信号视为上游正在限流
+THROTTLE_WINDOW = 60.0
+# 探测请求排队时使用的会话，与工具调用的会话分开计算公平份额
+PROBE_SESSION = "health-probe"
+
+
+class UpstreamProbe:
+    """定期探测上游的后台任务，结果缓存在内存中"""
+
+    def __init__(self, interval: float = 60.0):
+        self.interval = interval
+        self.latency: Optional[float] = None
+        self.status_code: Optional[int] = None
+        self.error: Optional[str] = None
+        self.checked_at: Optional[float] = None
+        self.last_success: Optional[float] = None
+        self.failures = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, probe_now: bool = False) -> None:
+        """在当前事件循环中启动定期探测"""
+        if self._task is None or self._task.done():
+            loop = asyncio.get_running_loop()
+            # 在空的上下文中创建任务：不继承调用方的时间预算和追踪span
+            self._task = contextvars.Context().run(
+                loop.create_task, self._run(probe_now)
+            )
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self, probe_now: bool) -> None:
+        if not probe_now:
+            await asyncio.sleep(self.interval)
+        while True:
+            await self.probe()
+            await asyncio.sleep(self.interval)
+
+    async def probe(self) -> None:
+        """发出一次探测请求并记录结果"""
+        url = f"{OPENALEX_API}/works?per_page=1&select=id{_mailto('&')}"
+        try:
+            with upstream.caller(PROBE_SESSION), deadline.budget(PROBE_TIMEOUT):
+                response = await upstream.fetch(
+                    url, timeout=PROBE_TIMEOUT, use_cache=False
+                )
+            self.status_code = response.status_code
+            self.error = None if response.status_code == 200 else "bad_status"
+            # 只计算请求发出之后的时间，不含本地排队
+            self.latency = response.extensions["upstream_seconds"]
+        except asyncio.CancelledError:
+            raise
+        except DeadlineExceeded as e:
+            if not isinstance(e.__cause__, httpx.TimeoutException):
+                # 请求没有发出：本地排队等待名额时预算用完，保留上一次的结果
+                metrics.inc("health.probe_skipped")
+                logger.info("上游探测在本地排队时超时，本次不计入失败")
+                return
+            self.status_code = None
+            self.error = f"{type(e).__name__}: {e}"
+            self.latency = None
+        except Exception as e:
+            self.status_code = None
+            self.error = f"{type(e).__name__}: {e}"
+            self.latency = None
+        self.checked_at = time.time()
+        if self.error is None:
+            self.failures = 0
+            self.last_success = self.checked_at
+        else:
+            self.failures += 1
+            metrics.inc("health.probe_failed")
+            logger.warning(f"上游探测失败({self.failures}次): {self.error}")
+        if self.latency is not None:
+            metrics.set_gauge("health.probe_latency_seconds", round(self.latency, 3))
+
+    def stats(self) -> Dict[str, Any]:
+        if self.checked_at is None:
+            return {"checked": False}
+        return {
+            "checked": True,
+            "ok": self.error is None,
+            "latency_ms": (
+                round(self.latency * 1000, 1) if self.latency is not None else None
+            ),
+            "status_code": self.status_code,
+            "error": self.error,
+            "age_seconds": round(time.time() - self.checked_at, 1),
+            "consecutive_failures": self.failures,
+        }
+
+
+_probes: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, UpstreamProbe]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def ensure_started(probe_now: bool = False) -> Optional[UpstreamProbe]:
+    """
+    在当前事件循环中启动上游探测，必须在事件循环中调用
+
+    Args:
+        probe_now: 是否立即探测一次；否则第一次探测在一个间隔之后
+
+    Returns:
+        UpstreamProbe: 当前循环的探测器，关闭探测时返回None
+    """
+    interval = float(get_env("MCP_SCHOLAR_HEALTH_PROBE_INTERVAL", "60"))
+    if interval <= 0:
+        return None
+    loop = asyncio.get_running_loop()
+    probe = _probes.get(loop)
+    if probe is None:
+        probe = _probes[loop] = UpstreamProbe(interval)
+    probe.start(probe_now)
+    return probe
+
+
+def _ratio(hits: int, misses: int) -> Optional[float]:
+    total = hits + misses
+    return round(hits / total, 3) if total else None
+
+
+async def _cache_stats() -> Dict[str, Any]:
+    result: Dict[str, Any] = {}
+    for level, stats in get_cache().stats().items():
+        result[level] = {
+            **stats,
+            "hit_ratio": _ratio(stats["hits"], stats["misses"]),
+        }
+    work_store = store.get_store()
+    if work_store is not None:
+        # 统计需要扫描存储文件，放到线程中执行
+        stats = await asyncio.to_thread(work_store.stats)
+        hits = metrics.counter("store.hits")
+        misses = metrics.counter("store.misses")
+        result["work_store"] = {**stats, "hit_ratio": _ratio(hits, misses)}
+    return result
+
+
+def _upstream_state() -> Dict[str, Any]:
+    scheduler = upstream.get_scheduler()
+    window = scheduler.window
+    state: Dict[str, Any] = {
+        "concurrency_window": window.limit,
+        "max_concurrency": window.maximum,
+        "throttled": False,
+        **{k: v for k, v in scheduler.stats().items() if k != "window"},
+    }
+    if window.last_congestion is not None:
+        signal, at = window.last_congestion
+        ago = time.monotonic() - at
+        state["last_congestion"] = {"signal": signal, "seconds_ago": round(ago, 1)}
+        state["throttled"] = ago < THROTTLE_WINDOW
+    return state
+
+
+async def report() -> Dict[str, Any]:
+    """
+    汇总健康状态，只读取内存中的数据，不发出上游请求，必须在事件循环中调用
+
+    Returns:
+        Dict: status（ready、degraded或unavailable）、reasons、probe、upstream、
+            cache、admission、event_loop
+    """
+    probe = _probes.get(asyncio.get_running_loop())
+    probe_stats = probe.stats() if probe is not None else {"checked": False}
+    controller = admission.get_controller()
+    loop_status = monitor.summary()
+    lag = loop_status.get("event_loop_lag", {})
+
+    upstream_state = _upstream_state()
+    reasons: List[str] = []
+    if probe_stats.get("checked") and not probe_stats["ok"]:
+        reasons.append("upstream_probe_failed")
+    if upstream_state["throttled"]:
+        reasons.append("upstream_throttled")
+    lag_warn = float(get_env("MCP_SCHOLAR_LAG_WARN_MS", "200"))
+    if lag.get("samples") and lag["mean_ms"] >= lag_warn:
+        reasons.append("event_loop_lag")
+    if (
+        controller.running >= controller.max_concurrent
+        and controller.waiting >= controller.max_queue
+    ):
+        # 名额用完且排队已满，新的调用会被拒绝
+        reasons.append("admission_queue_full")
+
+    if probe_stats.get("consecutive_failures", 0) >= UNAVAILABLE_AFTER:
+        status = "unavailable"
+    elif reasons:
+        status = "degraded"
+    else:
+        status = "ready"
+    return {
+        "status": status,
+        "reasons": reasons,
+        "probe": probe_stats,
+        "upstream": upstream_state,
+        "cache": await _cache_stats(),
+        "admission": {
+            "running": controller.running,
+            "queue_depth": controller.waiting,
+            "max_queue": controller.max_queue,
+        },
+        "event_loop": {
+            "lag": lag,
+            "pending_tasks": loop_status.get("pending_tasks"),
+        },
+    }
@@ -0,0 +1,120 @@
+"""
+网络传输模式
+基于Starlette构建SSE / Streamable HTTP应用，由uvicorn以一个或多个工作进程运行
+
+工作进程通过环境变量接收配置（由server.main写入），并通过
+MCP_SCHOLAR_CACHE_PATH（SQLite缓存）和 MCP_SCHOLAR_RATE_LIMIT_FILE（速率预算）
+共享缓存和上游请求预算
+"""
+
+import contextlib
+import logging
+from typing import Any, AsyncIterator
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+from mcp_scholar import health, monitor, upstream
+from mcp_scholar.config import debug_enabled, get_env
+from mcp_scholar.logs import configure_logging
+from mcp_scholar.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+TRANSPORTS = ("sse", "streamable-http")
+
+
+def streamable_http_available() -> bool:
+    """当前安装的mcp版本是否支持Streamable HTTP（mcp>=1.8）"""
+    try:
+        import mcp.server.streamable_http_manager  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _sse_routes(server: Any) -> list:
+    from mcp.server.sse import SseServerTransport
+
+    sse = SseServerTransport("/messages/")
+
+    async def handle_sse(request: Any) -> None:
+        async with sse.connect_sse(
+            request.scope, request.receive, request._send
+        ) as streams:
+            await server.run(
+                streams[0], streams[1], server.create_initialization_options()
+            )
+
+    return [
+        Route("/sse", endpoint=handle_sse),
+        Mount("/messages/", app=sse.handle_post_message),
+    ]
+
+
+def create_app(transport: str = "") -> Starlette:
+    """
+    创建ASGI应用（uvicorn的factory入口）
+
+    Args:
+        transport: "sse" 或 "streamable-http"，为空时读取MCP_SCHOLAR_TRANSPORT
+
+    Returns:
+        Starlette: ASGI应用
+    """
+    configure_logging()
+    from mcp_scholar.server import mcp
+
+    server = mcp._mcp_server
+    transport = transport or get_env("MCP_SCHOLAR_TRANSPORT", "streamable-http")
+    if transport not in TRANSPORTS:
+        raise ValueError(f"不支持的网络传输方式: {transport}")
+
+    session_manager = None
+    if transport == "streamable-http":
+        if not streamable_http_available():
+            raise RuntimeError("Streamable HTTP需要mcp>=1.8，请升级mcp或使用sse")
+        from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+
+        # 无状态模式：每个请求独立处理，不依赖会话所在的进程，可以横向扩展到多个工作进程
+        session_manager = StreamableHTTPSessionManager(app=server, stateless=True)
+
+        async def handle_streamable_http(scope: Any, receive: Any, send: Any) -> None:
+            await session_manager.handle_request(scope, receive, send)
+
+        routes = [Mount("/mcp", app=handle_streamable_http)]
+    else:
+        routes = _sse_routes(server)
+
+    async def handle_metrics(request: Any) -> JSONResponse:
+        return JSONResponse(metrics.snapshot())
+
+    async def handle_health(request: Any) -> JSONResponse:
+        # 上游不可用时返回503，负载均衡器可以把流量转到其他实例
+        report = await health.report()
+        return JSONResponse(
+            report, status_code=503 if report["status"] == "unavailable" else 200
+        )
+
+    async def handle_live(request: Any) -> JSONResponse:
+        return JSONResponse({"status": "alive"})
+
+    routes.append(Route("/metrics", endpoint=handle_metrics))
+    routes.append(Route("/health", endpoint=handle_health))
+    routes.append(Route("/health/live", endpoint=handle_live))
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app: Starlette) -> AsyncIterator[None]:
+        logger.info(f"MCP Scholar网络服务工作进程已启动，传输方式: {transport}")
+        # 启动时立即探测一次上游，/health很快就有探测结果
+        monitor.ensure_started()
+        health.ensure_started(probe_now=True)
+        try:
+            if session_manager is not None:
+                async with session_manager.run():
+                    yield
+            else:
+                yield
+        finally:
+            await upstream.aclose()
+
+    return Starlette(debug=debug_enabled(), routes=routes, lifespan=lifespan)
@@ -0,0 +1,221 @@
+"""
+结构化日志
+日志记录在调用线程中只做最少的工作并放入队列，格式化和写入由后台线程完成，
+不会阻塞事件循环；所有输出都写到stderr或文件，stdout留给STDIO模式的JSON-RPC通道
+
+通过环境变量配置:
+    MCP_SCHOLAR_LOG_LEVEL: 本项目日志级别，默认INFO
+    MCP_SCHOLAR_LOG_THIRD_PARTY_LEVEL: httpx/httpcore/mcp等第三方库日志级别，默认WARNING
+    MCP_SCHOLAR_LOG_FORMAT: "json"(默认，每行一个JSON对象) 或 "text"
+    MCP_SCHOLAR_LOG_FILE: 日志文件路径，为空时写到stderr
+    MCP_SCHOLAR_LOG_RATE_LIMIT: 同一调用位置在一个时间窗口内最多输出的条数，默认20，0表示不限
+    MCP_SCHOLAR_LOG_RATE_WINDOW: 限流时间窗口(秒)，默认10
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from mcp_scholar.config import get_env
+
+# 第三方库的logger，默认只输出WARNING以上，避免每个请求都产生调试日志
+THIRD_PARTY_LOGGERS = ("httpx", "httpcore", "mcp", "uvicorn", "anyio", "asyncio")
+
+# LogRecord的标准属性，其余属性视为通过extra传入的结构化字段
+_RESERVED_ATTRS = frozenset(
+    logging.LogRecord("", 0, "", 0, "", (), None).__dict__.keys()
+) | {"message", "asctime", "suppressed"}
+
+
+class JsonFormatter(logging.Formatter):
+    """把日志记录格式化为单行JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """带有被限流条数的文本格式"""
+
+    def __init__(self) -> None:
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            text += f" (此前{suppressed}条相似日志已被限流)"
+        return text
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    按调用位置限流
+
+    同一 logger+代码行 在一个时间窗口内最多放行limit条，被丢弃的条数会附在
+    下一条放行的记录上，重复的错误不会刷屏，也不会占用队列
+    """
+
+    def __init__(self, limit: int = 20, window: float = 10.0):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self._lock = threading.Lock()
+        # key -> [窗口开始时间, 窗口内已放行条数, 被丢弃条数]
+        self._state: Dict[Tuple[str, int, str], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.limit <= 0:
+            return True
+        key = (record.pathname, record.lineno, record.name)
+        now = time.monotonic()
+        with self._lock:
+            state = self._state.get(key)
+            if state is None or now - state[0] >= self.window:
+                suppressed = state[2] if state else 0
+                self._state[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if state[1] < self.limit:
+                state[1] += 1
+                return True
+            state[2] += 1
+            return False
+
+
+class DeferredFormatQueueHandler(logging.handlers.QueueHandler):
+    """
+    只在调用线程里合并消息参数，完整的格式化（包括异常堆栈）留给后台线程
+
+    标准QueueHandler.prepare会在调用线程中执行format，事件循环上仍有格式化开销
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.Handler] = None
+_lock = threading.Lock()
+
+
+def _level(value: str, default: int) -> int:
+    level = logging.getLevelName(value.strip().upper()) if value else default
+    return level if isinstance(level, int) else default
+
+
+def configure_logging(
+    level: Optional[str] = None, stream: Any = None
+) -> logging.handlers.QueueListener:
+    """
+    配置根logger：队列handler + 后台写入线程
+
+    Args:
+        level: 本项目日志级别，默认读取MCP_SCHOLAR_LOG_LEVEL
+        stream: 输出流，默认读取MCP_SCHOLAR_LOG_FILE，未设置时为stderr
+
+    Returns:
+        QueueListener: 后台写入线程，进程退出时自动停止
+    """
+    global _listener, _queue_handler
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+
+        if stream is None:
+            log_file = get_env("MCP_SCHOLAR_LOG_FILE").strip()
+            if log_file:
+                target: logging.Handler = logging.FileHandler(
+                    log_file, encoding="utf-8"
+                )
+            else:
+                target = logging.StreamHandler(sys.stderr)
+        else:
+            if stream is sys.stdout:
+                raise ValueError("日志不能写到stdout，stdout是JSON-RPC通道")
+            target = logging.StreamHandler(stream)
+
+        if get_env("MCP_SCHOLAR_LOG_FORMAT", "json").strip().lower() == "text":
+            target.setFormatter(TextFormatter())
+        else:
+            target.setFormatter(JsonFormatter())
+
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        queue_handler = DeferredFormatQueueHandler(log_queue)
+        queue_handler.addFilter(
+            RateLimitFilter(
+                limit=int(get_env("MCP_SCHOLAR_LOG_RATE_LIMIT", "20")),
+                window=float(get_env("MCP_SCHOLAR_LOG_RATE_WINDOW", "10")),
+            )
+        )
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        _queue_handler = queue_handler
+        root.setLevel(_level(level or get_env("MCP_SCHOLAR_LOG_LEVEL"), logging.INFO))
+
+        third_party_level = _level(
+            get_env("MCP_SCHOLAR_LOG_THIRD_PARTY_LEVEL"), logging.WARNING
+        )
+        for name in THIRD_PARTY_LOGGERS:
+            logging.getLogger(name).setLevel(third_party_level)
+
+        _listener = logging.handlers.QueueListener(
+            log_queue, target, respect_handler_level=True
+        )
+        _listener.start()
+        return _listener
+
+
+def queue_size() -> int:
+    """等待后台线程写出的日志条数，日志写出跟不上时会持续增长"""
+    listener = _listener
+    if listener is None:
+        return 0
+    try:
+        return listener.queue.qsize()
+    except (AttributeError, NotImplementedError):
+        return 0
+
+
+def shutdown_logging() -> None:
+    """停止后台写入线程，确保队列中的日志都已写出"""
+    global _listener, _queue_handler
+    with _lock:
+        if _queue_handler is not None:
+            logging.getLogger().removeHandler(_queue_handler)
+            _queue_handler = None
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+atexit.register(shutdown_logging)
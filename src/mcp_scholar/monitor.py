@@ -0,0 +1,227 @@
+"""
+运行状态监控
+后台任务按固定间隔采样事件循环和进程的状态，用于判断服务变慢的原因：
+
+- 事件循环延迟：任务每次睡眠后实际醒来的时间比预期晚多少。有同步代码（大响应解析、
+  日志格式化等）长时间占用事件循环时明显升高，超过阈值时输出警告
+- CPU占用：采样间隔内进程CPU时间占墙钟时间的比例，接近100%说明是CPU瓶颈
+- 待处理的asyncio任务数、上游连接池中的连接数：延迟不高但任务堆积、连接用满时，瓶颈在上游等待
+- 内存(RSS)、GC暂停：GC回调累计每一代回收的暂停时间和最长暂停
+- 日志队列长度：日志写出跟不上时持续增长
+
+指标:
+    event_loop.lag: 最近一段时间的延迟统计（last_ms、mean_ms、max_ms、samples）
+    event_loop.stalls: 延迟超过STALL_SECONDS的次数
+    process.resources: 最近一次采样的资源状态
+
+通过环境变量配置:
+    MCP_SCHOLAR_MONITOR_INTERVAL: 采样间隔(秒)，默认0.5，0表示关闭
+    MCP_SCHOLAR_LAG_WARN_MS: 事件循环延迟超过多少毫秒时输出警告，默认200
+"""
+
+import asyncio
+import gc
+import logging
+import os
+import sys
+import time
+import weakref
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+from mcp_scholar import logs, upstream
+from mcp_scholar.config import get_env
+from mcp_scholar.metrics import metrics
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+# 延迟超过该值视为一次停顿
+STALL_SECONDS = 0.1
+# 统计保留的最近样本数
+WINDOW = 120
+
+
+class GcPauses:
+    """
+    通过gc.callbacks累计GC暂停时间
+
+    回调在触发GC的线程中同步执行，这里只更新普通属性，不获取任何锁
+    （GC可能在持有指标锁的代码中触发）
+    """
+
+    def __init__(self) -> None:
+        self.collections = [0, 0, 0]
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self._started: Optional[float] = None
+
+    def callback(self, phase: str, info: Dict[str, Any]) -> None:
+        if phase == "start":
+            self._started = time.perf_counter()
+        elif self._started is not None:
+            pause = time.perf_counter() - self._started
+            self._started = None
+            generation = info.get("generation", 0)
+            if 0 <= generation < len(self.collections):
+                self.collections[generation] += 1
+            self.total_seconds += pause
+            self.max_seconds = max(self.max_seconds, pause)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "collections": list(self.collections),
+            "total_ms": round(self.total_seconds * 1000, 2),
+            "max_ms": round(self.max_seconds * 1000, 2),
+        }
+
+
+gc_pauses = GcPauses()
+
+
+def _install_gc_callback() -> None:
+    if gc_pauses.callback not in gc.callbacks:
+        gc.callbacks.append(gc_pauses.callback)
+
+
+def rss_bytes() -> Optional[int]:
+    """当前进程的常驻内存；Linux读取/proc，其他系统退回到峰值常驻内存，取不到时返回None"""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS以字节为单位，Linux以KB为单位
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Monitor:
+    """按固定间隔采样一个事件循环和进程的状态"""
+
+    def __init__(self, interval: float = 0.5, lag_warn: float = 0.2):
+        self.interval = interval
+        self.lag_warn = lag_warn
+        self.samples: Deque[float] = deque(maxlen=WINDOW)
+        self.resources: Dict[str, Any] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._cpu: Optional[List[float]] = None
+
+    def start(self) -> None:
+        """在当前事件循环中启动监控任务"""
+        if self._task is None or self._task.done():
+            _install_gc_callback()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def record(self, lag: float) -> None:
+        lag = max(0.0, lag)
+        self.samples.append(lag)
+        if lag >= STALL_SECONDS:
+            metrics.inc("event_loop.stalls")
+        if lag >= self.lag_warn:
+            logger.warning(
+                f"事件循环延迟 {lag * 1000:.0f}ms",
+                extra={"pending_tasks": self.resources.get("pending_tasks")},
+            )
+
+    def sample(self) -> Dict[str, Any]:
+        """采样一次进程和事件循环的资源状态，必须在事件循环中调用"""
+        now = [time.monotonic(), time.process_time()]
+        cpu_percent = None
+        if self._cpu is not None and now[0] > self._cpu[0]:
+            cpu_percent = round(
+                (now[1] - self._cpu[1]) / (now[0] - self._cpu[0]) * 100, 1
+            )
+        self._cpu = now
+        try:
+            connections = upstream.connection_stats()
+        except Exception:
+            connections = {}
+        self.resources = {
+            "pending_tasks": len(asyncio.all_tasks()),
+            "upstream_connections": connections,
+            "rss_bytes": rss_bytes(),
+            "cpu_percent": cpu_percent,
+            "gc": gc_pauses.stats(),
+            "log_queue": logs.queue_size(),
+        }
+        return self.resources
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.sample()
+            self.record(loop.time() - expected)
+
+    def stats(self) -> Dict[str, Any]:
+        samples = list(self.samples)
+        if not samples:
+            return {"samples": 0}
+        return {
+            "samples": len(samples),
+            "last_ms": round(samples[-1] * 1000, 2),
+            "mean_ms": round(sum(samples) / len(samples) * 1000, 2),
+            "max_ms": round(max(samples) * 1000, 2),
+        }
+
+
+# 每个事件循环一个监控器（测试中每次asyncio.run都是新的循环）
+_monitors: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Monitor]" = (
+    weakref.WeakKeyDictionary()
+)
+_latest: Optional[Monitor] = None
+
+
+def ensure_started() -> Optional[Monitor]:
+    """
+    在当前事件循环中启动监控（已启动或已关闭时什么也不做），必须在事件循环中调用
+
+    Returns:
+        Monitor: 当前循环的监控器，关闭监控时返回None
+    """
+    global _latest
+    interval = float(get_env("MCP_SCHOLAR_MONITOR_INTERVAL", "0.5"))
+    if interval <= 0:
+        return None
+    loop = asyncio.get_running_loop()
+    monitor = _monitors.get(loop)
+    if monitor is None:
+        monitor = Monitor(
+            interval, float(get_env("MCP_SCHOLAR_LAG_WARN_MS", "200")) / 1000
+        )
+        _monitors[loop] = monitor
+        metrics.register_gauge("event_loop.lag", _lag_stats)
+        metrics.register_gauge("process.resources", _resources)
+    monitor.start()
+    _latest = monitor
+    return monitor
+
+
+def _lag_stats() -> Dict[str, Any]:
+    return _latest.stats() if _latest is not None else {"samples": 0}
+
+
+def _resources() -> Dict[str, Any]:
+    return _latest.resources if _latest is not None else {}
+
+
+def summary() -> Dict[str, Any]:
+    """当前的事件循环延迟统计和最近一次资源采样，供health_check使用"""
+    if _latest is None:
+        return {}
+    if not _latest.resources:
+        # 刚启动还没有采样过
+        _latest.sample()
+    return {"event_loop_lag": _latest.stats(), **_latest.resources}
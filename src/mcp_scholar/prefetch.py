@@ -0,0 +1,144 @@
+"""
+后续查询预取
+列表类工具（搜索、引用列表）返回后，调用方几乎总会接着查看排名靠前的某篇论文的详情
+或引用列表。开启预取后，在后台为前K篇论文请求详情（可选再请求引用列表第一页），
+结果进入响应缓存，后续调用直接命中缓存
+
+预取请求按后台请求处理，只使用速率预算中的后台份额（见MCP_SCHOLAR_BACKGROUND_RATE_SHARE），
+并且不受触发它的工具调用的时间预算和取消影响
+
+通过环境变量配置:
+    MCP_SCHOLAR_PREFETCH: 是否开启预取，默认0
+    MCP_SCHOLAR_PREFETCH_TOP_K: 每次列表结果预取的论文数，默认3
+    MCP_SCHOLAR_PREFETCH_REFERENCES: 是否同时预取引用列表第一页，默认0
+    MCP_SCHOLAR_PREFETCH_CONCURRENCY: 同时进行的预取数，默认2
+"""
+
+import asyncio
+import contextvars
+import logging
+from typing import Iterable, Optional, Set
+from mcp_scholar import deadline, upstream
+from mcp_scholar.config import get_env
+from mcp_scholar.metrics import metrics
+from mcp_scholar.scholar import get_paper_detail, get_paper_references
+
+logger = logging.getLogger(__name__)
+
+# 排队等待的预取上限，超出时丢弃新的预取
+MAX_PENDING = 32
+# 单个预取的时间预算(秒)
+PREFETCH_TIMEOUT = 30.0
+
+
+def _flag(name: str, default: str) -> bool:
+    return get_env(name, default).strip().lower() not in ("", "0", "false", "no")
+
+
+def prefetch_enabled() -> bool:
+    return _flag("MCP_SCHOLAR_PREFETCH", "0")
+
+
+class Prefetcher:
+    """
+    后台预取任务的集合
+
+    同一篇论文在预取完成前只会排队一次；任务数超过上限时丢弃新的预取，
+    保证预取不会无限堆积
+    """
+
+    def __init__(self, concurrency: int = 2, references: bool = False):
+        self.references = references
+        self._concurrency = max(1, concurrency)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._pending_ids: Set[str] = set()
+
+    def schedule(self, paper_ids: Iterable[str]) -> int:
+        """
+        为一组论文安排预取，必须在事件循环中调用
+
+        Returns:
+            int: 实际安排的预取数
+        """
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+        scheduled = 0
+        for paper_id in paper_ids:
+            if not paper_id or paper_id in self._pending_ids:
+                continue
+            if len(self._tasks) >= MAX_PENDING:
+                metrics.inc("prefetch.dropped")
+                break
+            self._pending_ids.add(paper_id)
+            # 在空的上下文中创建任务：不继承调用方的时间预算、部分结果标记和追踪span
+            task = contextvars.Context().run(loop.create_task, self._run(paper_id))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            scheduled += 1
+        if scheduled:
+            metrics.inc("prefetch.scheduled", scheduled)
+        return scheduled
+
+    async def _run(self, paper_id: str) -> None:
+        try:
+            async with self._semaphore:
+                with upstream.background(), deadline.budget(PREFETCH_TIMEOUT):
+                    await get_paper_detail(paper_id)
+                    if self.references:
+                        await get_paper_references(paper_id)
+            metrics.inc("prefetch.completed")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            metrics.inc("prefetch.failed")
+            logger.debug(f"预取论文 {paper_id} 失败: {str(e)}")
+        finally:
+            self._pending_ids.discard(paper_id)
+
+    async def drain(self) -> None:
+        """等待当前所有预取完成"""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def cancel(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+
+
+_prefetcher: Optional[Prefetcher] = None
+
+
+def get_prefetcher() -> Prefetcher:
+    """按环境变量惰性创建预取器"""
+    global _prefetcher
+    if _prefetcher is None:
+        _prefetcher = Prefetcher(
+            concurrency=int(get_env("MCP_SCHOLAR_PREFETCH_CONCURRENCY", "2")),
+            references=_flag("MCP_SCHOLAR_PREFETCH_REFERENCES", "0"),
+        )
+    return _prefetcher
+
+
+def set_prefetcher(prefetcher: Optional[Prefetcher]) -> None:
+    """替换预取器，传入None时下次使用会按环境变量重新创建"""
+    global _prefetcher
+    _prefetcher = prefetcher
+
+
+def prefetch_top(paper_ids: Iterable[Optional[str]]) -> int:
+    """
+    列表类工具返回后调用：未开启预取时什么也不做，否则预取前K篇论文
+
+    Args:
+        paper_ids: 按排名排列的论文ID
+
+    Returns:
+        int: 安排的预取数
+    """
+    if not prefetch_enabled():
+        return 0
+    top_k = int(get_env("MCP_SCHOLAR_PREFETCH_TOP_K", "3"))
+    ids = [paper_id for paper_id in paper_ids if paper_id][: max(0, top_k)]
+    return get_prefetcher().schedule(ids)
@@ -0,0 +1,223 @@
+"""
+按需性能剖析
+为选定的工具调用生成剖析文件，用于排查生产环境中的CPU尖刺和内存分配热点
+
+通过环境变量配置（首次调用时读取，也可用configure()在运行时修改）:
+    MCP_SCHOLAR_PROFILE_DIR: 剖析文件输出目录，为空时关闭剖析
+    MCP_SCHOLAR_PROFILE_MODE: "cprofile"(确定性剖析，输出pstats) 或
+        "sample"(采样剖析，输出collapsed stacks，可直接用于火焰图)，默认cprofile
+    MCP_SCHOLAR_PROFILE_TOOLS: 逗号分隔的工具名，为空时剖析所有工具
+    MCP_SCHOLAR_PROFILE_RATE: 被剖析调用的比例(0~1)，默认1.0
+    MCP_SCHOLAR_PROFILE_INTERVAL: 采样剖析的采样间隔(秒)，默认0.005
+    MCP_SCHOLAR_PROFILE_TRACEMALLOC: 为1时在调用前后拍摄tracemalloc快照
+"""
+
+import cProfile
+import functools
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, FrozenSet, Iterator, Optional
+from mcp_scholar.config import get_env
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ProfileConfig:
+    """剖析配置"""
+
+    directory: str = ""
+    mode: str = "cprofile"
+    tools: FrozenSet[str] = field(default_factory=frozenset)
+    rate: float = 1.0
+    interval: float = 0.005
+    tracemalloc: bool = False
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def matches(self, tool_name: str) -> bool:
+        if not self.enabled:
+            return False
+        if self.tools and tool_name not in self.tools:
+            return False
+        return self.rate >= 1.0 or random.random() < self.rate
+
+    @classmethod
+    def from_env(cls) -> "ProfileConfig":
+        tools = get_env("MCP_SCHOLAR_PROFILE_TOOLS", "")
+        return cls(
+            directory=get_env("MCP_SCHOLAR_PROFILE_DIR", "").strip(),
+            mode=get_env("MCP_SCHOLAR_PROFILE_MODE", "cprofile").strip(),
+            tools=frozenset(t.strip() for t in tools.split(",") if t.strip()),
+            rate=float(get_env("MCP_SCHOLAR_PROFILE_RATE", "1.0")),
+            interval=float(get_env("MCP_SCHOLAR_PROFILE_INTERVAL", "0.005")),
+            tracemalloc=get_env("MCP_SCHOLAR_PROFILE_TRACEMALLOC", "")
+            in ("1", "true", "yes"),
+        )
+
+
+_config: Optional[ProfileConfig] = None
+
+# 同一时间只允许一个剖析会话，cProfile不能嵌套启用，且并发调用会互相污染结果
+_active_lock = threading.Lock()
+
+
+def get_config() -> ProfileConfig:
+    global _config
+    if _config is None:
+        try:
+            _config = ProfileConfig.from_env()
+        except ValueError as e:
+            logger.warning(f"剖析配置无效，已关闭剖析: {str(e)}")
+            _config = ProfileConfig()
+    return _config
+
+
+def configure(config: Optional[ProfileConfig] = None) -> ProfileConfig:
+    """在运行时替换剖析配置，传入None时重新读取环境变量"""
+    global _config
+    _config = config
+    return get_config()
+
+
+class SamplingProfiler:
+    """
+    基于后台线程的采样剖析器
+
+    按固定间隔读取目标线程的调用栈，汇总为collapsed stacks格式
+    """
+
+    def __init__(self, interval: float = 0.005, thread_id: Optional[int] = None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="mcp-scholar-sampler", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{os.path.basename(code.co_filename)}:{code.co_name}"
+                    f":{frame.f_lineno}"
+                )
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def write(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _output_path(config: ProfileConfig, tool_name: str, suffix: str) -> str:
+    os.makedirs(config.directory, exist_ok=True)
+    filename = f"{tool_name}-{int(time.time() * 1000)}-{os.getpid()}{suffix}"
+    return os.path.join(config.directory, filename)
+
+
+def _write_tracemalloc_diff(
+    path: str, before: tracemalloc.Snapshot, after: tracemalloc.Snapshot
+) -> None:
+    stats = after.compare_to(before, "lineno")
+    with open(path, "w", encoding="utf-8") as f:
+        for stat in stats[:30]:
+            f.write(f"{stat}\n")
+
+
+@contextmanager
+def profile_call(tool_name: str) -> Iterator[None]:
+    """
+    按配置剖析一次工具调用
+
+    未命中配置或已有剖析会话在进行时不做任何事
+    """
+    config = get_config()
+    if not config.matches(tool_name) or not _active_lock.acquire(blocking=False):
+        yield
+        return
+
+    profiler: Any = None
+    started_tracemalloc = False
+    snapshot_before = None
+    try:
+        if config.tracemalloc:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(25)
+                started_tracemalloc = True
+            snapshot_before = tracemalloc.take_snapshot()
+
+        if config.mode == "sample":
+            profiler = SamplingProfiler(config.interval)
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+    except Exception as e:
+        logger.warning(f"启动剖析失败: {str(e)}")
+        _active_lock.release()
+        yield
+        return
+
+    try:
+        yield
+    finally:
+        try:
+            if isinstance(profiler, SamplingProfiler):
+                profiler.stop()
+                profiler.write(_output_path(config, tool_name, ".collapsed"))
+            else:
+                profiler.disable()
+                profiler.dump_stats(_output_path(config, tool_name, ".pstats"))
+
+            if snapshot_before is not None:
+                snapshot_after = tracemalloc.take_snapshot()
+                _write_tracemalloc_diff(
+                    _output_path(config, tool_name, ".tracemalloc.txt"),
+                    snapshot_before,
+                    snapshot_after,
+                )
+        except Exception as e:
+            logger.warning(f"写入剖析文件失败: {str(e)}")
+        finally:
+            if started_tracemalloc:
+                tracemalloc.stop()
+            _active_lock.release()
+
+
+def profiled(tool_name: str) -> Callable:
+    """按配置剖析异步工具调用的装饰器"""
+
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with profile_call(tool_name):
+                return await fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
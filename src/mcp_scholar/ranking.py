@@ -0,0 +1,230 @@
+"""
+结果合并与排序
+多个查询的结果按OpenAlex ID / DOI去重，并用倒数排名融合(RRF)合并排名；
+本地BM25对候选论文的标题和摘要重新打分
+
+安装了NumPy时BM25按矩阵计算，否则使用纯Python实现，结果相同
+"""
+
+import bisect
+import functools
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# RRF平滑常数，取常用的60：排名靠前的差异不会压倒多个查询同时命中的论文
+RRF_K = 60
+
+
+def normalize_doi(doi: str) -> str:
+    """去掉DOI的URL前缀并转为小写，便于比较"""
+    doi = (doi or "").strip().lower()
+    for prefix in ("https://doi.org/", "http://doi.org/", "doi:"):
+        if doi.startswith(prefix):
+            return doi[len(prefix) :]
+    return doi
+
+
+def paper_keys(paper: Dict[str, Any]) -> List[str]:
+    """论文的去重键：OpenAlex ID和DOI，任意一个相同即视为同一篇论文"""
+    keys = []
+    if paper.get("paper_id"):
+        keys.append(f"openalex:{paper['paper_id']}")
+    doi = normalize_doi(paper.get("doi", ""))
+    if doi:
+        keys.append(f"doi:{doi}")
+    return keys
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: Sequence[Tuple[str, List[Dict[str, Any]]]],
+    k: int = RRF_K,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    用倒数排名融合合并多个查询的排名
+
+    每篇论文的得分为 sum(1 / (k + rank))，rank从1开始；
+    同分时按最好名次、再按首次出现的顺序排列
+
+    Args:
+        ranked_lists: (查询, 该查询按名次排列的论文列表) 的序列
+        k: RRF平滑常数
+        limit: 返回数量上限，为None时全部返回
+
+    Returns:
+        List[Dict]: 合并后的论文列表，每篇论文带有matched_queries和rrf_score
+    """
+    merged: List[Dict[str, Any]] = []
+    # 去重键 -> merged中的下标
+    index: Dict[str, int] = {}
+    best_rank: List[int] = []
+
+    for query, papers in ranked_lists:
+        for rank, paper in enumerate(papers, start=1):
+            keys = paper_keys(paper)
+            position = next((index[key] for key in keys if key in index), None)
+            if position is None:
+                position = len(merged)
+                entry = dict(paper)
+                entry["matched_queries"] = []
+                entry["rrf_score"] = 0.0
+                merged.append(entry)
+                best_rank.append(rank)
+            entry = merged[position]
+            for key in keys:
+                index.setdefault(key, position)
+
+            # 同一查询里重复出现的论文只按最好名次计一次
+            if query not in entry["matched_queries"]:
+                entry["matched_queries"].append(query)
+                entry["rrf_score"] += 1.0 / (k + rank)
+            best_rank[position] = min(best_rank[position], rank)
+
+    order = sorted(
+        range(len(merged)),
+        key=lambda i: (-merged[i]["rrf_score"], best_rank[i], i),
+    )
+    results = [merged[i] for i in order]
+    for paper in results:
+        paper["rrf_score"] = round(paper["rrf_score"], 6)
+    return results[:limit] if limit is not None else results
+
+
+# 英文和数字按词切分，中日韩文字按单字切分
+_TOKEN_RE = re.compile(r"[a-z0-9]+|[\u3040-\u30ff\u4e00-\u9fff\uac00-\ud7af]")
+_ASCII_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+@functools.lru_cache(maxsize=None)
+def optional_numpy() -> Any:
+    """首次使用时才导入NumPy（可选依赖），避免拖慢启动；未安装时返回None"""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+_WORD_CHARS = frozenset("abcdefghijklmnopqrstuvwxyz0123456789")
+
+
+def _term_matrix(
+    terms: List[str], documents: Sequence[str]
+) -> Tuple[List[int], List[int], List[int]]:
+    """
+    构建每个请求的稀疏词频矩阵（COO格式）
+
+    只统计查询词：所有文档拼接成一个字符串，每个查询词用str.find扫描一遍，
+    按命中位置归属到文档，不对文档全文分词，也不为整个词表建矩阵。
+    文档长度用字符数近似，BM25只用到它与平均长度的比值
+
+    Returns:
+        (每次命中的文档下标, 每次命中的词下标, 每篇文档的长度)
+    """
+    lowered = [document.lower() for document in documents]
+    starts = []
+    position = 0
+    for document in lowered:
+        starts.append(position)
+        position += len(document) + 1
+    text = "\n".join(lowered)
+    text_length = len(text)
+
+    doc_ids: List[int] = []
+    term_ids: List[int] = []
+    for j, term in enumerate(terms):
+        # 英文词要求前后不是字母数字，中日韩单字本身就是一个词
+        whole_word = _ASCII_TOKEN_RE.fullmatch(term) is not None
+        position = text.find(term)
+        while position != -1:
+            end = position + len(term)
+            if not whole_word or (
+                (position == 0 or text[position - 1] not in _WORD_CHARS)
+                and (end == text_length or text[end] not in _WORD_CHARS)
+            ):
+                doc_ids.append(bisect.bisect_right(starts, position) - 1)
+                term_ids.append(j)
+            position = text.find(term, end)
+    return doc_ids, term_ids, [len(document) for document in lowered]
+
+
+def bm25_scores(
+    query: str,
+    documents: Sequence[str],
+    k1: float = BM25_K1,
+    b: float = BM25_B,
+) -> List[float]:
+    """
+    计算每篇文档相对于查询的BM25得分
+
+    Args:
+        query: 查询文本
+        documents: 文档文本列表
+        k1: 词频饱和参数
+        b: 文档长度归一化参数
+
+    Returns:
+        List[float]: 与documents顺序一致的得分
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms or not documents:
+        return [0.0] * len(documents)
+
+    doc_ids, term_ids, lengths = _term_matrix(terms, documents)
+    n_docs = len(documents)
+    avg_length = (sum(lengths) / n_docs) or 1.0
+
+    np = optional_numpy()
+    if np is not None:
+        tf = np.zeros((n_docs, len(terms)), dtype=np.float64)
+        np.add.at(tf, (np.asarray(doc_ids, dtype=np.intp), term_ids), 1.0)
+        length_norm = k1 * (
+            1 - b + b * np.asarray(lengths, dtype=np.float64) / avg_length
+        )
+        df = np.count_nonzero(tf, axis=0)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+        weights = tf * (k1 + 1) / (tf + length_norm[:, None])
+        return (weights @ idf).tolist()
+
+    counts = Counter(zip(doc_ids, term_ids))
+    df_list = [0] * len(terms)
+    for _, j in counts:
+        df_list[j] += 1
+    idf_list = [math.log1p((n_docs - df + 0.5) / (df + 0.5)) for df in df_list]
+    scores = [0.0] * n_docs
+    for (i, j), tf in counts.items():
+        norm = k1 * (1 - b + b * lengths[i] / avg_length)
+        scores[i] += idf_list[j] * tf * (k1 + 1) / (tf + norm)
+    return scores
+
+
+def bm25_rerank(
+    query: str, papers: List[Dict[str, Any]], limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    按标题+摘要的BM25得分重新排序论文，同分时保持原有顺序
+
+    Args:
+        query: 查询文本
+        papers: 候选论文列表
+        limit: 返回数量上限，为None时全部返回
+
+    Returns:
+        List[Dict]: 重新排序后的论文列表
+    """
+    documents = [
+        f"{paper.get('title') or ''} {paper.get('abstract') or ''}" for paper in papers
+    ]
+    scores = bm25_scores(query, documents)
+    order = sorted(range(len(papers)), key=lambda i: (-scores[i], i))
+    results = [papers[i] for i in order]
+    return results[:limit] if limit is not None else results
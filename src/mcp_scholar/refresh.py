@@ -0,0 +1,79 @@
+"""
+本地记录的引用量刷新
+扫描本地work记录存储，找出引用量等易变字段已过期、静态字段仍有效的记录，
+按每批50个ID只请求易变字段并合并进记录。适合用定时任务运行，让论文详情的引用量
+保持新鲜，而不用重新下载整条记录。刷新后无用字节超过
+MCP_SCHOLAR_WORK_STORE_COMPACT_RATIO时压缩数据文件
+
+命令行: mcp-scholar refresh [--limit N]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Optional
+from mcp_scholar import store, upstream
+from mcp_scholar.scholar import refresh_volatile
+
+logger = logging.getLogger(__name__)
+
+
+async def refresh_stale(limit: Optional[int] = None) -> Dict[str, Any]:
+    """
+    刷新存储中所有易变字段已过期的记录
+
+    Args:
+        limit: 最多刷新的记录数，最久没有刷新的优先
+
+    Returns:
+        Dict: stale（需要刷新的记录数）、refreshed（刷新成功的记录数）和
+            compacted（压缩数据文件回收的字节数，没有压缩时为0）
+
+    Raises:
+        ValueError: 没有启用本地记录存储
+    """
+    work_store = store.get_store()
+    if work_store is None:
+        raise ValueError("没有启用本地记录存储，请设置MCP_SCHOLAR_WORK_STORE")
+    stale = await asyncio.to_thread(
+        work_store.stale_keys, None, store.max_age(), store.volatile_max_age(), limit
+    )
+    refreshed = await refresh_volatile(stale)
+    logger.info(f"{len(stale)} 条记录的引用量已过期，刷新了 {len(refreshed)} 条")
+
+    compacted = 0
+    stats = await asyncio.to_thread(work_store.stats)
+    if stats["bytes"] and stats["dead_bytes"] > stats["bytes"] * store.compact_ratio():
+        compacted = await asyncio.to_thread(work_store.compact)
+    return {"stale": len(stale), "refreshed": len(refreshed), "compacted": compacted}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    命令行入口: mcp-scholar refresh [--limit N]
+    """
+    from mcp_scholar.logs import configure_logging
+
+    parser = argparse.ArgumentParser(
+        prog="mcp-scholar refresh", description="刷新本地记录中过期的引用量"
+    )
+    parser.add_argument("--limit", type=int, default=None, help="最多刷新的记录数")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+
+    async def run() -> Dict[str, Any]:
+        try:
+            with upstream.background():
+                return await refresh_stale(args.limit)
+        finally:
+            await upstream.aclose()
+
+    try:
+        result = asyncio.run(run())
+    except ValueError as e:
+        logger.error(f"刷新失败: {str(e)}")
+        return 1
+    print(json.dumps(result, ensure_ascii=False))
+    return 0
@@ -0,0 +1,336 @@
+"""
+上游请求调度
+所有上游请求在这里排队，按优先级和会话公平地分配并发名额和速率预算：
+
+- 优先级：交互请求（工具调用直接发出的）总是先于后台请求（预取、导出、定期检查等）
+- 会话之间加权公平排队（start-time fair queuing）：每个会话按权重分得名额，
+  一个会话的大量并发请求不会让其他会话排在它后面
+- 后台请求可被抢占：交互请求在没有空闲名额时会取消一个正在执行的后台请求，
+  被抢占的后台请求重新排队，稍后自动重试
+- 并发窗口自适应（AIMD）：请求顺利时窗口每轮加1，遇到429、5xx、超时或延迟明显升高时
+  窗口按比例缩小，上游变慢时自动降低并发，变快时再逐步放开
+
+通过环境变量配置:
+    MCP_SCHOLAR_UPSTREAM_CONCURRENCY: 并发窗口上限，默认16
+    MCP_SCHOLAR_UPSTREAM_MIN_CONCURRENCY: 并发窗口下限，默认2
+    MCP_SCHOLAR_SESSION_WEIGHTS: 会话权重，例如 "agent-a=2,agent-b=0.5"，未列出的会话权重为1
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import httpx
+from mcp_scholar.deadline import DeadlineExceeded
+from mcp_scholar.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+
+def parse_weights(text: str) -> Dict[str, float]:
+    """解析 "session=weight,..." 格式的会话权重，忽略格式错误的项"""
+    weights = {}
+    for item in text.split(","):
+        name, _, value = item.partition("=")
+        try:
+            weight = float(value)
+        except ValueError:
+            continue
+        if name.strip() and weight > 0:
+            weights[name.strip()] = weight
+    return weights
+
+
+# 表示上游限流或过载的状态码
+THROTTLE_STATUS = {429}
+UNAVAILABLE_STATUS = {502, 503, 504}
+# 延迟超过基线的倍数且超过最小值时视为拥塞
+LATENCY_FACTOR = 3.0
+MIN_CONGESTED_LATENCY = 1.0
+# 基线延迟向较高的观测值缓慢漂移的比例，上游整体变慢后基线能跟上
+BASELINE_DRIFT = 0.01
+# 限流、过载和超时时窗口乘以的系数；延迟升高时缩小得温和一些
+CONGESTION_BACKOFF = 0.5
+LATENCY_BACKOFF = 0.8
+
+
+class AimdWindow:
+    """
+    加性增、乘性减的并发窗口
+
+    窗口被用满的请求成功时窗口增加 1/窗口，即每轮（窗口内的请求都完成一次）加1；
+    出现拥塞信号时乘以退避系数。同一轮内发出的请求只会让窗口缩小一次
+    """
+
+    def __init__(self, minimum: int = 1, maximum: int = 16):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.value = float(max(self.minimum, self.maximum // 2))
+        self.baseline: Optional[float] = None
+        self._last_decrease = float("-inf")
+        # 最近一次拥塞信号及其时间(time.monotonic())
+        self.last_congestion: Optional[Tuple[str, float]] = None
+        self._publish()
+
+    @property
+    def limit(self) -> int:
+        return max(self.minimum, int(self.value))
+
+    def _publish(self) -> None:
+        metrics.set_gauge("upstream.concurrency_window", self.limit)
+
+    def on_success(self, latency: float, started: float, in_flight: int) -> None:
+        """
+        记录一次成功的请求
+
+        Args:
+            latency: 请求耗时(秒)
+            started: 请求开始时间(time.monotonic())
+            in_flight: 请求完成时正在执行的请求数（包括这一个）
+        """
+        if self.baseline is None or latency < self.baseline:
+            self.baseline = latency
+        else:
+            self.baseline += (latency - self.baseline) * BASELINE_DRIFT
+        if latency > max(MIN_CONGESTED_LATENCY, LATENCY_FACTOR * self.baseline):
+            self.on_congestion("latency", started, LATENCY_BACKOFF)
+            return
+        # 窗口没有用满时增大窗口没有意义，空闲一段时间后也不会突然放出大量请求
+        if in_flight >= self.limit:
+            self.value = min(self.maximum, self.value + 1 / self.value)
+            self._publish()
+
+    def on_congestion(
+        self, signal: str, started: float, factor: float = CONGESTION_BACKOFF
+    ) -> None:
+        """记录一次拥塞信号（限流、过载、超时或延迟升高）"""
+        metrics.inc("upstream.congestion", signal=signal)
+        self.last_congestion = (signal, time.monotonic())
+        if started < self._last_decrease:
+            # 上次缩小窗口之前发出的请求反映的是旧窗口的情况
+            return
+        self.value = max(float(self.minimum), self.value * factor)
+        self._last_decrease = time.monotonic()
+        logger.info(f"上游拥塞({signal})，并发窗口缩小到 {self.limit}")
+        self._publish()
+
+
+class _Waiter:
+    __slots__ = ("future", "priority", "session", "reserve", "cancelled")
+
+    def __init__(
+        self, future: asyncio.Future, priority: int, session: str, reserve: float
+    ):
+        self.future = future
+        self.priority = priority
+        self.session = session
+        self.reserve = reserve
+        self.cancelled = False
+
+
+class _Running:
+    __slots__ = ("priority", "task", "preempted")
+
+    def __init__(self, priority: int):
+        self.priority = priority
+        self.task: Optional[asyncio.Task] = None
+        self.preempted = False
+
+
+class Scheduler:
+    """
+    上游请求调度器，绑定在一个事件循环上
+
+    排队的请求按 (优先级, 虚拟开始时间, 到达顺序) 放在堆中；有空闲名额且速率预算允许时
+    从堆顶放行。速率预算由 get_limiter 返回的限流器提供，后台请求取令牌时为交互请求保留一部分
+    """
+
+    def __init__(
+        self,
+        get_limiter: Callable[[], Any],
+        concurrency: int = 16,
+        weights: Optional[Dict[str, float]] = None,
+        min_concurrency: int = 1,
+    ):
+        self._get_limiter = get_limiter
+        self.window = AimdWindow(min_concurrency, concurrency)
+        self.weights = weights or {}
+        self._heap: List[Tuple[int, float, int, _Waiter]] = []
+        self._seq = itertools.count()
+        # 每个优先级的虚拟时间，以及每个会话在各优先级上的上一次虚拟结束时间
+        self._virtual: Dict[int, float] = {INTERACTIVE: 0.0, BACKGROUND: 0.0}
+        self._finish: Dict[Tuple[int, str], float] = {}
+        self._running: Set[_Running] = set()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.queued = {INTERACTIVE: 0, BACKGROUND: 0}
+
+    def _weight(self, session: str) -> float:
+        return self.weights.get(session, 1.0)
+
+    def _enqueue(self, priority: int, session: str, reserve: float) -> _Waiter:
+        waiter = _Waiter(
+            asyncio.get_running_loop().create_future(), priority, session, reserve
+        )
+        start = max(self._virtual[priority], self._finish.get((priority, session), 0))
+        self._finish[(priority, session)] = start + 1 / self._weight(session)
+        heapq.heappush(self._heap, (priority, start, next(self._seq), waiter))
+        self.queued[priority] += 1
+        return waiter
+
+    def _token_wait(self, reserve: float) -> float:
+        limiter = self._get_limiter()
+        if limiter.rate <= 0:
+            return 0.0
+        return limiter._take(reserve)
+
+    def _pump(self) -> None:
+        """在名额和速率预算允许的范围内放行堆顶的请求"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._heap:
+            priority, start, _, waiter = self._heap[0]
+            if waiter.cancelled:
+                heapq.heappop(self._heap)
+                continue
+            if len(self._running) >= self.window.limit:
+                if priority == INTERACTIVE:
+                    self._preempt()
+                return
+            wait = self._token_wait(waiter.reserve)
+            if wait > 0:
+                # 堆顶请求等令牌时后面的请求也不放行，保证交互请求优先拿到令牌
+                self._timer = asyncio.get_running_loop().call_later(wait, self._pump)
+                return
+            heapq.heappop(self._heap)
+            self._virtual[priority] = start
+            self.queued[priority] -= 1
+            running = _Running(priority)
+            self._running.add(running)
+            waiter.future.set_result(running)
+
+    def _preempt(self) -> None:
+        """取消一个正在执行的后台请求，把名额让给排队的交互请求"""
+        preempting = sum(running.preempted for running in self._running)
+        if preempting >= self.queued[INTERACTIVE]:
+            # 已经抢占的名额足够排队的交互请求使用
+            return
+        for running in self._running:
+            if (
+                running.priority == BACKGROUND
+                and not running.preempted
+                and running.task is not None
+            ):
+                running.preempted = True
+                running.task.cancel()
+                metrics.inc("upstream.preempted")
+                return
+
+    def _release(self, running: _Running) -> None:
+        self._running.discard(running)
+        self._pump()
+
+    async def _wait_turn(
+        self, priority: int, session: str, reserve: float, timeout: Optional[float]
+    ) -> _Running:
+        waiter = self._enqueue(priority, session, reserve)
+        self._pump()
+        try:
+            if timeout is None:
+                return await asyncio.shield(waiter.future)
+            return await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except BaseException as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # 已经放行但调用方不再需要，归还名额
+                self._release(waiter.future.result())
+            else:
+                waiter.cancelled = True
+                waiter.future.cancel()
+                self.queued[priority] -= 1
+            if isinstance(e, asyncio.TimeoutError):
+                raise DeadlineExceeded("剩余时间不足以等待上游请求名额")
+            raise
+
+    async def request(
+        self,
+        send: Callable[[], Awaitable[Any]],
+        priority: int = INTERACTIVE,
+        session: str = "default",
+        reserve: float = 0.0,
+        timeout: Optional[Callable[[], Optional[float]]] = None,
+    ) -> Any:
+        """
+        排队并执行一个上游请求
+
+        Args:
+            send: 发送请求的函数，每次调用返回一个新的协程（被抢占后会重新调用）
+            priority: INTERACTIVE 或 BACKGROUND
+            session: 调用方的会话标识
+            reserve: 取令牌时需要为交互请求保留的令牌桶比例
+            timeout: 返回最长排队时间的函数，返回None时不限
+
+        Raises:
+            DeadlineExceeded: 排队时间超过剩余预算
+        """
+        while True:
+            queued_at = time.monotonic()
+            running = await self._wait_turn(
+                priority, session, reserve, timeout() if timeout else None
+            )
+            metrics.inc(
+                "upstream.queue_seconds",
+                time.monotonic() - queued_at,
+                priority=PRIORITY_NAMES[priority],
+            )
+            try:
+                started = time.monotonic()
+                running.task = asyncio.ensure_future(send())
+                # 用wait而不是直接await：调用方被取消时不会误判为被抢占
+                await asyncio.wait({running.task})
+                self._feedback(running.task, started)
+            except asyncio.CancelledError:
+                if running.task is not None:
+                    running.task.cancel()
+                    await asyncio.gather(running.task, return_exceptions=True)
+                raise
+            finally:
+                self._release(running)
+            if running.task.cancelled() and running.preempted:
+                logger.debug("后台上游请求被抢占，重新排队")
+                continue
+            return running.task.result()
+
+    def _feedback(self, task: asyncio.Task, started: float) -> None:
+        """根据请求结果调整并发窗口"""
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            if isinstance(error, httpx.TimeoutException):
+                self.window.on_congestion("timeout", started)
+            elif isinstance(error, httpx.TransportError):
+                self.window.on_congestion("error", started)
+            return
+        status = getattr(task.result(), "status_code", None)
+        if status in THROTTLE_STATUS:
+            self.window.on_congestion("throttled", started)
+        elif status in UNAVAILABLE_STATUS:
+            self.window.on_congestion("unavailable", started)
+        else:
+            self.window.on_success(
+                time.monotonic() - started, started, len(self._running)
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window": self.window.limit,
+            "running": len(self._running),
+            "queued_interactive": self.queued[INTERACTIVE],
+            "queued_background": self.queued[BACKGROUND],
+        }
@@ -6,46 +6,172 @@ OpenAlex 搜索和解析功能
 import re
 import httpx
 import asyncio
-import os
-from typing import List, Dict, Any, Optional
+import logging
+from typing import List, Dict, Any, Callable, Iterable, Optional, Tuple
 from urllib.parse import quote_plus
-from dotenv import load_dotenv
-from pathlib import Path
+from mcp_scholar import deadline, store, tracing, upstream
+from mcp_scholar.config import DEFAULT_EMAIL, get_email, get_env
+from mcp_scholar.dedup import dedup_enabled, dedupe_papers
+from mcp_scholar.ranking import bm25_rerank
+from mcp_scholar.tracing import traced
 
+logger = logging.getLogger(__name__)
 
-# 获取配置文件路径
-def get_env_file():
-    """获取.env文件路径"""
-    # 首先检查当前工作目录
-    if os.path.exists(".env"):
-        return ".env"
+# OpenAlex API 基本URL
+OPENALEX_API = "https://api.openalex.org"
+# OpenAlex单页最多返回的结果数
+OPENALEX_MAX_PER_PAGE = 200
+# 列表类请求只取解析需要的字段（select参数），不下载referenced_works、counts_by_year等大字段；
+# 包含论文详情需要的open_access和concepts，写入本地记录存储的记录能解析出论文详情，
+# 但缺少其他字段，在存储中标记为部分记录，不会覆盖论文详情保存的完整记录
+WORK_SELECT_FIELDS = (
+    "id",
+    "doi",
+    "title",
+    "publication_year",
+    "cited_by_count",
+    "abstract_inverted_index",
+    "authorships",
+    # OpenAlex在列表响应中把超过100位的作者截断，需要据此显示作者数
+    "is_authors_truncated",
+    "primary_location",
+    "open_access",
+    "concepts",
+)
+# 刷新易变字段时只取这些字段
+VOLATILE_SELECT_FIELDS = ("id",) + store.VOLATILE_FIELDS
+# OpenAlex过滤条件中一次最多可以用|连接的值数
+REFRESH_BATCH_SIZE = 50
+
+
+def _rerank_pool_size(count: int) -> int:
+    """重排序时获取的候选论文数，MCP_SCHOLAR_RERANK_POOL，默认100"""
+    pool = int(get_env("MCP_SCHOLAR_RERANK_POOL", "100"))
+    return min(OPENALEX_MAX_PER_PAGE, max(count * 2, pool))
+
+
+def __getattr__(name: str) -> Any:
+    # EMAIL 改为首次访问时才读取配置，保留模块属性以兼容旧代码
+    if name == "EMAIL":
+        return get_email()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _mailto(separator: str = "&") -> str:
+    """构建礼貌请求的mailto参数"""
+    email = get_email()
+    return f"{separator}mailto={email}" if email else ""
+
+
+def _select(separator: str = "&") -> str:
+    """构建列表类请求的select参数，MCP_SCHOLAR_SELECT_FIELDS=0时不限制字段"""
+    enabled = get_env("MCP_SCHOLAR_SELECT_FIELDS", "1").strip().lower()
+    if enabled in ("0", "false", "no"):
+        return ""
+    return f"{separator}select={','.join(WORK_SELECT_FIELDS)}"
 
-    # 检查项目根目录
-    root_dir = Path(__file__).parent.parent.parent
-    env_path = root_dir / ".env"
-    if env_path.exists():
-        return str(env_path)
 
-    return None
+def format_authors(authorships: List[Dict[str, Any]], truncated: bool = False) -> str:
+    """
+    把作者列表格式化为字符串，作者很多时只保留前N位和后M位，形如 "A, B, …, Z, +K more"
 
+    只按下标读取需要显示的作者，不为数千位作者的论文构建完整的姓名列表
 
-# 配置默认值
-DEFAULT_EMAIL = "your-email@example.com"
+    Args:
+        authorships: OpenAlex work记录的authorships
+        truncated: OpenAlex是否已截断作者列表（is_authors_truncated），
+            此时列表末尾不是真正的最后几位作者，只显示前N位
 
-# 加载环境变量
-env_file = get_env_file()
-if env_file:
-    load_dotenv(env_file)
-else:
-    print("警告: 未找到.env文件,使用默认配置")
+    通过环境变量配置:
+        MCP_SCHOLAR_AUTHORS_HEAD: 保留的前几位作者数，默认10
+        MCP_SCHOLAR_AUTHORS_TAIL: 保留的最后几位作者数，默认2，0表示不保留
+    """
+    head = max(1, int(get_env("MCP_SCHOLAR_AUTHORS_HEAD", "10")))
+    tail = 0 if truncated else max(0, int(get_env("MCP_SCHOLAR_AUTHORS_TAIL", "2")))
+    total = len(authorships)
+
+    def names(indexes: Iterable[int]) -> List[str]:
+        result = []
+        for index in indexes:
+            name = (authorships[index].get("author") or {}).get("display_name")
+            if name:
+                result.append(name)
+        return result
+
+    if not truncated and total <= head + tail:
+        return ", ".join(names(range(total)))
+    shown = names(range(min(head, total)))
+    if tail:
+        shown += ["…"] + names(range(total - tail, total))
+    hidden = max(0, total - head - tail)
+    # OpenAlex截断了作者列表时真实的作者数未知，只能给出下限
+    shown.append(f"+{hidden}+ more" if truncated else f"+{hidden} more")
+    return ", ".join(shown)
+
+
+async def _http_get(
+    client: upstream.UpstreamSession, url: str, url_template: str, **kwargs: Any
+) -> httpx.Response:
+    """
+    发送GET请求并记录追踪span
 
-# OpenAlex API 基本URL
-OPENALEX_API = "https://api.openalex.org"
+    Args:
+        client: 上游请求句柄
+        url: 完整请求URL
+        url_template: 去掉具体参数的URL模板，用作span属性以便聚合
+        **kwargs: 透传给client.get的参数
+
+    Returns:
+        httpx.Response: 响应对象
+    """
+    with tracing.span("http.get", url_template=url_template) as span:
+        response = await client.get(url, **kwargs)
+        span.set_attributes(
+            status_code=response.status_code,
+            response_bytes=len(response.content),
+            from_cache=response.extensions.get("from_cache", False),
+        )
+        return response
+
+
+def _decode_json(response: httpx.Response) -> Any:
+    """解码响应JSON并记录解析耗时"""
+    with tracing.span("parse.json", response_bytes=len(response.content)):
+        return response.json()
+
+
+async def _parse_results(
+    response: httpx.Response, parser: Optional[Callable[[Dict[str, Any]], Any]] = None
+) -> Tuple[Dict[str, Any], List[Any]]:
+    """
+    解码列表响应并逐条解析results；大响应交给解析工作池，不阻塞事件循环。
+    开启本地记录存储时原始记录写入存储（请求带select参数时标记为部分记录）
+
+    Args:
+        response: OpenAlex列表接口的响应
+        parser: 单条work记录的解析函数，默认为parse_work
 
-# 从环境变量读取email,如果没有则使用默认值
-EMAIL = os.environ.get("OPENALEX_EMAIL", DEFAULT_EMAIL)
+    Returns:
+        Tuple[Dict, List]: 去掉results后的响应（meta等）和解析后的记录
+    """
+    # 解析工作池（及其进程池依赖）在第一次解析响应时才加载
+    from mcp_scholar import workers
+
+    pool = workers.get_pool()
+    keep_raw = store.get_store() is not None
+    body = response.content
+    with tracing.span(
+        "parse.page",
+        response_bytes=len(body),
+        offloaded=pool.should_offload(len(body)),
+    ):
+        data, parsed, raw = await pool.parse(body, parser or parse_work, keep_raw)
+    if raw:
+        await store.save_works(raw, projected="select" in response.request.url.params)
+    return data, parsed
 
 
+@traced("scholar.enrich_abstract")
 async def enrich_abstract(paper: Dict[str, Any]) -> Dict[str, Any]:
     """
     尝试丰富论文摘要信息
@@ -68,16 +194,18 @@ async def enrich_abstract(paper: Dict[str, Any]) -> Dict[str, Any]:
     ):
         try:
             # 构建API请求URL
-            email_param = f"?mailto={EMAIL}" if EMAIL else ""
+            email_param = _mailto("?")
 
-            async with httpx.AsyncClient(timeout=10.0) as client:
+            async with upstream.session(timeout=10.0) as client:
                 # 通过DOI查询
-                response = await client.get(
-                    f"{OPENALEX_API}/works/doi:{paper['doi']}{email_param}"
+                response = await _http_get(
+                    client,
+                    f"{OPENALEX_API}/works/doi:{paper['doi']}{email_param}",
+                    "/works/doi:{doi}",
                 )
 
                 if response.status_code == 200:
-                    data = response.json()
+                    data = _decode_json(response)
                     if data.get("abstract_inverted_index"):
                         # OpenAlex的摘要是倒排索引格式，需要转换为普通文本
                         abstract = convert_inverted_index_to_text(
@@ -87,7 +215,8 @@ async def enrich_abstract(paper: Dict[str, Any]) -> Dict[str, Any]:
                             paper["abstract"] = abstract
                             paper["abstract_quality"] = "增强"
         except Exception as e:
-            print(f"通过DOI丰富摘要时出错: {str(e)}")
+            logger.error(f"通过DOI丰富摘要时出错: {str(e)}")
+            deadline.mark_if_expired(e)
 
     return paper
 
@@ -105,6 +234,12 @@ def convert_inverted_index_to_text(inverted_index: Dict[str, List[int]]) -> str:
     if not inverted_index:
         return ""
 
+    with tracing.span("parse.abstract", words=len(inverted_index)):
+        return _join_inverted_index(inverted_index)
+
+
+def _join_inverted_index(inverted_index: Dict[str, List[int]]) -> str:
+    """按位置拼接倒排索引中的单词"""
     # 创建一个足够大的数组来存放所有单词
     max_position = 0
     for positions in inverted_index.values():
@@ -122,6 +257,206 @@ def convert_inverted_index_to_text(inverted_index: Dict[str, List[int]]) -> str:
     return " ".join(words)
 
 
+def parse_work(paper_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    把OpenAlex的work记录转换为论文信息字典
+
+    Args:
+        paper_data: OpenAlex API返回的work记录
+
+    Returns:
+        Dict: 论文信息
+    """
+    # 提取论文信息
+    paper = {
+        "title": paper_data.get("title", "未知标题"),
+        "abstract": "",  # 默认为空，稍后处理
+        "citations": paper_data.get("cited_by_count", 0),
+        "year": paper_data.get("publication_year", "未知年份"),
+        "venue": "",  # 需要从期刊/会议信息中提取
+        "paper_id": paper_data.get("id", "").replace("https://openalex.org/", ""),
+        "url": paper_data.get("id", ""),
+    }
+
+    # 处理摘要（OpenAlex 摘要是倒排索引格式）
+    if paper_data.get("abstract_inverted_index"):
+        paper["abstract"] = convert_inverted_index_to_text(
+            paper_data.get("abstract_inverted_index", {})
+        )
+
+    # 处理作者信息（作者很多时截断）
+    paper["authors"] = format_authors(
+        paper_data.get("authorships") or [],
+        truncated=bool(paper_data.get("is_authors_truncated")),
+    )
+
+    # 处理期刊/会议信息（host_venue已被OpenAlex移除，改用primary_location）
+    if paper_data.get("host_venue", {}).get("display_name"):
+        paper["venue"] = paper_data["host_venue"]["display_name"]
+    else:
+        source = (paper_data.get("primary_location") or {}).get("source") or {}
+        paper["venue"] = source.get("display_name") or ""
+
+    # 处理DOI信息
+    if paper_data.get("doi"):
+        paper["doi"] = paper_data["doi"]
+        paper["doi_url"] = f"https://doi.org/{paper['doi']}"
+
+    return paper
+
+
+def build_search_url(
+    query: str,
+    per_page: int,
+    fuzzy_search: bool = False,
+    sort_by: str = "relevance",
+    year_start: Optional[int] = None,
+    year_end: Optional[int] = None,
+    filters: Optional[List[str]] = None,
+    select: bool = True,
+) -> str:
+    """
+    构建OpenAlex /works 搜索URL
+
+    所有过滤条件合并到同一个filter参数中（逗号表示同时满足）
+
+    Args:
+        query: 搜索关键词
+        per_page: 每页结果数
+        fuzzy_search: 为True时在标题、摘要和全文中搜索，否则只搜索标题
+        sort_by: 排序方式，同search_scholar
+        year_start: 开始年份，可选
+        year_end: 结束年份，可选
+        filters: 额外的过滤条件，如 "from_publication_date:2024-01-01"
+        select: 是否只请求解析需要的字段（group_by请求不能带select）
+
+    Returns:
+        str: 请求URL
+    """
+    encoded_query = quote_plus(query)
+    filter_parts = []
+    if fuzzy_search:
+        # 模糊搜索：使用标题、摘要或关键词匹配
+        url = f"{OPENALEX_API}/works?search={encoded_query}"
+    else:
+        # 精确搜索：在标题中搜索
+        url = f"{OPENALEX_API}/works?"
+        filter_parts.append(f"title.search:{encoded_query}")
+
+    # 年份过滤条件
+    if year_start is not None:
+        filter_parts.append(f"publication_year:>{year_start-1}")
+    if year_end is not None:
+        filter_parts.append(f"publication_year:<{year_end+1}")
+    filter_parts.extend(filters or [])
+
+    if filter_parts:
+        url += ("" if url.endswith("?") else "&") + "filter=" + ",".join(filter_parts)
+
+    # 设置电子邮件参数（礼貌请求）
+    url += f"{_mailto('&')}&per_page={per_page}"
+    if select:
+        url += _select()
+
+    # 添加排序方式
+    if sort_by == "citations":
+        url += "&sort=cited_by_count:desc"
+    elif sort_by == "date":
+        url += "&sort=publication_date:desc"
+    elif sort_by == "title":
+        url += "&sort=title:asc"
+    # 相关性(relevance)是默认排序，不需要额外参数
+    return url
+
+
+# research_trends的分组维度 -> OpenAlex group_by字段
+GROUP_BY_FIELDS = {
+    "year": "publication_year",
+    "venue": "primary_location.source.id",
+    "institution": "authorships.institutions.lineage",
+    "concept": "concepts.id",
+}
+
+
+@traced("scholar.group_works")
+async def group_works(
+    query: str,
+    dimension: str,
+    fuzzy_search: bool = False,
+    year_start: Optional[int] = None,
+    year_end: Optional[int] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    用OpenAlex的group_by在服务端统计匹配论文的分布，不下载论文本身
+
+    查询和年份过滤与search_scholar相同
+
+    Args:
+        query: 搜索关键词
+        dimension: 分组维度，GROUP_BY_FIELDS中的键
+        fuzzy_search: 是否启用模糊搜索
+        year_start: 开始年份，可选
+        year_end: 结束年份，可选
+
+    Returns:
+        Dict: total（匹配的论文总数）、groups（按数量从多到少的 key/name/count 列表）、
+            unknown（缺少该字段的论文数），出错时返回None
+
+    Raises:
+        ValueError: 不支持的分组维度
+    """
+    if dimension not in GROUP_BY_FIELDS:
+        raise ValueError(
+            f"不支持的分组维度: {dimension}，可选: {', '.join(GROUP_BY_FIELDS)}"
+        )
+    try:
+        url = build_search_url(
+            query,
+            OPENALEX_MAX_PER_PAGE,
+            fuzzy_search=fuzzy_search,
+            year_start=year_start,
+            year_end=year_end,
+            select=False,
+        )
+        url += f"&group_by={GROUP_BY_FIELDS[dimension]}"
+
+        async with upstream.session(timeout=15.0) as client:
+            response = await _http_get(
+                client, url, f"/works?group_by={GROUP_BY_FIELDS[dimension]}"
+            )
+            if response.status_code != 200:
+                logger.warning(
+                    f"OpenAlex分组统计错误: {response.status_code} - {response.text}"
+                )
+                return None
+            data = _decode_json(response)
+
+        groups = []
+        unknown = 0
+        for group in data.get("group_by", []):
+            key = str(group.get("key", "")).replace("https://openalex.org/", "")
+            if not key or key == "unknown":
+                unknown += group.get("count", 0)
+                continue
+            groups.append(
+                {
+                    "key": key,
+                    "name": group.get("key_display_name") or key,
+                    "count": group.get("count", 0),
+                }
+            )
+        return {
+            "total": data.get("meta", {}).get("count", 0),
+            "groups": groups,
+            "unknown": unknown,
+        }
+    except Exception as e:
+        logger.error(f"OpenAlex分组统计时出错: {str(e)}")
+        deadline.mark_if_expired(e)
+        return None
+
+
+@traced("scholar.search_scholar")
 async def search_scholar(
     query: str,
     count: int = 5,
@@ -129,6 +464,7 @@ async def search_scholar(
     sort_by: str = "relevance",
     year_start: Optional[int] = None,
     year_end: Optional[int] = None,
+    rerank: bool = False,
 ) -> List[Dict[str, Any]]:
     """
     使用OpenAlex API搜索学术论文
@@ -144,111 +480,179 @@ async def search_scholar(
             - "title": 按标题字母顺序排序
         year_start: 开始年份，可选
         year_end: 结束年份，可选
+        rerank: 是否获取更多候选论文，并按标题和摘要的本地BM25得分重新排序
 
     Returns:
         List[Dict]: 论文信息列表
     """
     results = []
+    per_page = _rerank_pool_size(count) if rerank else count * 2
     try:
-        # 构建搜索查询
-        encoded_query = quote_plus(query)
-
-        # 设置电子邮件参数（礼貌请求）
-        email_param = f"&mailto={EMAIL}" if EMAIL else ""
-
-        # 搜索参数设置
-        if fuzzy_search:
-            # 模糊搜索：使用标题、摘要或关键词匹配
-            search_url = f"{OPENALEX_API}/works?search={encoded_query}{email_param}&per_page={count*2}"
-        else:
-            # 精确搜索：在标题中搜索
-            search_url = f"{OPENALEX_API}/works?filter=title.search:{encoded_query}{email_param}&per_page={count*2}"
-
-        # 添加年份过滤条件
-        if year_start is not None or year_end is not None:
-            year_filter = ""
-            if year_start is not None and year_end is not None:
-                year_filter = f"&filter=publication_year:>{year_start-1},publication_year:<{year_end+1}"
-            elif year_start is not None:
-                year_filter = f"&filter=publication_year:>{year_start-1}"
-            elif year_end is not None:
-                year_filter = f"&filter=publication_year:<{year_end+1}"
-            search_url += year_filter
-
-        # 添加排序方式
-        if sort_by == "citations":
-            search_url += "&sort=cited_by_count:desc"
-        elif sort_by == "date":
-            search_url += "&sort=publication_date:desc"
-        elif sort_by == "title":
-            search_url += "&sort=title:asc"
-        # 相关性(relevance)是默认排序，不需要额外参数
+        search_url = build_search_url(
+            query,
+            per_page,
+            fuzzy_search=fuzzy_search,
+            sort_by=sort_by,
+            year_start=year_start,
+            year_end=year_end,
+        )
 
         # 准备API请求
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            response = await client.get(search_url)
+        async with upstream.session(timeout=15.0) as client:
+            response = await _http_get(
+                client,
+                search_url,
+                (
+                    "/works?search={query}"
+                    if fuzzy_search
+                    else "/works?filter=title.search:{query}"
+                ),
+            )
 
             if response.status_code == 200:
-                data = response.json()
-                papers = data.get("results", [])
-
-                for paper_data in papers:
-                    # 提取论文信息
-                    paper = {
-                        "title": paper_data.get("title", "未知标题"),
-                        "abstract": "",  # 默认为空，稍后处理
-                        "citations": paper_data.get("cited_by_count", 0),
-                        "year": paper_data.get("publication_year", "未知年份"),
-                        "venue": "",  # 需要从期刊/会议信息中提取
-                        "paper_id": paper_data.get("id", "").replace(
-                            "https://openalex.org/", ""
-                        ),
-                        "url": paper_data.get("id", ""),
-                    }
-
-                    # 处理摘要（OpenAlex 摘要是倒排索引格式）
-                    if paper_data.get("abstract_inverted_index"):
-                        paper["abstract"] = convert_inverted_index_to_text(
-                            paper_data.get("abstract_inverted_index", {})
-                        )
-
-                    # 处理作者信息
-                    authors = paper_data.get("authorships", [])
-                    author_names = []
-                    for author in authors:
-                        if author.get("author", {}).get("display_name"):
-                            author_names.append(author["author"]["display_name"])
-                    paper["authors"] = ", ".join(author_names)
-
-                    # 处理期刊/会议信息
-                    if paper_data.get("host_venue", {}).get("display_name"):
-                        paper["venue"] = paper_data["host_venue"]["display_name"]
+                _, results = await _parse_results(response)
 
-                    # 处理DOI信息
-                    if paper_data.get("doi"):
-                        paper["doi"] = paper_data["doi"]
-                        paper["doi_url"] = f"https://doi.org/{paper['doi']}"
+                if rerank:
+                    with tracing.span("rank.bm25", candidates=len(results)):
+                        results = bm25_rerank(query, results)
 
-                    # 丰富摘要信息
-                    paper = await enrich_abstract(paper)
-
-                    results.append(paper)
+                # 合并预印本和正式发表版本等近似重复的论文，避免占用结果名额
+                if dedup_enabled():
+                    with tracing.span("rank.dedup", candidates=len(results)):
+                        results = dedupe_papers(results)
 
                 # 只返回需要的数量
-                return results[:count]
+                results = results[:count]
+
+                # 并发丰富摘要信息（可选步骤，时间预算不足时跳过）；
+                # 调用被取消时所有补全请求一起取消
+                if deadline.has_time_for_optional_stage():
+                    results = await upstream.gather(
+                        *(enrich_abstract(paper) for paper in results)
+                    )
+                elif results:
+                    deadline.mark_partial("abstract_enrichment_skipped")
+                return list(results)
             else:
-                print(f"OpenAlex API搜索错误: {response.status_code} - {response.text}")
+                logger.warning(
+                    f"OpenAlex API搜索错误: {response.status_code} - {response.text}"
+                )
                 return []
 
     except Exception as e:
-        print(f"搜索OpenAlex时出错: {str(e)}")
+        logger.error(f"搜索OpenAlex时出错: {str(e)}")
+        deadline.mark_if_expired(e)
         return []
 
 
+def parse_work_detail(paper_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    把OpenAlex的work记录转换为论文详情，在parse_work的基础上增加PDF链接和关键概念
+
+    Args:
+        paper_data: OpenAlex API返回的完整work记录
+
+    Returns:
+        Dict: 论文详细信息
+    """
+    result = parse_work(paper_data)
+
+    # 添加PDF链接（如果有）
+    if (paper_data.get("open_access") or {}).get("oa_url"):
+        result["pdf_url"] = paper_data["open_access"]["oa_url"]
+
+    # 添加关键概念
+    if paper_data.get("concepts"):
+        concepts = []
+        for concept in paper_data["concepts"]:
+            if (
+                concept.get("display_name") and concept.get("score", 0) > 0.5
+            ):  # 只添加相关性高的概念
+                concepts.append(concept["display_name"])
+        if concepts:
+            result["concepts"] = ", ".join(concepts)
+
+    return result
+
+
+async def _fetch_volatile(
+    client: upstream.UpstreamSession, keys: List[str]
+) -> List[Dict[str, Any]]:
+    url = (
+        f"{OPENALEX_API}/works?filter=openalex:{'|'.join(keys)}"
+        f"&select={','.join(VOLATILE_SELECT_FIELDS)}"
+        f"&per_page={REFRESH_BATCH_SIZE}{_mailto('&')}"
+    )
+    # 易变字段不写入响应缓存，否则下次刷新会读到缓存中的旧值
+    response = await _http_get(
+        client, url, "/works?filter=openalex:{ids}&select={volatile}", use_cache=False
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"OpenAlex API错误: {response.status_code}")
+    return _decode_json(response).get("results") or []
+
+
+@traced("scholar.refresh_volatile")
+async def refresh_volatile(keys: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    刷新本地记录中易变字段（引用量、逐年引用数）已过期的论文
+
+    每个请求带最多REFRESH_BATCH_SIZE个ID，只取id和易变字段，结果合并进本地记录；
+    静态字段已过期或没有保存过的论文不处理。刷新失败时保留旧记录，只记录日志
+
+    Args:
+        keys: work的短ID
+
+    Returns:
+        Dict[str, Dict]: 刷新成功的论文ID -> 新的易变字段
+    """
+    work_store = store.get_store()
+    if work_store is None:
+        return {}
+    stale = await asyncio.to_thread(
+        work_store.stale_keys, list(keys), store.max_age(), store.volatile_max_age()
+    )
+    if not stale:
+        return {}
+    batches = [
+        stale[i : i + REFRESH_BATCH_SIZE]
+        for i in range(0, len(stale), REFRESH_BATCH_SIZE)
+    ]
+
+    async def fetch_batch(
+        client: upstream.UpstreamSession, batch: List[str]
+    ) -> List[Dict[str, Any]]:
+        # 一批失败不影响其他批次
+        try:
+            return await _fetch_volatile(client, batch)
+        except Exception as e:
+            logger.warning(f"刷新 {len(batch)} 篇论文的引用量失败: {str(e)}")
+            deadline.mark_if_expired(e)
+            return []
+
+    patches: List[Dict[str, Any]] = []
+    async with upstream.session(timeout=10.0) as client:
+        for results in await upstream.gather(
+            *(fetch_batch(client, batch) for batch in batches)
+        ):
+            patches.extend(results)
+    await store.patch_works(patches)
+    logger.debug(f"刷新了 {len(patches)} 篇论文的引用量")
+    return {
+        store.work_id(patch): {
+            field: patch[field] for field in store.VOLATILE_FIELDS if field in patch
+        }
+        for patch in patches
+    }
+
+
+@traced("scholar.get_paper_detail")
 async def get_paper_detail(paper_id: str) -> Optional[Dict[str, Any]]:
     """
     通过OpenAlex API获取论文详情
 
+    OpenAlex ID在本地work记录存储中有未过期的记录时直接解析，不再请求
+
     Args:
         paper_id: 论文ID，可以是OpenAlex ID、DOI或ArXiv ID
 
@@ -257,7 +661,7 @@ async def get_paper_detail(paper_id: str) -> Optional[Dict[str, Any]]:
     """
     try:
         # 设置电子邮件参数（礼貌请求）
-        email_param = f"?mailto={EMAIL}" if EMAIL else ""
+        email_param = _mailto("?")
 
         # 确定使用什么ID类型
         if paper_id.startswith("10."):  # 看起来是DOI
@@ -269,72 +673,36 @@ async def get_paper_detail(paper_id: str) -> Optional[Dict[str, Any]]:
         else:  # 尝试作为OpenAlex ID (不带前缀的)
             api_url = f"{OPENALEX_API}/works/W{paper_id}{email_param}"
 
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(api_url)
-
-            if response.status_code == 200:
-                data = response.json()
-
-                # 提取论文详细信息
-                result = {
-                    "title": data.get("title", "未知标题"),
-                    "abstract": "",  # 默认为空，稍后处理
-                    "citations": data.get("cited_by_count", 0),
-                    "year": data.get("publication_year", "未知年份"),
-                    "venue": "",  # 需要从期刊/会议信息中提取
-                    "paper_id": data.get("id", "").replace("https://openalex.org/", ""),
-                    "url": data.get("id", ""),
-                }
+        if not paper_id.startswith("10.") and not paper_id.lower().startswith("arxiv:"):
+            stored = await store.load_work(
+                paper_id if paper_id.startswith("W") else f"W{paper_id}"
+            )
+            if stored is not None:
+                # 静态字段仍有效，引用量过期时只刷新易变字段
+                refreshed = await refresh_volatile([store.work_id(stored)])
+                stored.update(refreshed.get(store.work_id(stored), {}))
+                return parse_work_detail(stored)
 
-                # 处理摘要（OpenAlex 摘要是倒排索引格式）
-                if data.get("abstract_inverted_index"):
-                    result["abstract"] = convert_inverted_index_to_text(
-                        data.get("abstract_inverted_index", {})
-                    )
+        async with upstream.session(timeout=10.0) as client:
+            response = await _http_get(client, api_url, "/works/{paper_id}")
 
-                # 处理作者信息
-                authors = data.get("authorships", [])
-                author_names = []
-                for author in authors:
-                    if author.get("author", {}).get("display_name"):
-                        author_names.append(author["author"]["display_name"])
-                result["authors"] = ", ".join(author_names)
-
-                # 处理期刊/会议信息
-                if data.get("host_venue", {}).get("display_name"):
-                    result["venue"] = data["host_venue"]["display_name"]
-
-                # 处理DOI信息
-                if data.get("doi"):
-                    result["doi"] = data["doi"]
-                    result["doi_url"] = f"https://doi.org/{result['doi']}"
-
-                # 添加PDF链接（如果有）
-                if data.get("open_access", {}).get("oa_url"):
-                    result["pdf_url"] = data["open_access"]["oa_url"]
-
-                # 添加关键概念
-                if data.get("concepts"):
-                    concepts = []
-                    for concept in data["concepts"]:
-                        if (
-                            concept.get("display_name")
-                            and concept.get("score", 0) > 0.5
-                        ):  # 只添加相关性高的概念
-                            concepts.append(concept["display_name"])
-                    if concepts:
-                        result["concepts"] = ", ".join(concepts)
-
-                return result
+            if response.status_code == 200:
+                data = _decode_json(response)
+                await store.save_works([data])
+                return parse_work_detail(data)
             else:
-                print(f"获取论文详情错误: {response.status_code} - {response.text}")
+                logger.warning(
+                    f"获取论文详情错误: {response.status_code} - {response.text}"
+                )
                 return None
 
     except Exception as e:
-        print(f"获取论文详情时出错: {str(e)}")
+        logger.error(f"获取论文详情时出错: {str(e)}")
+        deadline.mark_if_expired(e)
         return None
 
 
+@traced("scholar.get_paper_references")
 async def get_paper_references(
     paper_id: str, count: int = 5, sort_by: str = "relevance"
 ) -> List[Dict[str, Any]]:
@@ -356,7 +724,7 @@ async def get_paper_references(
     results = []
     try:
         # 设置电子邮件参数（礼貌请求）
-        email_param = f"&mailto={EMAIL}" if EMAIL else ""
+        email_param = _mailto("&")
 
         # 确定API ID
         openalex_id = paper_id
@@ -371,18 +739,20 @@ async def get_paper_references(
             )
 
             # 查询以获取OpenAlex ID
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                id_response = await client.get(
-                    f"{OPENALEX_API}/works/{id_type}:{id_value}?mailto={EMAIL if EMAIL else ''}"
+            async with upstream.session(timeout=10.0) as client:
+                id_response = await _http_get(
+                    client,
+                    f"{OPENALEX_API}/works/{id_type}:{id_value}{_mailto('?')}",
+                    "/works/{id_type}:{id}",
                 )
 
                 if id_response.status_code == 200:
-                    id_data = id_response.json()
+                    id_data = _decode_json(id_response)
                     openalex_id = id_data.get("id", "").replace(
                         "https://openalex.org/", ""
                     )
                 else:
-                    print(f"获取OpenAlex ID错误: {id_response.status_code}")
+                    logger.warning(f"获取OpenAlex ID错误: {id_response.status_code}")
                     return []
 
         # 去掉可能的前缀
@@ -390,7 +760,10 @@ async def get_paper_references(
             openalex_id = openalex_id[1:]
 
         # 构建引用查询
-        citations_url = f"{OPENALEX_API}/works?filter=cites:W{openalex_id}{email_param}&per_page={count}"
+        # 合并近似重复论文时多取一些，保证合并后仍有count篇
+        dedup = dedup_enabled()
+        per_page = count * 2 if dedup else count
+        citations_url = f"{OPENALEX_API}/works?filter=cites:W{openalex_id}{email_param}&per_page={per_page}{_select()}"
 
         # 添加排序方式
         if sort_by == "citations":
@@ -401,62 +774,31 @@ async def get_paper_references(
             citations_url += "&sort=title:asc"
         # 相关性(relevance)是默认排序，不需要额外参数
 
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            response = await client.get(citations_url)
+        async with upstream.session(timeout=15.0) as client:
+            response = await _http_get(
+                client, citations_url, "/works?filter=cites:{paper_id}"
+            )
 
             if response.status_code == 200:
-                data = response.json()
-                citation_papers = data.get("results", [])
-
-                for paper_data in citation_papers:
-                    # 提取论文信息
-                    paper = {
-                        "title": paper_data.get("title", "未知标题"),
-                        "abstract": "",  # 默认为空，稍后处理
-                        "citations": paper_data.get("cited_by_count", 0),
-                        "year": paper_data.get("publication_year", "未知年份"),
-                        "venue": "",  # 需要从期刊/会议信息中提取
-                        "paper_id": paper_data.get("id", "").replace(
-                            "https://openalex.org/", ""
-                        ),
-                        "url": paper_data.get("id", ""),
-                    }
-
-                    # 处理摘要（OpenAlex 摘要是倒排索引格式）
-                    if paper_data.get("abstract_inverted_index"):
-                        paper["abstract"] = convert_inverted_index_to_text(
-                            paper_data.get("abstract_inverted_index", {})
-                        )
-
-                    # 处理作者信息
-                    authors = paper_data.get("authorships", [])
-                    author_names = []
-                    for author in authors:
-                        if author.get("author", {}).get("display_name"):
-                            author_names.append(author["author"]["display_name"])
-                    paper["authors"] = ", ".join(author_names)
-
-                    # 处理期刊/会议信息
-                    if paper_data.get("host_venue", {}).get("display_name"):
-                        paper["venue"] = paper_data["host_venue"]["display_name"]
-
-                    # 处理DOI信息
-                    if paper_data.get("doi"):
-                        paper["doi"] = paper_data["doi"]
-                        paper["doi_url"] = f"https://doi.org/{paper['doi']}"
+                _, results = await _parse_results(response)
 
-                    results.append(paper)
-
-                return results
+                if dedup:
+                    with tracing.span("rank.dedup", candidates=len(results)):
+                        results = dedupe_papers(results)
+                return results[:count]
             else:
-                print(f"获取论文引用错误: {response.status_code} - {response.text}")
+                logger.warning(
+                    f"获取论文引用错误: {response.status_code} - {response.text}"
+                )
                 return []
 
     except Exception as e:
-        print(f"获取论文引用时出错: {str(e)}")
+        logger.error(f"获取论文引用时出错: {str(e)}")
+        deadline.mark_if_expired(e)
         return []
 
 
+@traced("scholar.convert_google_scholar_to_openalex")
 async def convert_google_scholar_to_openalex(google_id: str) -> str:
     """
     尝试将谷歌学术ID转换为OpenAlex学者ID
@@ -471,9 +813,14 @@ async def convert_google_scholar_to_openalex(google_id: str) -> str:
         # 尝试从谷歌学术页面获取学者姓名
         scholar_url = f"https://scholar.google.com/citations?user={google_id}"
 
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with upstream.session(timeout=10.0) as client:
             # 获取谷歌学术页面
-            response = await client.get(scholar_url, follow_redirects=True)
+            response = await _http_get(
+                client,
+                scholar_url,
+                "scholar.google.com/citations?user={google_id}",
+                follow_redirects=True,
+            )
 
             if response.status_code == 200:
                 # 使用简单的正则表达式从HTML中提取学者姓名
@@ -482,16 +829,18 @@ async def convert_google_scholar_to_openalex(google_id: str) -> str:
 
                 if name_match:
                     scholar_name = name_match.group(1).strip()
-                    print(f"从谷歌学术获取到学者姓名: {scholar_name}")
+                    logger.info(f"从谷歌学术获取到学者姓名: {scholar_name}")
 
                     # 使用姓名在OpenAlex中搜索作者
-                    email_param = f"&mailto={EMAIL}" if EMAIL else ""
+                    email_param = _mailto("&")
                     search_url = f"{OPENALEX_API}/authors?search={quote_plus(scholar_name)}{email_param}&per_page=5"
 
-                    search_response = await client.get(search_url)
+                    search_response = await _http_get(
+                        client, search_url, "/authors?search={name}"
+                    )
 
                     if search_response.status_code == 200:
-                        data = search_response.json()
+                        data = _decode_json(search_response)
                         results = data.get("results", [])
 
                         if results:
@@ -502,11 +851,12 @@ async def convert_google_scholar_to_openalex(google_id: str) -> str:
                                 .replace("https://openalex.org/", "")
                             )
 
-        print(f"无法将谷歌学术ID {google_id} 转换为OpenAlex ID")
+        logger.warning(f"无法将谷歌学术ID {google_id} 转换为OpenAlex ID")
         return ""  # 如果无法转换，返回空字符串
 
     except Exception as e:
-        print(f"转换谷歌学术ID时出错: {str(e)}")
+        logger.error(f"转换谷歌学术ID时出错: {str(e)}")
+        deadline.mark_if_expired(e)
         return ""
 
 
@@ -536,7 +886,7 @@ def extract_profile_id_from_url(url: str) -> str:
             orcid = parts[1].strip()
             if orcid:
                 # 这里需要查询OpenAlex来获取对应的ID
-                print(f"发现ORCID: {orcid}，需要查询OpenAlex获取作者ID")
+                logger.info(f"发现ORCID: {orcid}，需要查询OpenAlex获取作者ID")
                 return f"orcid:{orcid}"  # 返回ORCID格式的ID
 
     # 处理谷歌学术URL (需要额外查询)
@@ -546,10 +896,39 @@ def extract_profile_id_from_url(url: str) -> str:
             google_id = match.group(1)
             return f"google:{google_id}"  # 返回谷歌学术格式的ID，稍后会自动转换
 
-    print(f"警告: 无法从URL提取OpenAlex学者ID: {url}")
+    logger.warning(f"无法从URL提取OpenAlex学者ID: {url}")
     return ""
 
 
+async def author_filter(value: str) -> str:
+    """
+    把作者标识解析为OpenAlex works接口的过滤条件
+
+    Args:
+        value: OpenAlex作者ID、OpenAlex/ORCID/谷歌学术主页URL或谷歌学术ID
+
+    Returns:
+        str: "author.id:A..." 或 "author.orcid:..."
+
+    Raises:
+        ValueError: 无法解析作者
+    """
+    value = value.strip()
+    if "/" in value:
+        value = extract_profile_id_from_url(value)
+    if value.startswith("orcid:"):
+        return f"author.orcid:{value[len('orcid:'):]}"
+    if value and not re.fullmatch(r"A?\d+", value):
+        # 谷歌学术ID，先转换为OpenAlex作者ID
+        value = await convert_google_scholar_to_openalex(value.replace("google:", ""))
+    if not value:
+        raise ValueError("无法解析作者ID")
+    if not value.startswith("A"):
+        value = f"A{value}"
+    return f"author.id:{value}"
+
+
+@traced("scholar.parse_profile")
 async def parse_profile(
     profile_id: str, top_n: int = 5, sort_by: str = "relevance"
 ) -> List[Dict[str, Any]]:
@@ -570,7 +949,7 @@ async def parse_profile(
     """
     try:
         # 设置电子邮件参数（礼貌请求）
-        email_param = f"?mailto={EMAIL}" if EMAIL else ""
+        email_param = _mailto("?")
 
         # 处理谷歌学术ID
         if profile_id.startswith("google:"):
@@ -587,18 +966,22 @@ async def parse_profile(
             openalex_id = f"A{openalex_id}"
 
         # 获取作者信息
-        async with httpx.AsyncClient(timeout=15.0) as client:
+        async with upstream.session(timeout=15.0) as client:
             author_url = f"{OPENALEX_API}/authors/{openalex_id}{email_param}"
-            author_response = await client.get(author_url)
+            author_response = await _http_get(
+                client, author_url, "/authors/{author_id}"
+            )
 
             if author_response.status_code != 200:
-                print(f"未找到ID为{profile_id}的学者: {author_response.status_code}")
+                logger.warning(
+                    f"未找到ID为{profile_id}的学者: {author_response.status_code}"
+                )
                 return []
 
-            author_data = author_response.json()
+            author_data = _decode_json(author_response)
 
             # 获取作者论文
-            papers_url = f"{OPENALEX_API}/works?filter=author.id:{author_data['id']}{email_param}&per_page={top_n*2}"
+            papers_url = f"{OPENALEX_API}/works?filter=author.id:{author_data['id']}{email_param}&per_page={top_n*2}{_select()}"
 
             # 添加排序方式
             if sort_by == "citations":
@@ -609,57 +992,20 @@ async def parse_profile(
                 papers_url += "&sort=title:asc"
             # 相关性(relevance)是默认排序，不需要额外参数
 
-            papers_response = await client.get(papers_url)
+            papers_response = await _http_get(
+                client, papers_url, "/works?filter=author.id:{author_id}"
+            )
 
             if papers_response.status_code != 200:
-                print(f"获取学者论文错误: {papers_response.status_code}")
+                logger.warning(f"获取学者论文错误: {papers_response.status_code}")
                 return []
 
-            papers_data = papers_response.json()
-            papers = papers_data.get("results", [])
-            result_papers = []
-
-            for paper_data in papers:
-                # 提取论文信息
-                paper = {
-                    "title": paper_data.get("title", "未知标题"),
-                    "abstract": "",  # 默认为空，稍后处理
-                    "citations": paper_data.get("cited_by_count", 0),
-                    "year": paper_data.get("publication_year", "未知年份"),
-                    "venue": "",  # 需要从期刊/会议信息中提取
-                    "paper_id": paper_data.get("id", "").replace(
-                        "https://openalex.org/", ""
-                    ),
-                    "url": paper_data.get("id", ""),
-                }
-
-                # 处理摘要（OpenAlex 摘要是倒排索引格式）
-                if paper_data.get("abstract_inverted_index"):
-                    paper["abstract"] = convert_inverted_index_to_text(
-                        paper_data.get("abstract_inverted_index", {})
-                    )
-
-                # 处理作者信息
-                authors = paper_data.get("authorships", [])
-                author_names = []
-                for author in authors:
-                    if author.get("author", {}).get("display_name"):
-                        author_names.append(author["author"]["display_name"])
-                paper["authors"] = ", ".join(author_names)
-
-                # 处理期刊/会议信息
-                if paper_data.get("host_venue", {}).get("display_name"):
-                    paper["venue"] = paper_data["host_venue"]["display_name"]
-
-                # 处理DOI信息
-                if paper_data.get("doi"):
-                    paper["doi"] = paper_data["doi"]
-                    paper["doi_url"] = f"https://doi.org/{paper['doi']}"
-
-                result_papers.append(paper)
+            # 与搜索共用解析：大响应交给工作池，原始记录写入本地存储
+            _, result_papers = await _parse_results(papers_response)
 
             return result_papers[:top_n]
 
     except Exception as e:
-        print(f"解析学者档案时出错: {str(e)}")
+        logger.error(f"解析学者档案时出错: {str(e)}")
+        deadline.mark_if_expired(e)
         return []
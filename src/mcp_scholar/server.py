@@ -3,29 +3,41 @@ MCP Scholar 服务
 提供谷歌学术搜索、论文详情、引用信息和论文总结功能
 """
 
+import asyncio
+import functools
+import inspect
 import logging
 import sys
 import json
 from mcp.server.fastmcp import FastMCP, Context
 from mcp_scholar.scholar import (
+    GROUP_BY_FIELDS,
+    group_works,
     search_scholar,
     get_paper_detail,
     get_paper_references,
     parse_profile,
     extract_profile_id_from_url,
 )
-from typing import Dict, List, Any, Optional
+
+# 合作者网络、批量导出、保存的查询、健康检查等子系统在工具第一次用到时才导入，
+# 导入本模块只加载搜索路径需要的模块
+from mcp_scholar import compact, deadline, prefetch, upstream
+from mcp_scholar.admission import ServerBusy, get_controller
+from mcp_scholar.config import debug_enabled
+from mcp_scholar.logs import configure_logging
+from mcp_scholar.metrics import metrics
+from mcp_scholar.profiling import profiled
+from mcp_scholar.ranking import reciprocal_rank_fusion
+from mcp_scholar.tracing import traced
+from typing import Callable, Dict, List, Any, Optional
 
 logger = logging.getLogger(__name__)
-# 设置日志级别
-logging.basicConfig(level=logging.DEBUG)
 
 # 创建MCP服务器
 mcp = FastMCP(
     "ScholarServer",
     dependencies=["scholarly", "httpx", "beautifulsoup4"],
-    verbose=True,
-    debug=True,
 )
 
 # 预设提示词常量
@@ -89,8 +101,118 @@ def search_prompt() -> str:
     """
 
 
+# 不经过准入控制的工具，繁忙时也要能查看服务状态
+_ADMISSION_EXEMPT = {"health_check", "health_status", "server_metrics"}
+
+
+def _session_key(ctx: Optional[Context]) -> str:
+    """
+    区分调用方：依次使用请求元数据中的客户端ID、Mcp-Session-Id请求头和客户端地址
+
+    无状态的Streamable HTTP为每个请求创建新的会话对象，不能用会话对象区分调用方；
+    STDIO模式只有一个客户端
+    """
+    try:
+        client_id = ctx.client_id
+        request = ctx.request_context.request
+    except (AttributeError, ValueError):
+        return "default"
+    if client_id:
+        return client_id
+    headers = getattr(request, "headers", None)
+    if headers is not None:
+        session_id = headers.get("mcp-session-id")
+        if session_id:
+            return f"session-{session_id}"
+        client = getattr(request, "client", None)
+        if client is not None and client.host:
+            return f"addr-{client.host}"
+    return "default"
+
+
+def _admitted(fn: Callable) -> Callable:
+    """为工具调用添加准入控制，被拒绝时返回繁忙状态而不是报错"""
+    if fn.__name__ in _ADMISSION_EXEMPT:
+        return fn
+    returns_text = inspect.signature(fn).return_annotation is str
+
+    @functools.wraps(fn)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        from mcp_scholar import health, monitor
+
+        session_key = _session_key(kwargs.get("ctx"))
+        # 第一次工具调用时在当前事件循环中启动延迟监控和上游探测
+        monitor.ensure_started()
+        health.ensure_started()
+        try:
+            async with get_controller().admit(session_key):
+                # 上游请求按会话公平排队
+                with upstream.caller(session_key):
+                    return await fn(*args, **kwargs)
+        except ServerBusy as busy:
+            logger.warning(f"{fn.__name__} 调用被拒绝: {str(busy)}")
+            if returns_text:
+                return str(busy)
+            return {
+                "status": "busy",
+                "message": str(busy),
+                "reason": busy.reason,
+                "retry_after": busy.retry_after,
+            }
+
+    return wrapper
+
+
+def _budgeted(fn: Callable) -> Callable:
+    """
+    为工具调用设置时间预算（timeout_seconds参数或默认预算），排队和所有上游请求都计入预算
+
+    预算不足时跳过的步骤会让结果带上partial标记，而不是报错
+    """
+    returns_text = inspect.signature(fn).return_annotation is str
+
+    @functools.wraps(fn)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with deadline.budget(kwargs.get("timeout_seconds")) as partial:
+            result = await fn(*args, **kwargs)
+        if partial:
+            logger.warning(f"{fn.__name__} 返回部分结果: {', '.join(partial)}")
+            metrics.inc("tool.partial", tool=fn.__name__)
+            if returns_text:
+                result += f"\n\n> 注意：时间预算不足，以上结果不完整（{', '.join(partial)}）\n"
+            elif isinstance(result, dict) and result.get("status") == "success":
+                result["partial"] = True
+                result["partial_reasons"] = partial
+        return result
+
+    return wrapper
+
+
+def _cancellation_counted(fn: Callable) -> Callable:
+    """统计被客户端取消的工具调用；取消会沿着await链传递到所有上游请求"""
+
+    @functools.wraps(fn)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        try:
+            return await fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            logger.info(f"{fn.__name__} 调用已被取消")
+            metrics.inc("tool.cancelled", tool=fn.__name__)
+            raise
+
+    return wrapper
+
+
+def _instrumented(fn: Callable) -> Callable:
+    """为工具调用添加链路追踪（作为span树的根节点）、取消统计、时间预算、准入控制和按需性能剖析"""
+    return traced(f"tool.{fn.__name__}")(
+        _cancellation_counted(_budgeted(_admitted(profiled(fn.__name__)(fn))))
+    )
+
+
 # 工具函数
 @mcp.tool()
+@_instrumented
 async def scholar_search(
     ctx: Context,
     keywords: str,
@@ -99,6 +221,10 @@ async def scholar_search(
     sort_by: str = "relevance",
     year_start: Optional[int] = None,
     year_end: Optional[int] = None,
+    rerank: bool = False,
+    format: str = "full",
+    detail: str = "summary",
+    timeout_seconds: Optional[float] = None,
 ) -> Dict[str, Any]:
     """
     搜索谷歌学术并返回论文摘要
@@ -114,11 +240,20 @@ async def scholar_search(
             - "title": 按标题字母顺序排序
         year_start: 开始年份，可选
         year_end: 结束年份，可选
+        rerank: 是否获取更大的候选集并按标题和摘要与关键词的相关度(BM25)重新排序，
+            默认为False
+        format: 响应格式，full（默认，每篇论文一个字典）或compact（表格编码，省略空字段，
+            更节省token）
+        detail: compact格式下摘要的详细程度，minimal（不返回摘要）、summary（默认，截取开头）
+            或full（全文）
+        timeout_seconds: 本次调用的时间预算(秒)，可选，默认读取MCP_SCHOLAR_TOOL_TIMEOUT；
+            预算不足时跳过可选步骤并返回带partial标记的部分结果
 
     Returns:
         Dict: 包含论文列表的字典
     """
     try:
+        compact.validate(format, detail)
         search_mode = "模糊搜索" if fuzzy_search else "精确搜索"
         logger.info(f"正在进行{search_mode}谷歌学术: {keywords}...")
 
@@ -141,6 +276,7 @@ async def scholar_search(
             sort_by=sort_by,
             year_start=year_start,
             year_end=year_end,
+            rerank=rerank,
         )
 
         papers = []
@@ -158,27 +294,35 @@ async def scholar_search(
                     "venue": p.get("venue", ""),
                     "url": p.get("url", ""),  # 添加URL
                     "doi_url": p.get("doi_url", ""),  # 添加DOI URL
+                    "alternate_ids": p.get("alternate_ids", []),
                 }
             )
 
-        return {
+        # 后台预取排名靠前论文的详情，后续查看时直接命中缓存
+        prefetch.prefetch_top(p["paper_id"] for p in papers)
+        response = {
             "status": "success",
             "papers": papers,
             "search_mode": search_mode,
             "total_results": len(papers),
             "sort_by": sort_by,
+            "reranked": rerank,
             "year_filter": (
                 {"start": year_start, "end": year_end}
                 if (year_start or year_end)
                 else None
             ),
         }
+        return compact.shape_response(response, "papers", format, detail)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
     except Exception as e:
         logger.error(f"搜索失败: {str(e)}", exc_info=True)
         return {"status": "error", "message": "学术搜索服务暂时不可用", "error": str(e)}
 
 
 @mcp.tool()
+@_instrumented
 async def adaptive_search(
     ctx: Context,
     keywords: str,
@@ -187,6 +331,9 @@ async def adaptive_search(
     sort_by: str = "relevance",
     year_start: Optional[int] = None,
     year_end: Optional[int] = None,
+    format: str = "full",
+    detail: str = "summary",
+    timeout_seconds: Optional[float] = None,
 ) -> Dict[str, Any]:
     """
     自适应搜索谷歌学术，先尝试精确搜索，如果结果太少则自动切换到模糊搜索
@@ -202,11 +349,18 @@ async def adaptive_search(
             - "title": 按标题字母顺序排序
         year_start: 开始年份，可选
         year_end: 结束年份，可选
+        format: 响应格式，full（默认，每篇论文一个字典）或compact（表格编码，省略空字段，
+            更节省token）
+        detail: compact格式下摘要的详细程度，minimal（不返回摘要）、summary（默认，截取开头）
+            或full（全文）
+        timeout_seconds: 本次调用的时间预算(秒)，可选，默认读取MCP_SCHOLAR_TOOL_TIMEOUT；
+            预算不足时跳过可选步骤并返回带partial标记的部分结果
 
     Returns:
         Dict: 包含论文列表和搜索模式的字典
     """
     try:
+        compact.validate(format, detail)
         # 先进行精确搜索
         logger.info(f"开始自适应搜索流程，首先进行精确搜索: {keywords}...")
 
@@ -233,8 +387,12 @@ async def adaptive_search(
         search_mode = "精确搜索"
         final_results = precise_results
 
-        # 如果精确搜索结果太少，切换到模糊搜索
-        if len(precise_results) < min_results:
+        # 如果精确搜索结果太少，切换到模糊搜索（时间预算不足时跳过，返回精确搜索结果）
+        insufficient = len(precise_results) < min_results
+        if insufficient and not deadline.has_time_for_optional_stage():
+            logger.info("时间预算不足，跳过模糊搜索回退")
+            deadline.mark_partial("fuzzy_fallback_skipped")
+        elif insufficient:
             logger.info(
                 f"精确搜索结果不足({len(precise_results)}<{min_results})，切换到模糊搜索"
             )
@@ -262,10 +420,12 @@ async def adaptive_search(
                     "venue": p.get("venue", ""),
                     "url": p.get("url", ""),  # 添加URL
                     "doi_url": p.get("doi_url", ""),  # 添加DOI URL
+                    "alternate_ids": p.get("alternate_ids", []),
                 }
             )
 
-        return {
+        prefetch.prefetch_top(p["paper_id"] for p in papers)
+        response = {
             "status": "success",
             "papers": papers,
             "search_mode": search_mode,
@@ -277,18 +437,229 @@ async def adaptive_search(
                 else None
             ),
         }
+        return compact.shape_response(response, "papers", format, detail)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
     except Exception as e:
         logger.error(f"自适应搜索失败: {str(e)}", exc_info=True)
         return {"status": "error", "message": "学术搜索服务暂时不可用", "error": str(e)}
 
 
+# multi_search一次最多执行的查询数
+MAX_MULTI_QUERIES = 8
+
+
 @mcp.tool()
-async def paper_detail(ctx: Context, paper_id: str) -> Dict[str, Any]:
+@_instrumented
+async def multi_search(
+    ctx: Context,
+    queries: List[str],
+    count: int = 10,
+    per_query_count: int = 10,
+    fuzzy_search: bool = False,
+    year_start: Optional[int] = None,
+    year_end: Optional[int] = None,
+    format: str = "full",
+    detail: str = "summary",
+    timeout_seconds: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    并发执行多个关键词变体的搜索，合并去重后按倒数排名融合(RRF)排序
+
+    Args:
+        queries: 搜索关键词列表，最多8个，重复的关键词只搜索一次
+        count: 合并后返回的结果数量，默认为10
+        per_query_count: 每个查询获取的结果数量，默认为10
+        fuzzy_search: 是否使用模糊搜索，默认为False
+        year_start: 开始年份，可选
+        year_end: 结束年份，可选
+        format: 响应格式，full（默认，每篇论文一个字典）或compact（表格编码，省略空字段，
+            更节省token）
+        detail: compact格式下摘要的详细程度，minimal（不返回摘要）、summary（默认，截取开头）
+            或full（全文）
+        timeout_seconds: 本次调用的时间预算(秒)，可选，默认读取MCP_SCHOLAR_TOOL_TIMEOUT；
+            预算不足时跳过可选步骤并返回带partial标记的部分结果
+
+    Returns:
+        Dict: 合并后的论文列表，每篇论文带有命中的查询matched_queries
+    """
+    try:
+        compact.validate(format, detail)
+        unique_queries = []
+        seen = set()
+        for query in queries:
+            normalized = " ".join(query.split()).lower()
+            if normalized and normalized not in seen:
+                seen.add(normalized)
+                unique_queries.append(query.strip())
+        if not unique_queries:
+            return {"status": "error", "message": "至少需要一个非空的搜索关键词"}
+        if len(unique_queries) > MAX_MULTI_QUERIES:
+            return {
+                "status": "error",
+                "message": f"一次最多执行{MAX_MULTI_QUERIES}个查询",
+            }
+
+        logger.info(f"并发执行{len(unique_queries)}个查询: {unique_queries}")
+        # 所有查询共享同一个上游速率预算；调用被取消时一起取消
+        ranked = await upstream.gather(
+            *(
+                search_scholar(
+                    query,
+                    per_query_count,
+                    fuzzy_search=fuzzy_search,
+                    year_start=year_start,
+                    year_end=year_end,
+                )
+                for query in unique_queries
+            )
+        )
+        merged = reciprocal_rank_fusion(list(zip(unique_queries, ranked)), limit=count)
+
+        papers = []
+        for p in merged:
+            papers.append(
+                {
+                    "title": p["title"],
+                    "authors": p["authors"],
+                    "abstract": p["abstract"],
+                    "citations": p["citations"],
+                    "year": p.get("year", "Unknown"),
+                    "paper_id": p.get("paper_id", None),
+                    "venue": p.get("venue", ""),
+                    "url": p.get("url", ""),
+                    "doi_url": p.get("doi_url", ""),
+                    "alternate_ids": p.get("alternate_ids", []),
+                    "matched_queries": p["matched_queries"],
+                    "rrf_score": p["rrf_score"],
+                }
+            )
+
+        prefetch.prefetch_top(p["paper_id"] for p in papers)
+        response = {
+            "status": "success",
+            "papers": papers,
+            "queries": unique_queries,
+            "results_per_query": {
+                query: len(results) for query, results in zip(unique_queries, ranked)
+            },
+            "total_results": len(papers),
+        }
+        return compact.shape_response(response, "papers", format, detail)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    except Exception as e:
+        logger.error(f"多查询搜索失败: {str(e)}", exc_info=True)
+        return {"status": "error", "message": "学术搜索服务暂时不可用", "error": str(e)}
+
+
+@mcp.tool()
+@_instrumented
+async def research_trends(
+    ctx: Context,
+    query: str,
+    dimensions: Optional[List[str]] = None,
+    fuzzy_search: bool = False,
+    year_start: Optional[int] = None,
+    year_end: Optional[int] = None,
+    top_n: int = 10,
+    timeout_seconds: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    统计某个主题论文的分布（逐年数量、主要期刊/会议、机构、概念），由OpenAlex在服务端聚合，
+    适合回答"X方向的研究每年增长了多少"、"X方向的主要发表渠道有哪些"，不需要下载论文
+
+    Args:
+        query: 搜索关键词，含义与scholar_search相同
+        dimensions: 统计维度列表，可选 year、venue、institution、concept，默认为 ["year", "venue"]
+        fuzzy_search: 是否使用模糊搜索，默认为False
+        year_start: 开始年份，可选
+        year_end: 结束年份，可选
+        top_n: venue、institution、concept维度返回的前N项，默认为10
+        timeout_seconds: 本次调用的时间预算(秒)，可选，默认读取MCP_SCHOLAR_TOOL_TIMEOUT
+
+    Returns:
+        Dict: 匹配的论文总数和各维度的直方图；year维度为 {年份: 数量}，
+            其他维度为按数量排序的 {id, name, count} 列表
+    """
+    try:
+        dimensions = list(dict.fromkeys(dimensions or ["year", "venue"]))
+        invalid = [d for d in dimensions if d not in GROUP_BY_FIELDS]
+        if invalid:
+            return {
+                "status": "error",
+                "message": f"不支持的统计维度: {', '.join(invalid)}，"
+                f"可选: {', '.join(GROUP_BY_FIELDS)}",
+            }
+
+        logger.info(f"正在统计 {query} 的{'、'.join(dimensions)}分布...")
+        grouped = await upstream.gather(
+            *(
+                group_works(
+                    query,
+                    dimension,
+                    fuzzy_search=fuzzy_search,
+                    year_start=year_start,
+                    year_end=year_end,
+                )
+                for dimension in dimensions
+            )
+        )
+
+        histograms: Dict[str, Any] = {}
+        failed = []
+        total = None
+        for dimension, result in zip(dimensions, grouped):
+            if result is None:
+                failed.append(dimension)
+                continue
+            total = result["total"]
+            if dimension == "year":
+                counts = {int(g["key"]): g["count"] for g in result["groups"]}
+                if counts:
+                    # 补齐没有论文的年份，便于看出增长趋势
+                    first = max(min(counts), year_start or min(counts))
+                    last = min(max(counts), year_end or max(counts))
+                    histograms[dimension] = {
+                        str(year): counts.get(year, 0)
+                        for year in range(first, last + 1)
+                    }
+                else:
+                    histograms[dimension] = {}
+            else:
+                histograms[dimension] = [
+                    {"id": g["key"], "name": g["name"], "count": g["count"]}
+                    for g in result["groups"][: max(1, top_n)]
+                ]
+
+        if not histograms:
+            return {"status": "error", "message": "趋势统计服务暂时不可用"}
+        response = {
+            "status": "success",
+            "query": query,
+            "total_works": total,
+            "histograms": histograms,
+        }
+        if failed:
+            response["failed_dimensions"] = failed
+        return response
+    except Exception as e:
+        logger.error(f"趋势统计失败: {str(e)}", exc_info=True)
+        return {"status": "error", "message": "趋势统计服务暂时不可用", "error": str(e)}
+
+
+@mcp.tool()
+@_instrumented
+async def paper_detail(
+    ctx: Context, paper_id: str, timeout_seconds: Optional[float] = None
+) -> Dict[str, Any]:
     """
     获取论文详细信息
 
     Args:
         paper_id: 论文ID
+        timeout_seconds: 本次调用的时间预算(秒)，可选，默认读取MCP_SCHOLAR_TOOL_TIMEOUT；
+            预算不足时跳过可选步骤并返回带partial标记的部分结果
 
     Returns:
         Dict: 论文详细信息
@@ -319,8 +690,15 @@ async def paper_detail(ctx: Context, paper_id: str) -> Dict[str, Any]:
 
 
 @mcp.tool()
+@_instrumented
 async def paper_references(
-    ctx: Context, paper_id: str, count: int = 5, sort_by: str = "relevance"
+    ctx: Context,
+    paper_id: str,
+    count: int = 5,
+    sort_by: str = "relevance",
+    format: str = "full",
+    detail: str = "summary",
+    timeout_seconds: Optional[float] = None,
 ) -> Dict[str, Any]:
     """
     获取引用指定论文的文献列表
@@ -333,11 +711,18 @@ async def paper_references(
             - "citations": 按引用量排序
             - "date": 按发表日期排序（新到旧）
             - "title": 按标题字母顺序排序
+        format: 响应格式，full（默认，每篇论文一个字典）或compact（表格编码，省略空字段，
+            更节省token）
+        detail: compact格式下摘要的详细程度，minimal（不返回摘要）、summary（默认，截取开头）
+            或full（全文）
+        timeout_seconds: 本次调用的时间预算(秒)，可选，默认读取MCP_SCHOLAR_TOOL_TIMEOUT；
+            预算不足时跳过可选步骤并返回带partial标记的部分结果
 
     Returns:
         Dict: 引用论文列表
     """
     try:
+        compact.validate(format, detail)
         # 移除进度显示
         logger.info(f"正在获取论文ID为 {paper_id} 的引用...")
         references = await get_paper_references(paper_id, count, sort_by=sort_by)
@@ -354,14 +739,19 @@ async def paper_references(
                     "paper_id": ref.get("paper_id", None),
                     "url": ref.get("url", ""),  # 添加URL
                     "doi_url": ref.get("doi_url", ""),  # 添加DOI URL
+                    "alternate_ids": ref.get("alternate_ids", []),
                 }
             )
 
-        return {
+        prefetch.prefetch_top(ref["paper_id"] for ref in refs)
+        response = {
             "status": "success",
             "references": refs,
             "sort_by": sort_by,
         }
+        return compact.shape_response(response, "references", format, detail)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
     except Exception as e:
         error_msg = f"获取论文引用失败: {str(e)}"
         # 移除错误通知
@@ -370,8 +760,15 @@ async def paper_references(
 
 
 @mcp.tool()
+@_instrumented
 async def profile_papers(
-    ctx: Context, profile_url: str, count: int = 5, sort_by: str = "relevance"
+    ctx: Context,
+    profile_url: str,
+    count: int = 5,
+    sort_by: str = "relevance",
+    format: str = "full",
+    detail: str = "summary",
+    timeout_seconds: Optional[float] = None,
 ) -> Dict[str, Any]:
     """
     获取学者的论文
@@ -384,11 +781,18 @@ async def profile_papers(
             - "citations": 按引用量排序
             - "date": 按发表日期排序（新到旧）
             - "title": 按标题字母顺序排序
+        format: 响应格式，full（默认，每篇论文一个字典）或compact（表格编码，省略空字段，
+            更节省token）
+        detail: compact格式下摘要的详细程度，minimal（不返回摘要）、summary（默认，截取开头）
+            或full（全文）
+        timeout_seconds: 本次调用的时间预算(秒)，可选，默认读取MCP_SCHOLAR_TOOL_TIMEOUT；
+            预算不足时跳过可选步骤并返回带partial标记的部分结果
 
     Returns:
         Dict: 论文列表
     """
     try:
+        compact.validate(format, detail)
         # 移除进度显示
         logger.info(f"正在解析个人主页 {profile_url}...")
         profile_id = extract_profile_id_from_url(profile_url)
@@ -416,11 +820,14 @@ async def profile_papers(
                 }
             )
 
-        return {
+        response = {
             "status": "success",
             "papers": result_papers,
             "sort_by": sort_by,
         }
+        return compact.shape_response(response, "papers", format, detail)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
     except Exception as e:
         error_msg = f"获取学者论文失败: {str(e)}"
         # 移除错误通知
@@ -429,6 +836,49 @@ async def profile_papers(
 
 
 @mcp.tool()
+@_instrumented
+async def coauthor_network(
+    ctx: Context,
+    author: str,
+    top_n: int = 20,
+    max_works: int = 5000,
+    timeout_seconds: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    分析学者的合作者网络：遍历学者的全部作品，统计与每位合作者合作的论文数和年份范围
+
+    Args:
+        author: OpenAlex作者ID，或OpenAlex、ORCID、谷歌学术个人主页URL
+        top_n: 返回的合作者数，默认为20，最多200
+        max_works: 最多分析的作品数，默认为5000
+        timeout_seconds: 本次调用的时间预算(秒)，可选，默认读取MCP_SCHOLAR_TOOL_TIMEOUT；
+            预算用完时返回带partial标记的已分析部分结果
+
+    Returns:
+        Dict: 合作次数最多的合作者（id、name、works、first_year、last_year），
+            以及这些合作者之间的合作边 [下标, 下标, 合作论文数]
+    """
+    from mcp_scholar import coauthors
+
+    try:
+        logger.info(f"正在分析 {author} 的合作者网络...")
+        result = await coauthors.coauthor_network(
+            author, top_n=top_n, max_works=max(1, max_works)
+        )
+        return {"status": "success", **result}
+    except (ValueError, RuntimeError) as e:
+        return {"status": "error", "message": str(e)}
+    except Exception as e:
+        logger.error(f"分析合作者网络失败: {str(e)}", exc_info=True)
+        return {
+            "status": "error",
+            "message": "合作者网络服务暂时不可用",
+            "error": str(e),
+        }
+
+
+@mcp.tool()
+@_instrumented
 async def summarize_papers(
     ctx: Context,
     topic: str,
@@ -436,6 +886,7 @@ async def summarize_papers(
     sort_by: str = "relevance",
     year_start: Optional[int] = None,
     year_end: Optional[int] = None,
+    timeout_seconds: Optional[float] = None,
 ) -> str:
     """
     搜索并总结特定主题的论文
@@ -450,6 +901,8 @@ async def summarize_papers(
             - "title": 按标题字母顺序排序
         year_start: 开始年份，可选
         year_end: 结束年份，可选
+        timeout_seconds: 本次调用的时间预算(秒)，可选，默认读取MCP_SCHOLAR_TOOL_TIMEOUT；
+            预算不足时跳过可选步骤并返回带partial标记的部分结果
 
     Returns:
         str: 论文总结的Markdown格式文本
@@ -530,41 +983,414 @@ async def summarize_papers(
 
 
 @mcp.tool()
+@_instrumented
+async def watch_save(
+    ctx: Context,
+    name: str,
+    query: str,
+    fuzzy_search: bool = False,
+    year_start: Optional[int] = None,
+    year_end: Optional[int] = None,
+    backfill_days: int = 7,
+) -> Dict[str, Any]:
+    """
+    保存一个定期检查的查询，之后用watch_check只获取新发表的论文
+
+    Args:
+        name: 查询名称，已存在时替换
+        query: 搜索关键词
+        fuzzy_search: 是否使用模糊搜索，默认为False
+        year_start: 开始年份，可选
+        year_end: 结束年份，可选
+        backfill_days: 首次检查时包含最近多少天发表的论文，默认为7
+
+    Returns:
+        Dict: 保存的查询
+    """
+    from mcp_scholar import watch
+
+    try:
+        saved = await watch.save_query(
+            name,
+            query,
+            fuzzy_search=fuzzy_search,
+            year_start=year_start,
+            year_end=year_end,
+            backfill_days=backfill_days,
+        )
+        return {"status": "success", "watch": saved.summary()}
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    except Exception as e:
+        logger.error(f"保存查询失败: {str(e)}", exc_info=True)
+        return {"status": "error", "message": "保存查询失败", "error": str(e)}
+
+
+@mcp.tool()
+@_instrumented
+async def watch_check(
+    ctx: Context, name: str, timeout_seconds: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    检查一个保存的查询，只返回上次检查以来新出现的论文
+
+    Args:
+        name: 查询名称
+        timeout_seconds: 本次调用的时间预算(秒)，可选，默认读取MCP_SCHOLAR_TOOL_TIMEOUT
+
+    Returns:
+        Dict: 新论文列表
+    """
+    from mcp_scholar import watch
+
+    try:
+        logger.info(f"正在检查保存的查询 {name}...")
+        delta = await watch.check_query(name)
+
+        papers = []
+        for p in delta["new_papers"]:
+            papers.append(
+                {
+                    "title": p["title"],
+                    "authors": p["authors"],
+                    "abstract": p["abstract"],
+                    "citations": p["citations"],
+                    "year": p.get("year", "Unknown"),
+                    "paper_id": p.get("paper_id", None),
+                    "venue": p.get("venue", ""),
+                    "url": p.get("url", ""),
+                    "doi_url": p.get("doi_url", ""),
+                }
+            )
+
+        return {
+            "status": "success",
+            "name": name,
+            "new_papers": papers,
+            "total_new": len(papers),
+            "since": delta["since"],
+            "requests": delta["requests"],
+            "truncated": delta["truncated"],
+        }
+    except KeyError:
+        return {"status": "error", "message": f"没有名为 {name} 的保存查询"}
+    except Exception as e:
+        logger.error(f"检查保存的查询失败: {str(e)}", exc_info=True)
+        return {"status": "error", "message": "检查保存的查询失败", "error": str(e)}
+
+
+@mcp.tool()
+@_instrumented
+async def watch_list(ctx: Context) -> Dict[str, Any]:
+    """
+    列出所有保存的查询及其上次检查时间
+
+    Returns:
+        Dict: 查询列表
+    """
+    from mcp_scholar import watch
+
+    try:
+        watches = await watch.list_queries()
+        return {"status": "success", "watches": [w.summary() for w in watches]}
+    except Exception as e:
+        logger.error(f"列出保存的查询失败: {str(e)}", exc_info=True)
+        return {"status": "error", "message": "列出保存的查询失败", "error": str(e)}
+
+
+@mcp.tool()
+@_instrumented
+async def watch_delete(ctx: Context, name: str) -> Dict[str, Any]:
+    """
+    删除一个保存的查询
+
+    Args:
+        name: 查询名称
+
+    Returns:
+        Dict: 删除结果
+    """
+    from mcp_scholar import watch
+
+    try:
+        if await watch.delete_query(name):
+            return {"status": "success", "message": f"已删除查询 {name}"}
+        return {"status": "error", "message": f"没有名为 {name} 的保存查询"}
+    except Exception as e:
+        logger.error(f"删除保存的查询失败: {str(e)}", exc_info=True)
+        return {"status": "error", "message": "删除保存的查询失败", "error": str(e)}
+
+
+@mcp.tool()
+@_instrumented
+async def export_results(
+    ctx: Context,
+    source: str,
+    value: str,
+    format: str = "jsonl",
+    file_name: str = "",
+    max_rows: int = 10000,
+    fuzzy_search: bool = False,
+    year_start: Optional[int] = None,
+    year_end: Optional[int] = None,
+    timeout_seconds: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    把大结果集按页流式导出到服务端文件，返回文件路径和行数，不在响应中返回论文内容
+
+    Args:
+        source: 导出来源，search（搜索结果）、author（作者全部作品）或citing（引用某篇论文的全部文献）
+        value: 搜索关键词、作者ID/主页URL或被引论文ID
+        format: 输出格式，jsonl、arrow或parquet，默认为jsonl；arrow和parquet需要pyarrow
+        file_name: 导出目录中的文件名，可选，默认按来源和时间生成
+        max_rows: 最多导出的行数，默认为10000
+        fuzzy_search: 搜索时是否使用模糊搜索，默认为False
+        year_start: 开始年份，可选
+        year_end: 结束年份，可选
+        timeout_seconds: 本次调用的时间预算(秒)，可选，默认读取MCP_SCHOLAR_TOOL_TIMEOUT；
+            预算用完时保留已导出的部分
+
+    Returns:
+        Dict: 导出文件路径、格式、行数、页数和文件大小
+    """
+    from mcp_scholar import export
+
+    try:
+        if format not in export.FORMATS:
+            raise ValueError(
+                f"不支持的导出格式: {format}，可选: {', '.join(export.FORMATS)}"
+            )
+        path = export.output_path(source, format, file_name)
+        logger.info(f"正在导出{source}结果到 {path}...")
+        result = await export.export_results(
+            source,
+            value,
+            path,
+            fmt=format,
+            max_rows=max(1, max_rows),
+            fuzzy_search=fuzzy_search,
+            year_start=year_start,
+            year_end=year_end,
+        )
+        return {"status": "success", **result}
+    except (ValueError, RuntimeError) as e:
+        return {"status": "error", "message": str(e)}
+    except Exception as e:
+        logger.error(f"导出结果失败: {str(e)}", exc_info=True)
+        return {"status": "error", "message": "导出结果失败", "error": str(e)}
+
+
+@mcp.tool()
+@_instrumented
 async def health_check(ctx: Context) -> str:
     """
-    健康检查端点，用于验证服务是否正常运行
+    健康检查端点，用于验证服务是否正常运行，并给出最近一次上游探测的结果、事件循环延迟、
+    CPU、内存、上游连接、待处理任务、GC暂停和日志队列的最近采样
+
+    Returns:
+        str: 服务状态信息，第一行是就绪状态（见health_status）
+    """
+    from mcp_scholar import health, monitor
+
+    monitor.ensure_started()
+    health.ensure_started()
+    report = await health.report()
+    if report["status"] == "unavailable":
+        lines = [
+            f"MCP Scholar服务不可用：上游连续 "
+            f"{report['probe']['consecutive_failures']} 次探测失败"
+        ]
+    elif report["status"] == "degraded":
+        lines = [f"MCP Scholar服务降级运行：{', '.join(report['reasons'])}"]
+    else:
+        lines = ["MCP Scholar服务运行正常"]
+    probe = report["probe"]
+    if probe.get("checked"):
+        result = "正常" if probe["ok"] else probe["error"]
+        if probe["latency_ms"] is not None:
+            result += f"，延迟 {probe['latency_ms']}ms"
+        lines.append(f"上游探测: {result}（{probe['age_seconds']}秒前）")
+    status = monitor.summary()
+    lag = status.get("event_loop_lag", {})
+    if lag.get("samples"):
+        lines.append(
+            f"事件循环延迟: 最近 {lag['last_ms']}ms，平均 {lag['mean_ms']}ms，"
+            f"最大 {lag['max_ms']}ms"
+        )
+    if status.get("cpu_percent") is not None:
+        lines.append(f"CPU: {status['cpu_percent']}%")
+    if status.get("rss_bytes"):
+        lines.append(f"内存(RSS): {status['rss_bytes'] / (1 << 20):.1f}MB")
+    if "pending_tasks" in status:
+        connections = status.get("upstream_connections") or {}
+        lines.append(
+            f"待处理任务: {status['pending_tasks']}，"
+            f"上游连接: {connections.get('open', 0)}（空闲 {connections.get('idle', 0)}）"
+        )
+        gc_stats = status["gc"]
+        lines.append(
+            f"GC暂停: 累计 {gc_stats['total_ms']}ms，最长 {gc_stats['max_ms']}ms；"
+            f"日志队列: {status['log_queue']}"
+        )
+    return "\n".join(lines)
+
+
+@mcp.tool()
+@_instrumented
+async def health_status(ctx: Context) -> Dict[str, Any]:
+    """
+    深度健康检查：就绪状态、最近一次上游探测的延迟、上游限流状态、缓存命中率、
+    排队长度和事件循环延迟。上游探测在后台定期执行，这里只读取最近的结果
+
+    Returns:
+        Dict: status为ready、degraded或unavailable，reasons给出降级原因
+    """
+    from mcp_scholar import health, monitor
+
+    monitor.ensure_started()
+    probe = health.ensure_started()
+    if probe is not None and probe.checked_at is None:
+        # 还没有探测结果时先探测一次
+        await probe.probe()
+    return await health.report()
+
+
+@mcp.tool()
+@_instrumented
+async def server_metrics(ctx: Context) -> Dict[str, Any]:
+    """
+    获取服务运行指标，包括准入控制的排队长度和拒绝次数
 
     Returns:
-        str: 服务状态信息
+        Dict: 计数器和仪表盘
     """
-    return "MCP Scholar服务运行正常"
+    return {"status": "success", **metrics.snapshot()}
 
 
-def cli_main():
+def cli_main() -> int:
     """
     CLI入口点，使用STDIO交互
+
+    Returns:
+        int: 退出码，启动失败时为1（控制台脚本以它作为进程退出码）
     """
-    print("MCP Scholar STDIO服务准备启动...", file=sys.stderr)
+    configure_logging()
+    logger.info("MCP Scholar STDIO服务准备启动...")
 
     try:
+        # 调试模式只在配置开启时使用，启动时才读取配置
+        mcp.settings.debug = debug_enabled()
         # 启动STDIO服务器
-        sys.stderr.write("MCP Scholar STDIO服务已启动，等待输入...\n")
-        sys.stderr.flush()
+        logger.info("MCP Scholar STDIO服务已启动，等待输入...")
         mcp.run()
     except Exception as e:
-        print(f"服务启动失败: {str(e)}", file=sys.stderr)
+        logger.error(f"服务启动失败: {str(e)}", exc_info=True)
+        return 1
+    return 0
 
 
-def main():
+def main(argv: Optional[List[str]] = None) -> int:
     """
-    服务入口点函数，使用WebSocket交互
+    服务入口点函数，以网络传输模式（Streamable HTTP或SSE）运行，可启动多个工作进程
+
+    Returns:
+        int: 退出码，启动失败时为1
     """
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="MCP Scholar网络服务")
+    parser.add_argument(
+        "--transport",
+        choices=["streamable-http", "sse"],
+        default=os.environ.get("MCP_SCHOLAR_TRANSPORT", "streamable-http"),
+        help="网络传输方式，默认streamable-http",
+    )
+    parser.add_argument("--host", default="0.0.0.0", help="监听地址")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口")
+    parser.add_argument("--workers", type=int, default=1, help="工作进程数，默认1")
+    parser.add_argument(
+        "--limit-concurrency",
+        type=int,
+        default=None,
+        help="每个工作进程的最大并发连接数，超出时返回503",
+    )
+    parser.add_argument(
+        "--loop",
+        choices=["auto", "uvloop", "asyncio"],
+        default="auto",
+        help="事件循环实现，auto表示安装了uvloop时使用uvloop",
+    )
+    parser.add_argument(
+        "--cache-path",
+        default=None,
+        help="共享磁盘缓存路径，多工作进程时默认 ~/.cache/mcp_scholar/cache.sqlite",
+    )
+    parser.add_argument(
+        "--rate-limit-file",
+        default=None,
+        help="共享速率预算状态文件，多工作进程时默认 ~/.cache/mcp_scholar/rate_limit",
+    )
+    args = parser.parse_args(argv)
+
+    configure_logging()
     try:
-        # 启动WebSocket服务器
-        mcp.run(host="0.0.0.0", port=8765)
+        import uvicorn
+        from mcp_scholar.http_app import streamable_http_available
+
+        if args.transport == "streamable-http" and not streamable_http_available():
+            raise RuntimeError(
+                "Streamable HTTP需要mcp>=1.8，请升级mcp或使用--transport sse"
+            )
+        if args.transport == "sse" and args.workers > 1:
+            # SSE会话保存在建立连接的进程内，后续POST可能被分配到其他进程
+            raise RuntimeError(
+                "SSE传输只支持单个工作进程，多进程部署请使用streamable-http"
+            )
+
+        # 工作进程由uvicorn重新启动，通过环境变量传递配置
+        os.environ["MCP_SCHOLAR_TRANSPORT"] = args.transport
+        cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "mcp_scholar")
+        cache_path = args.cache_path or os.environ.get("MCP_SCHOLAR_CACHE_PATH")
+        rate_limit_file = args.rate_limit_file or os.environ.get(
+            "MCP_SCHOLAR_RATE_LIMIT_FILE"
+        )
+        if args.workers > 1:
+            cache_path = cache_path or os.path.join(cache_dir, "cache.sqlite")
+            rate_limit_file = rate_limit_file or os.path.join(cache_dir, "rate_limit")
+        if cache_path:
+            os.environ["MCP_SCHOLAR_CACHE_PATH"] = cache_path
+        if rate_limit_file:
+            os.environ["MCP_SCHOLAR_RATE_LIMIT_FILE"] = rate_limit_file
+
+        loop = args.loop
+        if loop == "auto":
+            try:
+                import uvloop  # noqa: F401
+
+                loop = "uvloop"
+            except ImportError:
+                loop = "asyncio"
+
+        logger.info(
+            f"MCP Scholar网络服务启动: {args.transport} http://{args.host}:{args.port}，"
+            f"工作进程数: {args.workers}，事件循环: {loop}"
+        )
+        uvicorn.run(
+            "mcp_scholar.http_app:create_app",
+            factory=True,
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            loop=loop,
+            limit_concurrency=args.limit_concurrency,
+            log_config=None,
+        )
     except Exception as e:
-        print(f"服务启动失败: {str(e)}", file=sys.stderr)
+        logger.error(f"服务启动失败: {str(e)}", exc_info=True)
+        return 1
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
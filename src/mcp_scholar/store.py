@@ -0,0 +1,584 @@
+"""
+原始work记录存储
+解析后的论文字典会丢掉之后可能用到的字段（例如论文详情需要的concepts和open_access），
+因此这里保存OpenAlex返回的原始work对象，任何工具都可以从中重新解析出需要的视图，
+不必再次请求
+
+数据文件只追加写入，每条记录单独压缩（安装了zstandard时用zstd，否则用zlib），
+记录头包含ID、长度、校验和、获取时间，以及是否为只含部分字段的记录（列表请求带select参数），
+部分记录不会覆盖完整记录。打开时扫描记录头在内存中建立 ID -> 偏移量 索引，
+读取通过mmap进行，几十万条记录只占用很少的磁盘和内存
+
+引用量等易变字段每天都在变化，标题、作者、摘要几乎不变。记录超过易变字段的有效期后，
+只需批量请求易变字段（见scholar.refresh_volatile）并用patch_many合并进记录，
+记录头中的获取时间保持不变，另外记下易变字段的刷新时间，其他字段仍按较长的有效期使用。
+易变字段没有变化时只追加一条不含内容的刷新标记（几十字节），刷新时间因此在进程重启后
+仍然有效，文件也不会因每天的刷新而成倍增长
+
+被新记录取代的旧记录和刷新标记是无用的字节，compact把每个ID的最新记录复制到新文件
+并原子替换；其他进程发现文件被替换后重新扫描
+
+通过环境变量配置:
+    MCP_SCHOLAR_WORK_STORE: 数据文件路径，留空时不保存原始记录（默认）
+    MCP_SCHOLAR_WORK_STORE_TTL: 论文详情直接使用本地记录的最长时间(秒)，默认2592000（30天）
+    MCP_SCHOLAR_WORK_STORE_VOLATILE_TTL: 引用量等易变字段的有效期(秒)，默认86400
+    MCP_SCHOLAR_WORK_STORE_COMPACT_RATIO: 无用字节超过文件大小的这个比例时，
+        批量刷新后压缩数据文件，默认0.5
+"""
+
+import asyncio
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import (
+    Any,
+    BinaryIO,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+from mcp_scholar.config import get_env
+from mcp_scholar.metrics import metrics
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None  # type: ignore[assignment]
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+# 记录头第一个字节的低4位是压缩方式，高位是标志
+_CODEC_MASK = 0x0F
+# 列表请求带select参数只取了部分字段的记录
+_PROJECTED = 0x80
+# 记录头之后跟着易变字段的刷新时间
+_REFRESHED = 0x40
+# 刷新标记：没有内容，只更新同一ID已有记录的刷新时间
+_TOUCH = 0x20
+# 记录头: 压缩方式和标志、ID长度、压缩后长度、原始JSON的crc32、获取时间(unix秒)
+_HEADER = struct.Struct("<BHIII")
+# 易变字段的刷新时间(unix秒)，只在带_REFRESHED标志的记录中出现
+_REFRESHED_AT = struct.Struct("<I")
+_ZSTD_LEVEL = 3
+_ZLIB_LEVEL = 6
+# 易变字段：可以单独批量刷新，不必重新下载整条记录
+VOLATILE_FIELDS = ("cited_by_count", "counts_by_year")
+
+
+class Entry(NamedTuple):
+    offset: int
+    length: int
+    codec: int
+    checksum: int
+    fetched_at: int
+    # 只含部分字段（见scholar.WORK_SELECT_FIELDS）
+    projected: bool = False
+    # 易变字段最近一次单独刷新的时间，没有刷新过时为0
+    refreshed_at: int = 0
+
+
+def work_id(work: Dict[str, Any]) -> str:
+    """work对象的短ID，例如 W2741809807"""
+    return (work.get("id") or "").replace("https://openalex.org/", "")
+
+
+class WorkStore:
+    """
+    只追加的压缩work记录文件
+
+    同一ID的新记录追加在后面并覆盖索引中的旧位置；内容没有变化时不重复写入。
+    多个进程可以共享同一个文件：追加时持有文件锁，读取未命中时扫描其他进程新追加的记录
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._index: Dict[str, Entry] = {}
+        # 已扫描到的文件末尾，以及扫描的是哪个文件（compact会替换文件）
+        self._scanned = 0
+        self._inode: Optional[int] = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._compressor = (
+            zstandard.ZstdCompressor(level=_ZSTD_LEVEL) if zstandard else None
+        )
+        self._decompressor = zstandard.ZstdDecompressor() if zstandard else None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(self.path, "ab"):
+            pass
+        with self._lock:
+            self._scan()
+
+    @property
+    def codec(self) -> int:
+        return CODEC_ZSTD if self._compressor is not None else CODEC_ZLIB
+
+    def _map(self, size: int) -> Optional[mmap.mmap]:
+        """返回至少覆盖size字节的映射，文件变大时重新映射"""
+        if size == 0:
+            return None
+        if self._mmap is None or len(self._mmap) < size:
+            if self._mmap is not None:
+                self._mmap.close()
+            with open(self.path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def _scan(self) -> None:
+        """从上次扫描的位置开始读取记录头，更新索引；需持有self._lock"""
+        stat = os.stat(self.path)
+        if stat.st_ino != self._inode:
+            # 文件被compact替换（或第一次扫描），从头重建索引
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+            self._index = {}
+            self._scanned = 0
+            self._inode = stat.st_ino
+        size = stat.st_size
+        if size <= self._scanned:
+            return
+        view = self._map(size)
+        offset = self._scanned
+        while offset + _HEADER.size <= size:
+            flags, id_length, length, checksum, fetched_at = _HEADER.unpack_from(
+                view, offset
+            )
+            key_start = offset + _HEADER.size
+            refreshed_at = 0
+            if flags & _REFRESHED:
+                key_start += _REFRESHED_AT.size
+            start = key_start + id_length
+            if start + length > size:
+                # 其他进程正在写入的记录，下次再扫描
+                break
+            if flags & _REFRESHED:
+                (refreshed_at,) = _REFRESHED_AT.unpack_from(view, offset + _HEADER.size)
+            key = bytes(view[key_start:start]).decode("utf-8")
+            if flags & _TOUCH:
+                current = self._index.get(key)
+                if current is not None:
+                    self._index[key] = current._replace(refreshed_at=refreshed_at)
+                offset = start
+                continue
+            self._index[key] = Entry(
+                start,
+                length,
+                flags & _CODEC_MASK,
+                checksum,
+                fetched_at,
+                bool(flags & _PROJECTED),
+                refreshed_at,
+            )
+            offset = start + length
+        self._scanned = offset
+
+    def _decode(self, entry: Entry) -> Dict[str, Any]:
+        view = self._map(entry.offset + entry.length)
+        payload = view[entry.offset : entry.offset + entry.length]
+        if entry.codec == CODEC_ZSTD:
+            if self._decompressor is None:
+                raise RuntimeError("记录使用zstd压缩，请安装: pip install zstandard")
+            raw = self._decompressor.decompress(payload)
+        else:
+            raw = zlib.decompress(payload)
+        if zlib.crc32(raw) != entry.checksum:
+            raise ValueError("记录校验和不匹配")
+        return json.loads(raw)
+
+    def get_entry(self, key: str) -> Optional[Entry]:
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None or os.stat(self.path).st_ino != self._inode:
+                # 未命中，或文件已被compact替换（索引中的偏移量不再有效）
+                self._scan()
+                entry = self._index.get(key)
+            return entry
+
+    def get(
+        self, key: str, max_age: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        读取一条原始work记录
+
+        Args:
+            key: work的短ID
+            max_age: 记录的最长存在时间(秒)，超过时视为未命中；为None时不限
+
+        Returns:
+            Dict: 原始work对象，不存在、过期或损坏时返回None
+        """
+        entry = self.get_entry(key)
+        if entry is None:
+            return None
+        if max_age is not None and time.time() - entry.fetched_at > max_age:
+            return None
+        try:
+            with self._lock:
+                return self._decode(entry)
+        except (ValueError, RuntimeError, zlib.error) as e:
+            logger.warning(f"读取work记录 {key} 失败: {str(e)}")
+            return None
+
+    def _encode(
+        self,
+        key: str,
+        raw: bytes,
+        checksum: int,
+        fetched_at: int,
+        projected: bool = False,
+        refreshed_at: int = 0,
+    ) -> bytes:
+        if self._compressor is not None:
+            payload = self._compressor.compress(raw)
+        else:
+            payload = zlib.compress(raw, _ZLIB_LEVEL)
+        key_bytes = key.encode("utf-8")
+        flags = self.codec | (_PROJECTED if projected else 0)
+        extra = b""
+        if refreshed_at:
+            flags |= _REFRESHED
+            extra = _REFRESHED_AT.pack(refreshed_at)
+        return (
+            _HEADER.pack(flags, len(key_bytes), len(payload), checksum, fetched_at)
+            + extra
+            + key_bytes
+            + payload
+        )
+
+    def _touch(self, key: str, refreshed_at: int) -> bytes:
+        """编码一条刷新标记"""
+        key_bytes = key.encode("utf-8")
+        return (
+            _HEADER.pack(_TOUCH | _REFRESHED, len(key_bytes), 0, 0, 0)
+            + _REFRESHED_AT.pack(refreshed_at)
+            + key_bytes
+        )
+
+    @contextmanager
+    def _locked_file(self) -> Iterator[BinaryIO]:
+        """以追加方式打开数据文件并持有文件锁；打开后文件被compact替换时重新打开"""
+        while True:
+            f = open(self.path, "ab")
+            try:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                if os.fstat(f.fileno()).st_ino != os.stat(self.path).st_ino:
+                    continue
+                yield f
+                return
+            finally:
+                # 关闭文件同时释放文件锁
+                f.close()
+
+    def _append(self, records: List[bytes]) -> None:
+        """追加一批编码好的记录并更新索引；需持有self._lock"""
+        with self._locked_file() as f:
+            # 持有文件锁时末尾仍有不完整的记录，说明写入它的进程已经崩溃
+            self._scan()
+            if os.fstat(f.fileno()).st_size > self._scanned:
+                logger.warning("work记录存储末尾有不完整的记录，已截断")
+                os.ftruncate(f.fileno(), self._scanned)
+            f.write(b"".join(records))
+            f.flush()
+        self._scan()
+
+    def put_many(self, works: Iterable[Dict[str, Any]], projected: bool = False) -> int:
+        """
+        保存一批原始work记录，内容没有变化的记录不重复写入
+
+        Args:
+            works: 原始work对象
+            projected: 记录是否只含部分字段；这样的记录不会覆盖已保存的完整记录
+
+        Returns:
+            int: 实际写入的记录数
+        """
+        now = int(time.time())
+        records: List[bytes] = []
+        pending: Dict[str, int] = {}
+        with self._lock:
+            self._scan()
+            for work in works:
+                key = work_id(work)
+                if not key:
+                    continue
+                raw = json.dumps(work, ensure_ascii=False, sort_keys=True).encode(
+                    "utf-8"
+                )
+                checksum = zlib.crc32(raw)
+                current = self._index.get(key)
+                if projected and current is not None and not current.projected:
+                    # 不用部分字段的记录覆盖完整记录（会丢掉referenced_works等字段）
+                    continue
+                if current is not None and current.checksum == checksum:
+                    # 内容没有变化，只刷新内存索引中的获取时间
+                    self._index[key] = current._replace(fetched_at=now)
+                    continue
+                if pending.get(key) == checksum:
+                    continue
+                records.append(self._encode(key, raw, checksum, now, projected))
+                pending[key] = checksum
+            if records:
+                self._append(records)
+        return len(records)
+
+    def patch_many(self, patches: Iterable[Dict[str, Any]]) -> int:
+        """
+        把一批只含易变字段的部分记录合并进已保存的记录
+
+        合并后的记录保留原来的获取时间，静态字段的有效期不会因刷新而延长；
+        记录头中另外写入刷新时间；易变字段没有变化时只追加一条刷新标记，
+        这样定时刷新在进程重启后不会再次选中同一批记录
+
+        Args:
+            patches: 含id和VOLATILE_FIELDS中部分字段的work对象，没有保存过的ID被忽略
+
+        Returns:
+            int: 易变字段有变化的记录数
+        """
+        now = int(time.time())
+        records: List[bytes] = []
+        changed = 0
+        with self._lock:
+            self._scan()
+            for patch in patches:
+                key = work_id(patch)
+                entry = self._index.get(key)
+                if entry is None:
+                    continue
+                try:
+                    work = self._decode(entry)
+                except (ValueError, RuntimeError, zlib.error) as e:
+                    logger.warning(f"读取work记录 {key} 失败: {str(e)}")
+                    continue
+                fields = {f: patch[f] for f in VOLATILE_FIELDS if f in patch}
+                if all(work.get(f) == value for f, value in fields.items()):
+                    records.append(self._touch(key, now))
+                    continue
+                work.update(fields)
+                changed += 1
+                raw = json.dumps(work, ensure_ascii=False, sort_keys=True).encode(
+                    "utf-8"
+                )
+                records.append(
+                    self._encode(
+                        key,
+                        raw,
+                        zlib.crc32(raw),
+                        entry.fetched_at,
+                        entry.projected,
+                        now,
+                    )
+                )
+            if records:
+                self._append(records)
+        return changed
+
+    def refreshed_at(self, key: str) -> Optional[int]:
+        """易变字段最近一次获取或刷新的时间，记录不存在时返回None"""
+        entry = self.get_entry(key)
+        if entry is None:
+            return None
+        return max(entry.fetched_at, entry.refreshed_at)
+
+    def stale_keys(
+        self,
+        keys: Optional[Iterable[str]],
+        max_age: float,
+        volatile_age: float,
+        limit: Optional[int] = None,
+    ) -> List[str]:
+        """
+        静态字段仍在有效期内、易变字段已过期的记录
+
+        Args:
+            keys: 要检查的ID，为None时检查全部记录
+            max_age: 静态字段的有效期(秒)，超过的记录需要整条重新获取，不在结果中
+            volatile_age: 易变字段的有效期(秒)
+            limit: 最多返回的ID数
+
+        Returns:
+            List[str]: 需要刷新易变字段的ID，最久没有刷新的在前
+        """
+        now = time.time()
+        found: List[Tuple[int, str]] = []
+        with self._lock:
+            self._scan()
+            for key in self._index if keys is None else keys:
+                entry = self._index.get(key)
+                if entry is None or now - entry.fetched_at > max_age:
+                    continue
+                refreshed = max(entry.fetched_at, entry.refreshed_at)
+                if now - refreshed > volatile_age:
+                    found.append((refreshed, key))
+        found.sort()
+        return [key for _, key in found[:limit]]
+
+    def _live_bytes(self) -> int:
+        """索引中每个ID最新记录占用的字节数；需持有self._lock"""
+        return sum(
+            _HEADER.size
+            + (_REFRESHED_AT.size if entry.refreshed_at else 0)
+            + len(key.encode("utf-8"))
+            + entry.length
+            for key, entry in self._index.items()
+        )
+
+    def compact(self) -> int:
+        """
+        把每个ID的最新记录复制到新文件并原子替换数据文件，去掉被取代的旧记录和刷新标记
+
+        压缩后的内容原样复制，不重新压缩；其他进程下次扫描时发现文件被替换，从头重建索引
+
+        Returns:
+            int: 回收的字节数
+        """
+        with self._lock, self._locked_file():
+            self._scan()
+            before = self._scanned
+            view = self._map(before)
+            temp_path = f"{self.path}.{os.getpid()}.compact"
+            with open(temp_path, "wb") as out:
+                for key, entry in self._index.items():
+                    key_bytes = key.encode("utf-8")
+                    flags = entry.codec | (_PROJECTED if entry.projected else 0)
+                    extra = b""
+                    if entry.refreshed_at:
+                        flags |= _REFRESHED
+                        extra = _REFRESHED_AT.pack(entry.refreshed_at)
+                    out.write(
+                        _HEADER.pack(
+                            flags,
+                            len(key_bytes),
+                            entry.length,
+                            entry.checksum,
+                            entry.fetched_at,
+                        )
+                    )
+                    out.write(extra + key_bytes)
+                    out.write(view[entry.offset : entry.offset + entry.length])
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(temp_path, self.path)
+            self._scan()
+            reclaimed = before - self._scanned
+        logger.info(f"work记录存储压缩完成，回收 {reclaimed} 字节")
+        return reclaimed
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._scan()
+            return len(self._index)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回记录数、文件大小、无用字节数和压缩方式"""
+        with self._lock:
+            self._scan()
+            return {
+                "records": len(self._index),
+                "bytes": self._scanned,
+                "dead_bytes": self._scanned - self._live_bytes(),
+                "codec": "zstd" if self.codec == CODEC_ZSTD else "zlib",
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+
+
+_store: Optional[WorkStore] = None
+_store_loaded = False
+
+
+def get_store() -> Optional[WorkStore]:
+    """按环境变量惰性打开存储，未配置路径或无法打开时返回None"""
+    global _store, _store_loaded
+    if not _store_loaded:
+        _store_loaded = True
+        path = get_env("MCP_SCHOLAR_WORK_STORE").strip()
+        if path:
+            try:
+                _store = WorkStore(path)
+            except OSError as e:
+                logger.warning(f"无法打开work记录存储 {path}: {str(e)}")
+    return _store
+
+
+def set_store(store: Optional[WorkStore]) -> None:
+    """替换存储，传入None时下次使用会按环境变量重新打开"""
+    global _store, _store_loaded
+    if _store is not None and _store is not store:
+        _store.close()
+    _store = store
+    _store_loaded = store is not None
+
+
+def max_age() -> float:
+    return float(get_env("MCP_SCHOLAR_WORK_STORE_TTL", "2592000"))
+
+
+def volatile_max_age() -> float:
+    return float(get_env("MCP_SCHOLAR_WORK_STORE_VOLATILE_TTL", "86400"))
+
+
+def compact_ratio() -> float:
+    return float(get_env("MCP_SCHOLAR_WORK_STORE_COMPACT_RATIO", "0.5"))
+
+
+async def save_works(works: List[Dict[str, Any]], projected: bool = False) -> None:
+    """
+    把原始work记录写入存储（未启用时什么也不做），写入失败只记录日志
+
+    Args:
+        works: 原始work对象
+        projected: 记录是否只含部分字段（列表请求带select参数）
+    """
+    store = get_store()
+    if store is None or not works:
+        return
+    try:
+        written = await asyncio.to_thread(store.put_many, works, projected)
+        metrics.inc("store.written", written)
+    except OSError as e:
+        logger.warning(f"保存work记录失败: {str(e)}")
+
+
+async def patch_works(patches: List[Dict[str, Any]]) -> None:
+    """把刷新的易变字段合并进已保存的记录（未启用时什么也不做），写入失败只记录日志"""
+    store = get_store()
+    if store is None or not patches:
+        return
+    try:
+        written = await asyncio.to_thread(store.patch_many, patches)
+        metrics.inc("store.patched", written)
+    except OSError as e:
+        logger.warning(f"更新work记录失败: {str(e)}")
+
+
+async def load_work(key: str) -> Optional[Dict[str, Any]]:
+    """读取未过期的原始work记录，未启用或未命中时返回None"""
+    store = get_store()
+    if store is None:
+        return None
+    work = await asyncio.to_thread(store.get, key, max_age())
+    metrics.inc("store.hits" if work is not None else "store.misses")
+    return work
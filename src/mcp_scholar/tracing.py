@@ -0,0 +1,349 @@
+"""
+轻量级链路追踪
+记录 工具调用 → scholar函数 → HTTP请求 → 解析阶段 的嵌套耗时
+
+通过环境变量配置:
+    MCP_SCHOLAR_TRACE_EXPORT: 导出目标，为空时关闭追踪
+        - "jsonl:/path/to/traces.jsonl": 每个span写一行JSON
+        - "otlp:http://localhost:4318/v1/traces": 以OTLP/HTTP JSON格式批量发送
+    MCP_SCHOLAR_TRACE_SAMPLE_RATE: 根span采样率(0~1)，默认1.0
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from mcp_scholar.config import get_env
+
+logger = logging.getLogger(__name__)
+
+# 当前活动的span，协程/任务之间通过contextvars隔离
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "mcp_scholar_current_span", default=None
+)
+
+
+class Span:
+    """一个已采样的span"""
+
+    __slots__ = (
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "name",
+        "attributes",
+        "start_ns",
+        "end_ns",
+        "error",
+    )
+
+    sampled = True
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str]):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes: Dict[str, Any] = {}
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """未采样时使用的空span，所有操作都是空操作"""
+
+    sampled = False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, **attributes: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+# 后台线程等待超时的标记
+_TICK = object()
+
+
+class JsonlExporter:
+    """把span逐行追加到本地JSONL文件"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def export(self, spans: List[Span]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str))
+                f.write("\n")
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpHttpExporter:
+    """以OTLP/HTTP JSON格式发送span到采集端（或其替身）"""
+
+    def __init__(self, endpoint: str, service_name: str = "mcp-scholar"):
+        self.endpoint = endpoint
+        self.service_name = service_name
+
+    def _encode(self, spans: List[Span]) -> bytes:
+        otlp_spans = []
+        for span in spans:
+            otlp_span = {
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": [
+                    {"key": k, "value": _otlp_value(v)}
+                    for k, v in span.attributes.items()
+                ],
+                "status": (
+                    {"code": 2, "message": span.error} if span.error else {"code": 1}
+                ),
+            }
+            if span.parent_id:
+                otlp_span["parentSpanId"] = span.parent_id
+            otlp_spans.append(otlp_span)
+
+        payload = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {
+                                "key": "service.name",
+                                "value": {"stringValue": self.service_name},
+                            }
+                        ]
+                    },
+                    "scopeSpans": [
+                        {"scope": {"name": "mcp_scholar"}, "spans": otlp_spans}
+                    ],
+                }
+            ]
+        }
+        return json.dumps(payload, default=str).encode("utf-8")
+
+    def export(self, spans: List[Span]) -> None:
+        import urllib.request
+
+        request = urllib.request.Request(
+            self.endpoint,
+            data=self._encode(spans),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=5.0):
+            pass
+
+
+class Tracer:
+    """
+    负责采样决策和异步导出
+
+    结束的span放入队列，由后台线程批量导出，不阻塞事件循环
+    """
+
+    def __init__(
+        self,
+        exporter: Any,
+        sample_rate: float = 1.0,
+        batch_size: int = 64,
+        flush_interval: float = 2.0,
+    ):
+        self.exporter = exporter
+        self.sample_rate = max(0.0, min(1.0, sample_rate))
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.SimpleQueue[Optional[Span]]" = queue.SimpleQueue()
+        self._flush_events: List[threading.Event] = []
+        self._worker = threading.Thread(
+            target=self._run, name="mcp-scholar-tracer", daemon=True
+        )
+        self._worker.start()
+
+    def should_sample(self) -> bool:
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def submit(self, span: Span) -> None:
+        self._queue.put(span)
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """等待已提交的span全部导出（主要用于测试和进程退出）"""
+        done = threading.Event()
+        self._flush_events.append(done)
+        self._queue.put(None)
+        done.wait(timeout)
+
+    def _export(self, batch: List[Span]) -> None:
+        if not batch:
+            return
+        try:
+            self.exporter.export(batch)
+        except Exception as e:
+            logger.warning(f"导出追踪数据失败: {str(e)}")
+
+    def _run(self) -> None:
+        batch: List[Span] = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = _TICK
+
+            if item is None:
+                # flush请求
+                self._export(batch)
+                batch = []
+                while self._flush_events:
+                    self._flush_events.pop().set()
+            elif item is not _TICK:
+                batch.append(item)
+
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._export(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+
+_tracer: Optional[Tracer] = None
+_tracer_configured = False
+_tracer_lock = threading.Lock()
+
+
+def _build_exporter(target: str) -> Any:
+    kind, _, location = target.partition(":")
+    if kind == "jsonl" and location:
+        return JsonlExporter(location)
+    if kind == "otlp" and location:
+        return OtlpHttpExporter(location)
+    raise ValueError(f"不支持的追踪导出目标: {target}")
+
+
+def get_tracer() -> Optional[Tracer]:
+    """按环境变量惰性创建全局Tracer，未配置导出目标时返回None"""
+    global _tracer, _tracer_configured
+    if _tracer_configured:
+        return _tracer
+    with _tracer_lock:
+        if not _tracer_configured:
+            target = get_env("MCP_SCHOLAR_TRACE_EXPORT").strip()
+            if target:
+                try:
+                    sample_rate = float(get_env("MCP_SCHOLAR_TRACE_SAMPLE_RATE", "1.0"))
+                    _tracer = Tracer(_build_exporter(target), sample_rate)
+                except ValueError as e:
+                    logger.warning(f"追踪配置无效，已关闭追踪: {str(e)}")
+                    _tracer = None
+            _tracer_configured = True
+    return _tracer
+
+
+def configure(exporter: Any = None, sample_rate: float = 1.0) -> Optional[Tracer]:
+    """显式配置全局Tracer，exporter为None时关闭追踪"""
+    global _tracer, _tracer_configured
+    with _tracer_lock:
+        _tracer = Tracer(exporter, sample_rate) if exporter is not None else None
+        _tracer_configured = True
+    return _tracer
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """
+    开启一个嵌套span
+
+    根span按采样率决定是否记录，子span继承父span的采样结果；
+    未采样时返回NOOP_SPAN，开销只有一次contextvar读取
+    """
+    parent = _current_span.get()
+    if parent is None:
+        tracer = get_tracer()
+        if tracer is None or not tracer.should_sample():
+            token = _current_span.set(NOOP_SPAN)  # type: ignore[arg-type]
+            try:
+                yield NOOP_SPAN
+            finally:
+                _current_span.reset(token)
+            return
+        current = Span(name, f"{random.getrandbits(128):032x}", None)
+    elif not parent.sampled:
+        yield NOOP_SPAN
+        return
+    else:
+        tracer = get_tracer()
+        current = Span(name, parent.trace_id, parent.span_id)
+
+    current.attributes.update(attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end_ns = time.time_ns()
+        if tracer is not None:
+            tracer.submit(current)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """为异步函数添加span的装饰器"""
+
+    def decorator(fn: Callable) -> Callable:
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(span_name):
+                return await fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
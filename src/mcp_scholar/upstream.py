@@ -0,0 +1,382 @@
+"""
+上游请求层
+所有对OpenAlex等外部服务的请求都经过这里：共享连接池、请求速率预算和响应缓存
+
+通过环境变量配置:
+    MCP_SCHOLAR_RATE_LIMIT: 每秒最多发出的上游请求数，默认10（OpenAlex礼貌池的限制）
+    MCP_SCHOLAR_RATE_LIMIT_FILE: 速率预算状态文件，设置后同一台机器上的多个进程共享预算
+    MCP_SCHOLAR_MAX_CONNECTIONS: 每个进程的最大上游连接数，默认20
+    MCP_SCHOLAR_BACKGROUND_RATE_SHARE: 后台请求（预取等）可以使用的令牌桶比例，默认0.5；
+        后台请求只在桶内剩余令牌高于其余部分时才取令牌，交互请求始终有预留
+
+请求的排队、优先级和会话间的公平分配见scheduler模块
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import struct
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Awaitable, Dict, Iterator, List, Optional
+import httpx
+from mcp_scholar import deadline
+from mcp_scholar.cache import get_cache
+from mcp_scholar.config import get_env
+from mcp_scholar.deadline import DeadlineExceeded
+from mcp_scholar.metrics import metrics
+from mcp_scholar.scheduler import (
+    BACKGROUND,
+    INTERACTIVE,
+    Scheduler,
+    parse_weights,
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+# 当前协程发出的请求是否为后台请求
+_background: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "mcp_scholar_background", default=False
+)
+# 当前请求所属的调用方会话，用于会话间的公平排队
+_caller: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "mcp_scholar_caller", default="default"
+)
+
+
+@contextmanager
+def caller(session_key: str) -> Iterator[None]:
+    """在此范围内发出的上游请求计入给定会话的公平份额"""
+    token = _caller.set(session_key)
+    try:
+        yield
+    finally:
+        _caller.reset(token)
+
+
+@contextmanager
+def background() -> Iterator[None]:
+    """在此范围内发出的上游请求按后台请求处理，只使用速率预算中的后台份额"""
+    token = _background.set(True)
+    try:
+        yield
+    finally:
+        _background.reset(token)
+
+
+def _reserve_fraction() -> float:
+    """当前请求需要为交互请求预留的令牌桶比例"""
+    if not _background.get():
+        return 0.0
+    share = float(get_env("MCP_SCHOLAR_BACKGROUND_RATE_SHARE", "0.5"))
+    return 1.0 - min(1.0, max(0.0, share))
+
+
+def _check_budget(wait: float) -> None:
+    """等待令牌的时间超过剩余预算时直接放弃"""
+    left = deadline.remaining()
+    if left is not None and wait > left:
+        raise DeadlineExceeded("剩余时间不足以等待上游速率预算")
+
+
+class RateLimiter:
+    """进程内的令牌桶限流器"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _take(self, reserve: float = 0.0) -> float:
+        """
+        尝试取出一个令牌，返回还需等待的秒数（0表示已取到）
+
+        Args:
+            reserve: 取令牌后桶内至少要保留的比例（相对于除去这个令牌后的容量）
+        """
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+        needed = 1 + reserve * (self.capacity - 1)
+        if self._tokens >= needed:
+            self._tokens -= 1
+            return 0.0
+        return (needed - self._tokens) / self.rate
+
+    async def acquire(self, reserve: float = 0.0) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            # _take中没有await，单线程事件循环下无需加锁
+            wait = self._take(reserve)
+            if wait <= 0:
+                return
+            _check_budget(wait)
+            await asyncio.sleep(wait)
+
+
+class SharedRateLimiter:
+    """
+    跨进程共享的令牌桶限流器
+
+    令牌数和更新时间保存在一个小文件中，用fcntl文件锁保护；
+    锁只在读写16字节状态时持有，等待令牌时不持有锁。
+    _take在调度器的事件循环中同步调用，所以用非阻塞方式加锁：
+    锁被其他进程持有时不取令牌，返回一个很短的等待时间由调用方稍后重试
+    """
+
+    _STATE = struct.Struct("dd")
+    # 锁被占用时的重试间隔（秒）
+    LOCK_RETRY = 0.005
+
+    def __init__(self, path: str, rate: float, burst: Optional[float] = None):
+        self.path = path
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    def _take(self, reserve: float = 0.0) -> float:
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            metrics.inc("upstream.rate_lock_busy")
+            return self.LOCK_RETRY
+        try:
+            raw = os.pread(self._fd, self._STATE.size, 0)
+            now = time.time()
+            if len(raw) == self._STATE.size:
+                tokens, updated = self._STATE.unpack(raw)
+                tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+            else:
+                tokens = self.capacity
+            needed = 1 + reserve * (self.capacity - 1)
+            if tokens >= needed:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (needed - tokens) / self.rate
+            os.pwrite(self._fd, self._STATE.pack(tokens, now), 0)
+            return wait
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    async def acquire(self, reserve: float = 0.0) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            wait = self._take(reserve)
+            if wait <= 0:
+                return
+            _check_budget(wait)
+            await asyncio.sleep(wait)
+
+
+_limiter: Any = None
+# httpx客户端和调度器绑定在创建它们的事件循环上，每个事件循环各用一个
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+_schedulers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Scheduler]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_limiter() -> Any:
+    """按环境变量惰性创建速率限制器"""
+    global _limiter
+    if _limiter is None:
+        rate = float(get_env("MCP_SCHOLAR_RATE_LIMIT", "10"))
+        state_file = get_env("MCP_SCHOLAR_RATE_LIMIT_FILE").strip()
+        if state_file and fcntl is not None:
+            _limiter = SharedRateLimiter(state_file, rate)
+        else:
+            if state_file:
+                logger.warning("当前平台不支持文件锁，速率预算只在进程内生效")
+            _limiter = RateLimiter(rate)
+    return _limiter
+
+
+def set_limiter(limiter: Any) -> None:
+    """替换速率限制器，传入None时下次使用会按环境变量重新创建"""
+    global _limiter
+    _limiter = limiter
+
+
+def get_client() -> httpx.AsyncClient:
+    """获取当前事件循环共享的httpx客户端"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        max_connections = int(get_env("MCP_SCHOLAR_MAX_CONNECTIONS", "20"))
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            )
+        )
+        _clients[loop] = client
+    return client
+
+
+def get_scheduler() -> Scheduler:
+    """获取当前事件循环的上游请求调度器"""
+    loop = asyncio.get_running_loop()
+    scheduler = _schedulers.get(loop)
+    if scheduler is None:
+        scheduler = Scheduler(
+            get_limiter,
+            concurrency=int(get_env("MCP_SCHOLAR_UPSTREAM_CONCURRENCY", "16")),
+            weights=parse_weights(get_env("MCP_SCHOLAR_SESSION_WEIGHTS")),
+            min_concurrency=int(get_env("MCP_SCHOLAR_UPSTREAM_MIN_CONCURRENCY", "2")),
+        )
+        _schedulers[loop] = scheduler
+        metrics.register_gauge("upstream.scheduler", scheduler.stats)
+    return scheduler
+
+
+def connection_stats() -> Dict[str, int]:
+    """
+    当前事件循环共享客户端的连接池状态
+
+    Returns:
+        Dict: open（已建立的连接数）和idle（空闲的keep-alive连接数），客户端未创建时为0
+    """
+    client = _clients.get(asyncio.get_running_loop())
+    if client is None or client.is_closed:
+        return {"open": 0, "idle": 0}
+    # httpx没有公开连接池状态，读取httpcore连接池的连接列表
+    connections = getattr(getattr(client._transport, "_pool", None), "connections", [])
+    idle = sum(1 for connection in connections if connection.is_idle())
+    return {"open": len(connections), "idle": idle}
+
+
+async def aclose() -> None:
+    """关闭当前事件循环的共享客户端"""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def _cached_response(url: str, cached: Any) -> httpx.Response:
+    return httpx.Response(
+        cached.status_code,
+        headers={"content-type": cached.content_type},
+        content=cached.body,
+        request=httpx.Request("GET", url),
+        extensions={"from_cache": True},
+    )
+
+
+async def fetch(
+    url: str, timeout: float = 15.0, use_cache: bool = True, **kwargs: Any
+) -> httpx.Response:
+    """
+    通过共享连接池发送GET请求
+
+    Args:
+        url: 请求URL
+        timeout: 超时时间(秒)，会被限制在当前调用的剩余预算内
+        use_cache: 是否读写响应缓存
+        **kwargs: 透传给httpx的参数
+
+    Returns:
+        httpx.Response: 响应对象，命中缓存时为重建的响应（extensions中from_cache为True），
+            否则extensions中的upstream_seconds为请求发出后的耗时，不含本地排队
+
+    Raises:
+        DeadlineExceeded: 当前工具调用的时间预算已用完（包括请求因预算用完而超时）
+    """
+    cache = get_cache()
+    if use_cache:
+        cached = await cache.get(url)
+        if cached is not None:
+            return _cached_response(url, cached)
+
+    deadline.clamp_timeout(timeout)
+    is_background = _background.get()
+    sent_at = 0.0
+
+    def send() -> Awaitable[httpx.Response]:
+        nonlocal sent_at
+        sent_at = time.monotonic()
+        # 排队等待后剩余时间更少，重新计算超时
+        return get_client().get(url, timeout=deadline.clamp_timeout(timeout), **kwargs)
+
+    try:
+        response = await get_scheduler().request(
+            send,
+            priority=BACKGROUND if is_background else INTERACTIVE,
+            session=_caller.get(),
+            reserve=_reserve_fraction(),
+            timeout=deadline.remaining,
+        )
+    except asyncio.CancelledError:
+        # 调用方已放弃：httpx会关闭这条连接，不会把未读完的响应留在连接池里
+        metrics.inc("upstream.cancelled")
+        raise
+    except httpx.TimeoutException as e:
+        # 超时被限制在剩余预算内，预算用完时的超时按预算用完处理，调用方可以返回部分结果
+        if deadline.is_expired():
+            raise DeadlineExceeded("时间预算已用完") from e
+        raise
+    response.extensions["upstream_seconds"] = time.monotonic() - sent_at
+
+    if use_cache and response.status_code == 200:
+        await cache.set(
+            url,
+            response.status_code,
+            response.headers.get("content-type", ""),
+            response.content,
+        )
+    return response
+
+
+async def gather(*aws: Awaitable[Any]) -> List[Any]:
+    """
+    并发执行多个协程，按顺序返回结果
+
+    与asyncio.gather不同，调用方被取消或任一协程出错时，会取消其余协程并等待它们
+    结束后再返回，保证不会留下仍在占用连接和速率预算的后台请求
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+class UpstreamSession:
+    """绑定了超时时间的请求句柄，接口与httpx.AsyncClient.get一致"""
+
+    def __init__(self, timeout: float = 15.0):
+        self.timeout = timeout
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return await fetch(url, **kwargs)
+
+
+@asynccontextmanager
+async def session(timeout: float = 15.0) -> AsyncIterator[UpstreamSession]:
+    """
+    获取上游请求句柄
+
+    用法与 `async with httpx.AsyncClient(timeout=...) as client` 相同，
+    但不会为每次调用新建连接池
+    """
+    yield UpstreamSession(timeout)
@@ -0,0 +1,331 @@
+"""
+保存的查询（watch）
+每个保存的查询记录上次检查的日期和已经见过的论文ID；再次检查时只请求这之后发表的论文
+（from_publication_date过滤），按发表日期从新到旧翻页，排除见过的ID后只返回新增部分。
+每天一次的检查通常只需要一两个小请求，不用重新下载完整的结果集。
+新增结果超过页数上限时保存翻页位置，下一次检查从这里继续取完剩下的论文，
+取完之前不推进上次检查的日期
+
+通过环境变量配置:
+    MCP_SCHOLAR_WATCH_STATE: 状态文件路径，默认 ~/.cache/mcp_scholar/watches.json
+    MCP_SCHOLAR_WATCH_LOOKBACK_DAYS: 检查时在上次检查日期之前多回看的天数，默认3；
+        OpenAlex收录新论文有延迟，回看窗口内已见过的论文会按ID排除
+    MCP_SCHOLAR_WATCH_MAX_PAGES: 单次检查最多请求的页数，默认5
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from mcp_scholar import upstream
+from mcp_scholar.config import get_env
+from mcp_scholar.scholar import _http_get, _parse_results, build_search_url
+from mcp_scholar.tracing import traced
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+# 每页结果数：日常检查的新增论文通常不多，小页即可
+PAGE_SIZE = 50
+# 每个查询最多记住的论文ID数，只需要覆盖回看窗口
+MAX_SEEN_IDS = 5000
+_NAME_RE = re.compile(r"^[\w\-. ]{1,64}$")
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+@dataclass
+class SavedQuery:
+    """一个保存的查询及其检查状态"""
+
+    name: str
+    query: str
+    fuzzy_search: bool = False
+    year_start: Optional[int] = None
+    year_end: Optional[int] = None
+    # 首次检查从这一天开始（ISO日期）
+    since: str = ""
+    # 上次检查的日期（ISO日期），从未检查时为空
+    last_checked: str = ""
+    seen_ids: List[str] = field(default_factory=list)
+    # 被页数上限截断的检查：继续翻页的cursor、该次检查的起始日期和检查日期
+    resume_cursor: str = ""
+    resume_since: str = ""
+    resume_checked_on: str = ""
+
+    def summary(self) -> Dict[str, Any]:
+        """不含已见ID列表的概要，用于工具输出"""
+        data = asdict(self)
+        data["seen_count"] = len(data.pop("seen_ids"))
+        data["pending"] = bool(data.pop("resume_cursor"))
+        data.pop("resume_since")
+        data.pop("resume_checked_on")
+        return data
+
+
+class WatchStore:
+    """
+    保存查询的JSON状态文件
+
+    每次修改都在文件锁内读取、修改、原子替换，多个工作进程可以共享同一个文件
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(f"{self.path}.lock", "a") as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _read(self) -> Dict[str, SavedQuery]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.error(f"读取查询状态文件失败: {str(e)}")
+            return {}
+        return {name: SavedQuery(**entry) for name, entry in data.items()}
+
+    def _write(self, watches: Dict[str, SavedQuery]) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {name: asdict(watch) for name, watch in watches.items()},
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(temp_path, self.path)
+
+    def list(self) -> List[SavedQuery]:
+        with self._locked():
+            return list(self._read().values())
+
+    def get(self, name: str) -> Optional[SavedQuery]:
+        with self._locked():
+            return self._read().get(name)
+
+    def update(
+        self, name: str, change: Callable[[Optional[SavedQuery]], Optional[SavedQuery]]
+    ) -> Optional[SavedQuery]:
+        """在锁内读取-修改-写回一个查询；change返回None时删除该查询"""
+        with self._locked():
+            watches = self._read()
+            result = change(watches.get(name))
+            if result is None:
+                watches.pop(name, None)
+            else:
+                watches[name] = result
+            self._write(watches)
+            return result
+
+
+_store: Optional[WatchStore] = None
+
+
+def get_store() -> WatchStore:
+    """按环境变量惰性创建状态文件存储"""
+    global _store
+    if _store is None:
+        path = get_env("MCP_SCHOLAR_WATCH_STATE").strip() or os.path.join(
+            os.path.expanduser("~"), ".cache", "mcp_scholar", "watches.json"
+        )
+        _store = WatchStore(path)
+    return _store
+
+
+def set_store(store: Optional[WatchStore]) -> None:
+    """替换状态文件存储，传入None时下次使用会按环境变量重新创建"""
+    global _store
+    _store = store
+
+
+async def save_query(
+    name: str,
+    query: str,
+    fuzzy_search: bool = False,
+    year_start: Optional[int] = None,
+    year_end: Optional[int] = None,
+    backfill_days: int = 7,
+) -> SavedQuery:
+    """
+    保存（或替换）一个查询
+
+    Args:
+        name: 查询名称
+        query: 搜索关键词
+        fuzzy_search: 是否使用模糊搜索
+        year_start: 开始年份，可选
+        year_end: 结束年份，可选
+        backfill_days: 首次检查时包含最近多少天发表的论文
+
+    Returns:
+        SavedQuery: 保存的查询
+
+    Raises:
+        ValueError: 名称或关键词无效
+    """
+    if not _NAME_RE.match(name):
+        raise ValueError("查询名称只能包含字母、数字、空格和 -_.，最长64个字符")
+    if not query.strip():
+        raise ValueError("搜索关键词不能为空")
+
+    watch = SavedQuery(
+        name=name,
+        query=query.strip(),
+        fuzzy_search=fuzzy_search,
+        year_start=year_start,
+        year_end=year_end,
+        since=(_today() - timedelta(days=max(0, backfill_days))).isoformat(),
+    )
+    return await asyncio.to_thread(get_store().update, name, lambda _: watch)
+
+
+async def list_queries() -> List[SavedQuery]:
+    return await asyncio.to_thread(get_store().list)
+
+
+async def delete_query(name: str) -> bool:
+    """删除一个查询，返回是否存在"""
+    existed = []
+
+    def change(current: Optional[SavedQuery]) -> None:
+        existed.append(current is not None)
+        return None
+
+    await asyncio.to_thread(get_store().update, name, change)
+    return existed[0]
+
+
+def _window_start(watch: SavedQuery) -> str:
+    if not watch.last_checked:
+        return watch.since or _today().isoformat()
+    lookback = int(get_env("MCP_SCHOLAR_WATCH_LOOKBACK_DAYS", "3"))
+    start = date.fromisoformat(watch.last_checked) - timedelta(days=lookback)
+    return start.isoformat()
+
+
+@traced("watch.check_query")
+async def check_query(name: str) -> Dict[str, Any]:
+    """
+    检查一个保存的查询，只返回上次检查以来新出现的论文
+
+    上一次检查被页数上限截断时，这次从保存的cursor继续取完剩下的论文
+
+    Args:
+        name: 查询名称
+
+    Returns:
+        Dict: new_papers（新论文列表）、since（请求的起始日期）、requests（上游请求数）、
+            truncated（新增结果是否超过页数上限，超过时只返回最新的部分，
+            剩下的在下一次检查时返回）
+
+    Raises:
+        KeyError: 查询不存在
+    """
+    store = get_store()
+    watch = await asyncio.to_thread(store.get, name)
+    if watch is None:
+        raise KeyError(name)
+
+    if watch.resume_cursor:
+        since, cursor = watch.resume_since, watch.resume_cursor
+        checked_on = watch.resume_checked_on
+    else:
+        since, cursor = _window_start(watch), "*"
+        checked_on = _today().isoformat()
+    base_url = build_search_url(
+        watch.query,
+        PAGE_SIZE,
+        fuzzy_search=watch.fuzzy_search,
+        sort_by="date",
+        year_start=watch.year_start,
+        year_end=watch.year_end,
+        filters=[f"from_publication_date:{since}"],
+    )
+
+    seen = set(watch.seen_ids)
+    new_papers: List[Dict[str, Any]] = []
+    requests = 0
+    max_pages = int(get_env("MCP_SCHOLAR_WATCH_MAX_PAGES", "5"))
+    async with upstream.session(timeout=15.0) as client:
+        while cursor and requests < max_pages:
+            # 每次检查都要看到最新数据，不使用响应缓存
+            response = await _http_get(
+                client,
+                f"{base_url}&cursor={cursor}",
+                "/works?filter=from_publication_date:{date}",
+                use_cache=False,
+            )
+            requests += 1
+            if response.status_code != 200:
+                raise RuntimeError(f"OpenAlex API错误: {response.status_code}")
+            data, papers = await _parse_results(response)
+            for paper in papers:
+                if paper["paper_id"] and paper["paper_id"] not in seen:
+                    seen.add(paper["paper_id"])
+                    new_papers.append(paper)
+            if len(papers) < PAGE_SIZE:
+                cursor = None
+            else:
+                cursor = data.get("meta", {}).get("next_cursor")
+
+    # 达到页数上限时只返回最新的部分，剩下的下一次检查从cursor继续
+    truncated = bool(cursor)
+    if truncated:
+        logger.warning(
+            f"查询 {name} 的新增结果超过{max_pages}页，剩下的在下一次检查时返回"
+        )
+
+    new_ids = [paper["paper_id"] for paper in new_papers]
+
+    def record(current: Optional[SavedQuery]) -> Optional[SavedQuery]:
+        if current is None:
+            # 检查期间查询被删除
+            return None
+        known = set(current.seen_ids)
+        current.seen_ids.extend(i for i in new_ids if i not in known)
+        current.seen_ids = current.seen_ids[-MAX_SEEN_IDS:]
+        if truncated:
+            # 取完之前不推进检查日期，否则更早的论文会落在下一次的回看窗口之外
+            current.resume_cursor = cursor or ""
+            current.resume_since = since
+            current.resume_checked_on = checked_on
+        else:
+            current.resume_cursor = current.resume_since = ""
+            current.resume_checked_on = ""
+            current.last_checked = checked_on
+        return current
+
+    await asyncio.to_thread(store.update, name, record)
+    return {
+        "new_papers": new_papers,
+        "since": since,
+        "requests": requests,
+        "truncated": truncated,
+    }
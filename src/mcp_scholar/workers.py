@@ -0,0 +1,151 @@
+"""
+解析工作池
+一页200条work记录的JSON解码和倒排索引摘要还原需要几十毫秒的纯CPU时间，
+在事件循环中执行会让同一进程中所有并发的工具调用一起停顿。
+超过阈值的响应交给线程池或进程池解析，只把解析后的紧凑记录送回事件循环
+
+- thread: 解析仍受GIL限制，但事件循环每个切换间隔（默认5ms）都能拿回GIL，不会被整页解析阻塞
+- process: 在独立进程中解析，真正并行；响应正文和解析结果需要在进程间复制，
+  需要原始记录（开启了本地记录存储）时原始记录也要复制回来
+
+交给工作池的解析在调用方记录一个parse.offload span。线程池中的解析在调用方的上下文中执行，
+解析阶段的span挂在同一条链路下；工作进程中关闭追踪，只有调用方的span
+
+通过环境变量配置:
+    MCP_SCHOLAR_PARSE_POOL: thread（默认）、process，或none表示总在事件循环中解析
+    MCP_SCHOLAR_PARSE_WORKERS: 工作线程或进程数，默认2
+    MCP_SCHOLAR_PARSE_OFFLOAD_BYTES: 响应正文达到多少字节时交给工作池，默认65536
+"""
+
+import asyncio
+import concurrent.futures
+import contextvars
+import json
+import logging
+import multiprocessing
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from mcp_scholar import tracing
+from mcp_scholar.config import get_env
+from mcp_scholar.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+POOL_KINDS = ("thread", "process", "none")
+
+# 解析结果：去掉results后的响应（meta等）、解析后的记录、可选的原始记录
+ParsedPage = Tuple[Dict[str, Any], List[Any], Optional[List[Dict[str, Any]]]]
+
+
+def decode_and_parse(
+    body: bytes, parser: Callable[[Dict[str, Any]], Any], keep_raw: bool = False
+) -> ParsedPage:
+    """
+    解码列表响应并逐条解析results，在工作线程或进程中执行
+
+    Args:
+        body: 响应正文
+        parser: 模块级的解析函数（进程池需要能按名字导入）
+        keep_raw: 是否同时返回原始记录
+
+    Returns:
+        ParsedPage: (去掉results的响应, 解析后的记录, 原始记录或None)
+    """
+    data = json.loads(body)
+    if not isinstance(data, dict):
+        return {}, [], None
+    results = data.pop("results", None) or []
+    parsed = [parser(item) for item in results]
+    return data, parsed, results if keep_raw else None
+
+
+def _init_process() -> None:
+    """工作进程初始化：关闭追踪，否则进程中的span各自成为根span"""
+    tracing.configure(None)
+
+
+class ParsePool:
+    """按需创建的线程池或进程池"""
+
+    def __init__(
+        self, kind: str = "thread", workers: int = 2, offload_bytes: int = 65536
+    ):
+        if kind not in POOL_KINDS:
+            logger.warning(f"未知的解析工作池类型 {kind}，使用thread")
+            kind = "thread"
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.offload_bytes = offload_bytes
+        self._executor: Optional[concurrent.futures.Executor] = None
+
+    def _get_executor(self) -> concurrent.futures.Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                # spawn：不复制父进程中的事件循环、连接池和锁
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_process,
+                )
+            else:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    self.workers, thread_name_prefix="mcp-scholar-parse"
+                )
+        return self._executor
+
+    def should_offload(self, size: int) -> bool:
+        return self.kind != "none" and size >= self.offload_bytes
+
+    async def parse(
+        self,
+        body: bytes,
+        parser: Callable[[Dict[str, Any]], Any],
+        keep_raw: bool = False,
+    ) -> ParsedPage:
+        """小响应直接解析，大响应交给工作池"""
+        if not self.should_offload(len(body)):
+            return decode_and_parse(body, parser, keep_raw)
+        metrics.inc("parse.offloaded", pool=self.kind)
+        loop = asyncio.get_running_loop()
+        with tracing.span("parse.offload", pool=self.kind, response_bytes=len(body)):
+            if self.kind == "process":
+                return await loop.run_in_executor(
+                    self._get_executor(), decode_and_parse, body, parser, keep_raw
+                )
+            # run_in_executor不会把contextvars带到工作线程，显式复制当前上下文
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(
+                self._get_executor(),
+                context.run,
+                decode_and_parse,
+                body,
+                parser,
+                keep_raw,
+            )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_pool: Optional[ParsePool] = None
+
+
+def get_pool() -> ParsePool:
+    """按环境变量惰性创建解析工作池"""
+    global _pool
+    if _pool is None:
+        _pool = ParsePool(
+            kind=get_env("MCP_SCHOLAR_PARSE_POOL", "thread").strip().lower(),
+            workers=int(get_env("MCP_SCHOLAR_PARSE_WORKERS", "2")),
+            offload_bytes=int(get_env("MCP_SCHOLAR_PARSE_OFFLOAD_BYTES", "65536")),
+        )
+    return _pool
+
+
+def set_pool(pool: Optional[ParsePool]) -> None:
+    """替换解析工作池，传入None时下次使用会按环境变量重新创建"""
+    global _pool
+    if _pool is not None and _pool is not pool:
+        _pool.shutdown()
+    _pool = pool
@@ -0,0 +1,65 @@
+import copy
+import httpx
+import pytest
+from mcp_scholar import cache, upstream
+from mcp_scholar.cache import ResponseCache
+from mcp_scholar.upstream import RateLimiter
+
+WORK = {
+    "id": "https://openalex.org/W1",
+    "title": "Attention Is All You Need",
+    "cited_by_count": 100,
+    "publication_year": 2017,
+    "abstract_inverted_index": {"The": [0], "dominant": [1], "models": [2]},
+    "authorships": [{"author": {"display_name": "Ashish Vaswani"}}],
+    "doi": "10.1/abc",
+}
+
+
+@pytest.fixture
+def work():
+    """一条OpenAlex返回的原始work记录，每个测试得到独立的副本"""
+    return copy.deepcopy(WORK)
+
+
+@pytest.fixture
+def make_work(work):
+    """按编号生成work记录：ID为W{i}、标题为Paper {i}，其他字段可以覆盖"""
+
+    def make(i, **fields):
+        return dict(
+            copy.deepcopy(work),
+            id=f"https://openalex.org/W{i}",
+            title=f"Paper {i}",
+            **fields,
+        )
+
+    return make
+
+
+@pytest.fixture
+def install_mock(monkeypatch):
+    """
+    让上游请求走MockTransport，并使用独立的缓存和不限速的限流器，测试结束时恢复
+
+    返回install(handler, ttl=3600.0, path=None)，它返回记录请求URL的列表
+    """
+
+    def install(handler, ttl=3600.0, path=None):
+        calls = []
+
+        def recording(request):
+            calls.append(str(request.url))
+            return handler(request)
+
+        def get_client():
+            return httpx.AsyncClient(transport=httpx.MockTransport(recording))
+
+        monkeypatch.setattr(upstream, "get_client", get_client)
+        cache.set_cache(ResponseCache(ttl=ttl, path=path))
+        upstream.set_limiter(RateLimiter(0))
+        return calls
+
+    yield install
+    cache.set_cache(None)
+    upstream.set_limiter(None)
@@ -0,0 +1,157 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from mcp.shared.memory import create_connected_server_and_client_session
+from mcp_scholar import admission, deadline
+from mcp_scholar.admission import AdmissionController, ServerBusy
+from mcp_scholar.metrics import metrics
+from mcp_scholar.server import _admitted, _session_key, mcp
+
+
+def test_session_limit_and_queue_bound():
+    print("测试每会话并发限制和排队上限...")
+    controller = AdmissionController(
+        max_concurrent=10, max_per_session=1, max_session_queue=1, queue_timeout=5
+    )
+    release = asyncio.Event()
+    outcomes = []
+
+    async def call(session):
+        try:
+            async with controller.admit(session):
+                outcomes.append(("run", session))
+                await release.wait()
+        except ServerBusy as busy:
+            outcomes.append((busy.reason, session))
+
+    async def run():
+        tasks = [asyncio.create_task(call("agent-a")) for _ in range(3)]
+        tasks.append(asyncio.create_task(call("agent-b")))
+        await asyncio.sleep(0.05)
+        # agent-a: 一个在执行，一个在排队，第三个被拒绝；agent-b不受影响
+        assert controller.running == 2
+        assert controller.waiting == 1
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert ("session_queue_full", "agent-a") in outcomes
+    assert outcomes.count(("run", "agent-a")) == 2
+    assert ("run", "agent-b") in outcomes
+    assert controller.running == 0 and controller._sessions == {}
+
+
+def test_queue_timeout_reports_retry_after():
+    controller = AdmissionController(max_concurrent=1, queue_timeout=0.05)
+
+    async def run():
+        async with controller.admit("a"):
+            try:
+                async with controller.admit("b"):
+                    pass
+            except ServerBusy as busy:
+                return busy
+
+    busy = asyncio.run(run())
+    assert busy.reason == "timeout"
+    assert busy.retry_after >= 1.0
+    assert metrics.counter("admission.rejected", reason="timeout") >= 1
+
+
+def test_expired_deadline_rejected_before_queueing():
+    print("测试时间预算用完的调用不进入排队...")
+    controller = AdmissionController(max_concurrent=1)
+
+    async def run():
+        with deadline.budget(0.01):
+            await asyncio.sleep(0.05)
+            try:
+                async with controller.admit("a"):
+                    pass
+            except ServerBusy as busy:
+                return busy
+
+    busy = asyncio.run(run())
+    assert busy.reason == "deadline"
+    assert controller.waiting == 0
+    assert controller.running == 0
+    assert "a" not in controller._sessions
+
+
+def test_tool_returns_busy_status():
+    print("测试工具被拒绝时返回繁忙状态...")
+    controller = AdmissionController(max_concurrent=1, max_queue=0)
+    admission.set_controller(controller)
+
+    async def run():
+        async with create_connected_server_and_client_session(
+            mcp._mcp_server
+        ) as client:
+            # 占住唯一的名额，之后的调用会因为排队已满被拒绝
+            async with controller.admit("other"):
+                result = await client.call_tool("paper_detail", {"paper_id": "W1"})
+                health = await client.call_tool("health_check")
+            stats = await client.call_tool("server_metrics")
+        return result, health, stats
+
+    try:
+        result, health, stats = asyncio.run(run())
+    finally:
+        admission.set_controller(None)
+
+    data = json.loads(result.content[0].text)
+    assert data["status"] == "busy"
+    assert data["reason"] == "queue_full"
+    assert "retry_after" in data
+    # 繁忙时健康检查仍然可用，并报告新的调用会被拒绝
+    assert (
+        health.content[0].text.splitlines()[0]
+        == "MCP Scholar服务降级运行：admission_queue_full"
+    )
+    snapshot = json.loads(stats.content[0].text)
+    assert snapshot["counters"]["admission.rejected{reason=queue_full}"] >= 1
+
+
+def _request_ctx(headers, host="10.0.0.5"):
+    """网络模式下的工具调用上下文：每个请求都有新的会话对象"""
+    request = SimpleNamespace(headers=headers, client=SimpleNamespace(host=host))
+    return SimpleNamespace(
+        client_id=None,
+        session=object(),
+        request_context=SimpleNamespace(request=request),
+    )
+
+
+def test_session_key_is_stable_across_requests():
+    print("测试同一客户端的不同请求使用同一个会话键...")
+    first, second = _request_ctx({}), _request_ctx({})
+    assert _session_key(first) == _session_key(second) == "addr-10.0.0.5"
+    assert _session_key(_request_ctx({"mcp-session-id": "abc"})) == "session-abc"
+    assert _session_key(None) == "default"
+
+    controller = AdmissionController(
+        max_concurrent=10, max_per_session=1, max_session_queue=0
+    )
+    admission.set_controller(controller)
+    release = asyncio.Event()
+
+    async def slow_tool(ctx):
+        await release.wait()
+        return {"status": "success"}
+
+    tool = _admitted(slow_tool)
+
+    async def run():
+        running = asyncio.create_task(tool(ctx=first))
+        await asyncio.sleep(0.01)
+        rejected = await tool(ctx=second)
+        release.set()
+        return await running, rejected
+
+    try:
+        done, rejected = asyncio.run(run())
+    finally:
+        admission.set_controller(None)
+    assert done["status"] == "success"
+    assert rejected["status"] == "busy"
+    assert rejected["reason"] == "session_queue_full"
@@ -0,0 +1,38 @@
+import asyncio
+import httpx
+from mcp_scholar.scholar import format_authors, parse_work, search_scholar
+
+
+def _authorships(count):
+    return [{"author": {"display_name": f"Author {i}"}} for i in range(count)]
+
+
+def test_hyper_authored_paper_truncated(monkeypatch, work):
+    print("测试截断超长作者列表...")
+    monkeypatch.setenv("MCP_SCHOLAR_AUTHORS_HEAD", "3")
+    monkeypatch.setenv("MCP_SCHOLAR_AUTHORS_TAIL", "1")
+    paper = parse_work(dict(work, authorships=_authorships(3000)))
+    assert paper["authors"] == (
+        "Author 0, Author 1, Author 2, …, Author 2999, +2996 more"
+    )
+    # 作者不多时保留全部作者
+    assert format_authors(_authorships(4)) == "Author 0, Author 1, Author 2, Author 3"
+    # OpenAlex已截断作者列表时最后几位不是真正的末位作者
+    assert format_authors(_authorships(100), truncated=True) == (
+        "Author 0, Author 1, Author 2, +97+ more"
+    )
+    truncated = parse_work(
+        dict(work, authorships=_authorships(100), is_authors_truncated=True)
+    )
+    assert truncated["authors"] == "Author 0, Author 1, Author 2, +97+ more"
+
+
+def test_list_requests_select_fields(monkeypatch, work, install_mock):
+    calls = install_mock(lambda request: httpx.Response(200, json={"results": [work]}))
+    asyncio.run(search_scholar("attention", 1))
+    monkeypatch.setenv("MCP_SCHOLAR_SELECT_FIELDS", "0")
+    asyncio.run(search_scholar("attention", 2))
+
+    assert "select=id,doi,title," in calls[0] and "authorships" in calls[0]
+    assert "is_authors_truncated" in calls[0]
+    assert "select=" not in calls[-1]
@@ -0,0 +1,117 @@
+import asyncio
+import httpx
+from mcp_scholar.coauthors import CoauthorGraph
+from mcp_scholar.server import coauthor_network
+
+
+def _authorship(author_id, name, orcid=None):
+    return {
+        "author": {
+            "id": f"https://openalex.org/{author_id}",
+            "display_name": name,
+            "orcid": orcid,
+        }
+    }
+
+
+ME = _authorship("A1", "Me", "https://orcid.org/0000-0001")
+ALICE = _authorship("A2", "Alice")
+BOB = _authorship("A3", "Bob")
+CAROL = _authorship("A4", "Carol")
+
+PAGES = [
+    [
+        {"id": "W1", "publication_year": 2015, "authorships": [ME, ALICE, BOB]},
+        {"id": "W2", "publication_year": 2019, "authorships": [ALICE, ME]},
+    ],
+    [
+        {"id": "W3", "publication_year": 2021, "authorships": [ME, ALICE, CAROL]},
+        {"id": "W4", "publication_year": None, "authorships": [ME, BOB]},
+    ],
+]
+
+
+def _handler(request):
+    cursor = request.url.params["cursor"]
+    page = 0 if cursor == "*" else int(cursor)
+    return httpx.Response(
+        200,
+        json={
+            "results": PAGES[page],
+            "meta": {"next_cursor": str(page + 1) if page + 1 < len(PAGES) else None},
+        },
+    )
+
+
+def test_coauthor_network(install_mock):
+    print("测试构建合作者网络...")
+    calls = install_mock(_handler)
+
+    async def run():
+        first = await coauthor_network(None, "https://openalex.org/authors/A1")
+        second = await coauthor_network(None, "A1", top_n=1)
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first["status"] == "success" and first["complete"] is True
+    assert first["works"] == 4 and first["total_coauthors"] == 3
+    assert first["collaborators"][0] == {
+        "id": "A2",
+        "name": "Alice",
+        "works": 3,
+        "first_year": 2015,
+        "last_year": 2021,
+    }
+    # 年份未知的作品只计入合作次数
+    assert first["collaborators"][1]["works"] == 2
+    assert first["collaborators"][1]["last_year"] == 2015
+    assert [0, 1, 1] in first["edges"] and [0, 2, 1] in first["edges"]
+    # 只请求需要的字段；第二次调用命中缓存
+    assert len(calls) == 2
+    assert "filter=author.id:A1" in calls[0] and "select=" in calls[0]
+    assert len(second["collaborators"]) == 1 and second["edges"] == []
+
+
+def test_large_team_skips_pairwise_edges():
+    graph = CoauthorGraph(max_team=2)
+    graph.add_work([("A2", "Alice"), ("A3", "Bob"), ("A4", "Carol")], 2020)
+    graph.add_work([("A2", "Alice"), ("A3", "Bob")], 2021)
+    assert list(graph.counts) == [2, 2, 1]
+    assert graph.summary(3)["edges"] == [[0, 1, 1]]
+
+
+def test_max_works_result_is_cached(install_mock):
+    print("测试达到max_works的合作图同样缓存...")
+    calls = install_mock(_handler)
+
+    async def run():
+        first = await coauthor_network(None, "A1", max_works=2)
+        second = await coauthor_network(None, "A1", max_works=2)
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first["complete"] is False and "partial" not in first
+    assert first["works"] == 2
+    assert second["works"] == 2 and len(calls) == 1
+
+
+def test_budget_timeout_returns_partial_graph(install_mock):
+    print("测试预算在请求中途用完时返回部分合作图...")
+
+    async def handler(request):
+        if request.url.params["cursor"] == "*":
+            return _handler(request)
+        await asyncio.sleep(0.3)
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    install_mock(handler)
+    result = asyncio.run(
+        coauthor_network(None, "A1", max_works=100, timeout_seconds=0.2)
+    )
+
+    assert result["status"] == "success" and result["complete"] is False
+    assert result["works"] == 2
+    assert result["partial"] is True
+    assert "coauthors_truncated" in result["partial_reasons"]
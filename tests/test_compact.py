@@ -0,0 +1,53 @@
+import asyncio
+import httpx
+from mcp_scholar.compact import compact_papers, estimate_tokens
+from mcp_scholar.server import paper_references, scholar_search
+
+
+def test_compact_search_format(work, make_work, install_mock):
+    print("测试紧凑的表格响应格式...")
+    results = [
+        make_work(i, doi=None, abstract_inverted_index={f"word{i}": list(range(200))})
+        for i in range(4)
+    ]
+    install_mock(lambda request: httpx.Response(200, json={"results": results}))
+
+    async def run():
+        full = await scholar_search(None, "word", count=4)
+        compact = await scholar_search(None, "word", count=4, format="compact")
+        minimal = await paper_references(
+            None, "W9", count=4, format="compact", detail="minimal"
+        )
+        return full, compact, minimal
+
+    full, compact, minimal = asyncio.run(run())
+
+    assert compact["format"] == "compact" and compact["total_results"] == 4
+    papers = compact["papers"]
+    # 全为空的doi_url、与paper_id重复的url不输出，相同的值只输出一次
+    assert "doi_url" not in papers["columns"] and "url" not in papers["columns"]
+    assert papers["common"]["year"] == work["publication_year"]
+    row = dict(zip(papers["columns"], papers["rows"][0]))
+    assert row["paper_id"] == "W0" and row["title"] == "Paper 0"
+    assert len(row["abstract"]) <= 301 and row["abstract"].endswith("…")
+    assert "abstract" not in minimal["references"]["columns"]
+    assert "abstract" not in minimal["references"].get("common", {})
+    # 两种格式都带token估算，紧凑格式明显更小
+    assert 0 < compact["estimated_tokens"] < full["estimated_tokens"] / 2
+    assert minimal["estimated_tokens"] < compact["estimated_tokens"]
+
+
+def test_invalid_format_rejected():
+    result = asyncio.run(scholar_search(None, "word", format="xml"))
+    assert result["status"] == "error" and "xml" in result["message"]
+
+
+def test_compact_keeps_partially_empty_columns():
+    table = compact_papers(
+        [{"title": "A", "venue": ""}, {"title": "B", "venue": "ICML"}], "full"
+    )
+    assert table == {
+        "columns": ["title", "venue"],
+        "rows": [["A", None], ["B", "ICML"]],
+    }
+    assert estimate_tokens("中文") == 3
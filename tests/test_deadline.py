@@ -0,0 +1,79 @@
+import asyncio
+import time
+import httpx
+import pytest
+from mcp_scholar import deadline
+from mcp_scholar.deadline import DeadlineExceeded
+from mcp_scholar.server import adaptive_search, scholar_search
+from mcp_scholar.upstream import RateLimiter
+
+
+def test_budget_nesting_and_clamp():
+    print("测试时间预算嵌套和超时限制...")
+    assert deadline.remaining() is None
+    assert deadline.clamp_timeout(15.0) == 15.0
+
+    with deadline.budget(10) as outer:
+        with deadline.budget(60):
+            # 嵌套预算不能超过外层的截止时间
+            assert deadline.remaining() <= 10
+            assert deadline.clamp_timeout(15.0) <= 10
+        deadline.mark_partial("step_skipped")
+        deadline.mark_partial("step_skipped")
+    assert outer == ["step_skipped"]
+
+    with deadline.budget(0.01):
+        time.sleep(0.02)
+        assert deadline.is_expired()
+        with pytest.raises(DeadlineExceeded):
+            deadline.clamp_timeout(15.0)
+
+
+def test_rate_limit_wait_respects_budget():
+    print("测试等待速率预算时不超出时间预算...")
+    limiter = RateLimiter(0.1)
+
+    async def run():
+        await limiter.acquire()
+        with deadline.budget(1):
+            started = time.monotonic()
+            with pytest.raises(DeadlineExceeded):
+                # 下一个令牌要等10秒，超出预算时立即放弃
+                await limiter.acquire()
+            return time.monotonic() - started
+
+    assert asyncio.run(run()) < 0.5
+
+
+def test_search_skips_enrichment_when_budget_low(work, install_mock):
+    print("测试预算不足时跳过摘要补全并返回部分结果...")
+    calls = install_mock(lambda request: httpx.Response(200, json={"results": [work]}))
+
+    result = asyncio.run(scholar_search(None, "attention", 1, timeout_seconds=1.5))
+
+    assert result["status"] == "success"
+    assert result["papers"][0]["title"] == "Attention Is All You Need"
+    assert result["partial"] is True
+    assert result["partial_reasons"] == ["abstract_enrichment_skipped"]
+    # 只发出了搜索请求，没有DOI摘要补全请求
+    assert len(calls) == 1
+
+
+def test_adaptive_search_skips_fuzzy_fallback(install_mock):
+    print("测试预算不足时跳过模糊搜索回退...")
+    calls = install_mock(lambda request: httpx.Response(200, json={"results": []}))
+
+    async def run():
+        low = await adaptive_search(None, "attention", timeout_seconds=1.5)
+        enough = await adaptive_search(None, "attention", timeout_seconds=30)
+        return low, enough
+
+    low, enough = asyncio.run(run())
+
+    assert low["status"] == "success"
+    assert low["partial_reasons"] == ["fuzzy_fallback_skipped"]
+    assert low["search_mode"] == "精确搜索"
+    assert "partial" not in enough
+    assert enough["search_mode"].startswith("模糊搜索")
+    # 第一次只有精确搜索；第二次精确搜索命中缓存，再发出模糊搜索
+    assert len(calls) == 2
@@ -0,0 +1,96 @@
+import asyncio
+import random
+import time
+import httpx
+from mcp_scholar import ranking
+from mcp_scholar.dedup import dedupe_papers, minhash_signatures, shingles
+from mcp_scholar.scholar import get_paper_references
+
+AUTHORS = "Ashish Vaswani, Noam Shazeer, Niki Parmar, Jakob Uszkoreit"
+
+
+def test_preprint_and_published_collapse():
+    print("测试预印本和正式版本合并...")
+    papers = [
+        {
+            "paper_id": "W1",
+            "title": "Attention is all you need",
+            "authors": AUTHORS,
+            "citations": 300,
+            "doi": "https://doi.org/10.48550/arxiv.1706.03762",
+        },
+        {"paper_id": "W2", "title": "Deep residual learning", "authors": "Kaiming He"},
+        {
+            "paper_id": "W3",
+            "title": "Attention Is All You Need.",
+            "authors": AUTHORS.upper(),
+            "citations": 5000,
+            "doi": "https://doi.org/10.5555/3295222",
+        },
+        {
+            "paper_id": "W4",
+            "title": "Attention is All You Need",
+            "authors": AUTHORS,
+            "citations": 9000,
+        },
+    ]
+    merged = dedupe_papers(papers)
+    assert [p["paper_id"] for p in merged] == ["W3", "W2"]
+    # 规范记录优先有DOI的，其次引用量最高的
+    assert merged[0]["citations"] == 5000
+    assert merged[0]["alternate_ids"] == ["W1", "W4"]
+    assert "alternate_ids" not in merged[1]
+
+
+def test_different_papers_kept():
+    papers = [
+        {"paper_id": "W1", "title": "Attention is all you need", "authors": AUTHORS},
+        {"paper_id": "W2", "title": "Attention is not all you need", "authors": "X Y"},
+        {"paper_id": "W3", "title": "未知标题", "authors": ""},
+        {"paper_id": "W4", "title": "未知标题", "authors": ""},
+    ]
+    assert len(dedupe_papers(papers)) == 4
+
+
+def test_signatures_match_without_numpy(monkeypatch):
+    features = [shingles({"title": f"graph neural network {i}"}) for i in range(20)]
+    with_numpy = minhash_signatures(features + [[]])
+    monkeypatch.setattr(ranking, "optional_numpy", lambda: None)
+    assert minhash_signatures(features + [[]]) == with_numpy
+    assert with_numpy[-1] == ()
+
+
+def test_dedup_scales_to_thousands():
+    print("测试几千篇候选论文的合并耗时...")
+    rng = random.Random(0)
+    words = [f"w{i}" for i in range(20000)]
+    papers = [
+        {
+            "paper_id": f"W{i}",
+            "title": " ".join(rng.choices(words, k=9)),
+            "authors": f"Author {i}",
+        }
+        for i in range(3000)
+    ]
+    papers += [dict(p, paper_id=f"P{i}") for i, p in enumerate(papers[:300])]
+    started = time.perf_counter()
+    merged = dedupe_papers(papers)
+    assert time.perf_counter() - started < 5
+    assert len(merged) == 3000
+
+
+def test_references_dedup(work, install_mock):
+    print("测试引用列表合并近似重复论文...")
+    works = [
+        dict(work, id="https://openalex.org/W1", cited_by_count=10, doi=None),
+        dict(work, id="https://openalex.org/W2", cited_by_count=50),
+        dict(work, id="https://openalex.org/W3", title="Other paper"),
+    ]
+    calls = install_mock(lambda request: httpx.Response(200, json={"results": works}))
+
+    references = asyncio.run(get_paper_references("W9", 2))
+
+    assert [p["paper_id"] for p in references] == ["W2", "W3"]
+    assert references[0]["alternate_ids"] == ["W1"]
+    # 多取一倍候选，合并后仍能填满count
+    assert "per_page=4" in calls[0]
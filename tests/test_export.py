@@ -0,0 +1,128 @@
+import asyncio
+import json
+import httpx
+import pytest
+from mcp_scholar import cache, deadline, export
+from mcp_scholar.server import export_results
+
+
+def _paged_handler(make_work, total, page_size):
+    def handler(request):
+        cursor = request.url.params["cursor"]
+        start = 0 if cursor == "*" else int(cursor)
+        end = min(start + page_size, total)
+        return httpx.Response(
+            200,
+            json={
+                "results": [make_work(i) for i in range(start, end)],
+                "meta": {"next_cursor": str(end) if end < total else None},
+            },
+        )
+
+    return handler
+
+
+def test_export_jsonl_streams_pages(tmp_path, work, make_work, install_mock):
+    print("测试按页流式导出JSONL...")
+    calls = install_mock(_paged_handler(make_work, 450, 200))
+    path = tmp_path / "citing.jsonl"
+
+    result = asyncio.run(export.export_results("citing", "W9", str(path)))
+    # 导出的页不写入响应缓存
+    assert len(cache.get_cache().memory) == 0
+
+    assert result["rows"] == 450 and result["pages"] == 3
+    assert result["complete"] is True
+    assert "filter=cites:W9" in calls[0] and "per_page=200" in calls[0]
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 450
+    first = json.loads(lines[0])
+    assert first["paper_id"] == "W0" and first["year"] == work["publication_year"]
+
+
+def test_export_max_rows_and_author_url(tmp_path, make_work, install_mock):
+    calls = install_mock(_paged_handler(make_work, 1000, 200))
+    path = tmp_path / "works.jsonl"
+
+    result = asyncio.run(
+        export.export_results(
+            "author",
+            "https://openalex.org/authors/A123",
+            str(path),
+            max_rows=250,
+            year_start=2020,
+        )
+    )
+
+    assert result["rows"] == 250 and len(calls) == 2
+    assert "filter=author.id:A123,publication_year:%3E2019" in calls[0]
+
+
+@pytest.mark.parametrize("fmt", ["arrow", "parquet"])
+def test_export_columnar(tmp_path, fmt, make_work, install_mock):
+    print(f"测试导出{fmt}格式...")
+    pa = pytest.importorskip("pyarrow")
+    install_mock(_paged_handler(make_work, 450, 200))
+    path = tmp_path / f"search.{fmt}"
+
+    result = asyncio.run(export.export_results("search", "graph", str(path), fmt=fmt))
+
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path)
+        assert pq.ParquetFile(path).num_row_groups == 3
+    else:
+        with pa.ipc.open_file(path) as reader:
+            assert reader.num_record_batches == 3
+            table = reader.read_all()
+    assert result["rows"] == table.num_rows == 450
+    assert table.schema.field("citations").type == pa.int64()
+    assert table.column("paper_id")[449].as_py() == "W449"
+
+
+def test_export_tool_stays_in_export_dir(
+    monkeypatch, tmp_path, make_work, install_mock
+):
+    print("测试导出工具只写入导出目录...")
+    monkeypatch.setenv("MCP_SCHOLAR_EXPORT_DIR", str(tmp_path))
+    install_mock(_paged_handler(make_work, 10, 200))
+
+    async def run():
+        ok = await export_results(None, "search", "graph", file_name="gnn")
+        escape = await export_results(None, "search", "graph", file_name="../x")
+        bad = await export_results(None, "search", "graph", format="csv")
+        return ok, escape, bad
+
+    ok, escape, bad = asyncio.run(run())
+
+    assert ok["status"] == "success" and ok["rows"] == 10
+    assert ok["path"] == str(tmp_path / "gnn.jsonl")
+    assert escape["status"] == "error"
+    assert bad["status"] == "error"
+
+
+def test_export_timeout_after_budget_returns_partial(tmp_path, make_work, install_mock):
+    print("测试预算在请求中途用完时返回已导出的部分...")
+    first_page = _paged_handler(make_work, 450, 200)
+
+    async def handler(request):
+        if request.url.params["cursor"] == "*":
+            return first_page(request)
+        # 第二页很慢，超时被限制在剩余预算内
+        await asyncio.sleep(0.3)
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    install_mock(handler)
+    path = tmp_path / "citing.jsonl"
+
+    async def run():
+        with deadline.budget(0.2) as partial:
+            result = await export.export_results("citing", "W9", str(path))
+        return result, partial
+
+    result, partial = asyncio.run(run())
+
+    assert result["complete"] is False and result["rows"] == 200
+    assert "export_truncated" in partial
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 200
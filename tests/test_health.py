@@ -0,0 +1,106 @@
+import asyncio
+import httpx
+from mcp_scholar import health
+from mcp_scholar.deadline import DeadlineExceeded
+from mcp_scholar.scheduler import INTERACTIVE, Scheduler
+from mcp_scholar.server import health_check, health_status
+
+
+def test_health_status_ready(work, install_mock):
+    print("测试深度健康检查...")
+    calls = install_mock(lambda request: httpx.Response(200, json={"results": [work]}))
+
+    async def run():
+        first = await health_status(None)
+        # 第二次读取探测结果，不再请求上游
+        return first, await health_status(None)
+
+    first, second = asyncio.run(run())
+
+    assert len(calls) == 1 and "per_page=1&select=id" in calls[0]
+    assert first["status"] == "ready" and first["reasons"] == []
+    assert first["probe"]["ok"] and first["probe"]["latency_ms"] >= 0
+    assert second["probe"]["checked"]
+    assert second["upstream"]["throttled"] is False
+    assert "hit_ratio" in second["cache"]["memory"]
+    assert second["admission"]["queue_depth"] == 0
+
+
+def test_probe_failures_make_service_unavailable(install_mock):
+    print("测试上游探测连续失败...")
+    install_mock(lambda request: httpx.Response(503))
+
+    async def run():
+        probe = health.ensure_started()
+        await probe.probe()
+        degraded = await health.report()
+        for _ in range(health.UNAVAILABLE_AFTER - 1):
+            await probe.probe()
+        return degraded, await health.report()
+
+    degraded, unavailable = asyncio.run(run())
+
+    assert degraded["status"] == "degraded"
+    assert degraded["reasons"] == ["upstream_probe_failed", "upstream_throttled"]
+    assert degraded["upstream"]["last_congestion"]["signal"] == "unavailable"
+    assert unavailable["status"] == "unavailable"
+    assert unavailable["probe"]["consecutive_failures"] == health.UNAVAILABLE_AFTER
+
+
+def test_background_probe_schedule(monkeypatch, install_mock):
+    monkeypatch.setenv("MCP_SCHOLAR_HEALTH_PROBE_INTERVAL", "0.01")
+    calls = install_mock(lambda request: httpx.Response(200, json={"results": []}))
+
+    async def run():
+        probe = health.ensure_started(probe_now=True)
+        await asyncio.sleep(0.05)
+        probe.stop()
+        return probe.stats()
+
+    stats = asyncio.run(run())
+
+    assert len(calls) >= 2 and stats["ok"]
+
+
+def test_health_check_reports_unavailable_upstream(install_mock):
+    print("测试上游不可用时health_check不再报告正常...")
+    install_mock(lambda request: httpx.Response(503))
+
+    async def run():
+        probe = health.ensure_started()
+        for _ in range(health.UNAVAILABLE_AFTER):
+            await probe.probe()
+        return await health_check(None)
+
+    text = asyncio.run(run())
+
+    first, second = text.splitlines()[:2]
+    assert first == "MCP Scholar服务不可用：上游连续 3 次探测失败"
+    assert second.startswith("上游探测: bad_status")
+
+
+def test_probe_queue_timeout_not_counted(monkeypatch, install_mock):
+    print("测试探测在本地排队超时不计入上游失败...")
+    install_mock(lambda request: httpx.Response(200, json={"results": []}))
+    requests = []
+
+    async def starved(self, send, **kwargs):
+        requests.append(kwargs)
+        raise DeadlineExceeded("剩余时间不足以等待上游请求名额")
+
+    monkeypatch.setattr(Scheduler, "request", starved)
+
+    async def run():
+        probe = health.ensure_started()
+        for _ in range(health.UNAVAILABLE_AFTER):
+            await probe.probe()
+        probe.stop()
+        return await health.report()
+
+    report = asyncio.run(run())
+
+    assert report["status"] != "unavailable"
+    assert report["probe"] == {"checked": False}
+    # 探测按交互优先级、以独立的会话排队
+    assert requests[0]["priority"] == INTERACTIVE
+    assert requests[0]["session"] == health.PROBE_SESSION
@@ -0,0 +1,71 @@
+import io
+import json
+import logging
+import sys
+from mcp_scholar import logs
+from mcp_scholar.logs import RateLimitFilter
+
+
+def _configure(stream, monkeypatch, **env):
+    for key, value in env.items():
+        monkeypatch.setenv(key, value)
+    return logs.configure_logging(stream=stream)
+
+
+def test_json_records_go_through_queue(monkeypatch):
+    print("测试结构化日志...")
+    stream = io.StringIO()
+    _configure(stream, monkeypatch, MCP_SCHOLAR_LOG_FORMAT="json")
+    try:
+        logging.getLogger("mcp_scholar.test").info(
+            "搜索完成", extra={"tool": "scholar_search", "results": 3}
+        )
+        logging.getLogger("httpx").info("HTTP Request: GET https://api.openalex.org")
+    finally:
+        logs.shutdown_logging()
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 1
+    entry = json.loads(lines[0])
+    assert entry["msg"] == "搜索完成"
+    assert entry["level"] == "INFO"
+    assert entry["tool"] == "scholar_search"
+    assert entry["results"] == 3
+
+
+def test_exception_formatted_in_background(monkeypatch):
+    stream = io.StringIO()
+    _configure(stream, monkeypatch, MCP_SCHOLAR_LOG_FORMAT="json")
+    try:
+        try:
+            raise RuntimeError("upstream down")
+        except RuntimeError:
+            logging.getLogger("mcp_scholar.test").error("请求失败", exc_info=True)
+    finally:
+        logs.shutdown_logging()
+
+    entry = json.loads(stream.getvalue())
+    assert "RuntimeError: upstream down" in entry["exc"]
+
+
+def test_rate_limit_filter_reports_suppressed():
+    print("测试重复日志限流...")
+    rate_filter = RateLimitFilter(limit=2, window=60.0)
+    record = logging.LogRecord("x", logging.ERROR, "scholar.py", 10, "失败", (), None)
+    results = [rate_filter.filter(record) for _ in range(5)]
+    assert results == [True, True, False, False, False]
+
+    # 窗口过期后放行，并附带被丢弃的条数
+    rate_filter._state[("scholar.py", 10, "x")][0] -= 61
+    fresh = logging.LogRecord("x", logging.ERROR, "scholar.py", 10, "失败", (), None)
+    assert rate_filter.filter(fresh)
+    assert fresh.suppressed == 3
+
+
+def test_stdout_is_rejected(monkeypatch):
+    try:
+        _configure(sys.stdout, monkeypatch)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("日志不应允许写到stdout")
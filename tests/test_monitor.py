@@ -0,0 +1,56 @@
+import asyncio
+import gc
+import logging
+import time
+from mcp_scholar import monitor
+from mcp_scholar.metrics import metrics
+from mcp_scholar.server import health_check
+
+
+def test_loop_lag_monitor(caplog):
+    print("测试事件循环延迟监控...")
+    metrics.reset()
+
+    async def run():
+        watcher = monitor.Monitor(interval=0.01, lag_warn=0.1)
+        watcher.start()
+        await asyncio.sleep(0.05)
+        # 同步代码占用事件循环
+        time.sleep(0.15)
+        await asyncio.sleep(0.05)
+        watcher.stop()
+        return watcher.stats(), watcher.resources
+
+    with caplog.at_level(logging.WARNING, logger="mcp_scholar.monitor"):
+        stats, resources = asyncio.run(run())
+    assert stats["samples"] >= 3 and stats["max_ms"] >= 100
+    assert metrics.counter("event_loop.stalls") == 1
+    assert any("事件循环延迟" in record.getMessage() for record in caplog.records)
+    assert resources["pending_tasks"] >= 1
+    assert resources["upstream_connections"] == {"open": 0, "idle": 0}
+    assert resources["cpu_percent"] is not None
+
+
+def test_gc_pauses_recorded():
+    monitor._install_gc_callback()
+    before = sum(monitor.gc_pauses.collections)
+    gc.collect()
+    assert sum(monitor.gc_pauses.collections) > before
+    assert monitor.gc_pauses.stats()["max_ms"] >= 0
+
+
+def test_health_check_reports_resources(monkeypatch):
+    print("测试健康检查输出资源状态...")
+    monkeypatch.setenv("MCP_SCHOLAR_MONITOR_INTERVAL", "0.01")
+
+    async def run():
+        first = await health_check(None)
+        await asyncio.sleep(0.05)
+        return first, await health_check(None), metrics.snapshot()["gauges"]
+
+    first, report, gauges = asyncio.run(run())
+    assert first.startswith("MCP Scholar服务运行正常")
+    assert "事件循环延迟" in report and "待处理任务" in report
+    assert "GC暂停" in report
+    assert gauges["event_loop.lag"]["samples"] >= 1
+    assert "rss_bytes" in gauges["process.resources"]
@@ -0,0 +1,59 @@
+import asyncio
+import time
+import httpx
+from mcp_scholar import prefetch
+from mcp_scholar.server import paper_detail, scholar_search
+from mcp_scholar.upstream import RateLimiter
+
+
+def _search_then_detail(make_work, install_mock):
+    def handler(request):
+        if request.url.path == "/works":
+            papers = [make_work(i, doi=None) for i in range(5)]
+            return httpx.Response(200, json={"results": papers})
+        paper_id = int(request.url.path.split("/W")[-1])
+        return httpx.Response(200, json=make_work(paper_id, doi=None))
+
+    calls = install_mock(handler)
+    prefetch.set_prefetcher(None)
+
+    async def run():
+        await scholar_search(None, "paper", count=5)
+        await prefetch.get_prefetcher().drain()
+        before = len(calls)
+        detail = await paper_detail(None, "W1")
+        return before, detail
+
+    before, detail = asyncio.run(run())
+    prefetch.set_prefetcher(None)
+    return calls, before, detail
+
+
+def test_prefetch_top_results(monkeypatch, make_work, install_mock):
+    print("测试搜索后预取前K篇论文的详情...")
+    monkeypatch.setenv("MCP_SCHOLAR_PREFETCH", "1")
+    monkeypatch.setenv("MCP_SCHOLAR_PREFETCH_TOP_K", "2")
+    calls, before, detail = _search_then_detail(make_work, install_mock)
+
+    prefetched = [url for url in calls if "/works/W" in url]
+    assert len(prefetched) == 2 and "/works/W0" in prefetched[0]
+    # 后续的论文详情直接命中缓存
+    assert len(calls) == before
+    assert detail["detail"]["title"] == "Paper 1"
+
+
+def test_prefetch_disabled_by_default(monkeypatch, make_work, install_mock):
+    monkeypatch.delenv("MCP_SCHOLAR_PREFETCH", raising=False)
+    calls, before, _ = _search_then_detail(make_work, install_mock)
+    assert len(calls) == before + 1
+
+
+def test_background_requests_keep_reserve():
+    print("测试后台请求为交互请求保留速率预算...")
+    limiter = RateLimiter(10)
+    limiter._tokens = 5
+    limiter._updated = time.monotonic()
+    # 后台请求只能使用一半的令牌桶，交互请求不受影响
+    assert limiter._take(reserve=0.5) > 0
+    assert limiter._take() == 0
+    assert 4 <= limiter._tokens < 4.1
@@ -0,0 +1,61 @@
+import asyncio
+import pstats
+from mcp_scholar import profiling
+from mcp_scholar.profiling import ProfileConfig, profiled
+
+
+def _busy_parse(n):
+    """模拟解析循环中的CPU开销"""
+    return sum(len(str(i)) for i in range(n))
+
+
+@profiled("fake_search")
+async def fake_search(n=20000):
+    await asyncio.sleep(0)
+    return _busy_parse(n)
+
+
+@profiled("fake_detail")
+async def fake_detail():
+    return _busy_parse(10)
+
+
+def test_cprofile_writes_pstats(tmp_path):
+    print("测试确定性剖析...")
+    profiling.configure(
+        ProfileConfig(directory=str(tmp_path), tools=frozenset({"fake_search"}))
+    )
+    try:
+        asyncio.run(fake_search())
+        asyncio.run(fake_detail())
+    finally:
+        profiling.configure(ProfileConfig())
+
+    files = list(tmp_path.iterdir())
+    assert len(files) == 1
+    assert files[0].name.startswith("fake_search-")
+    stats = pstats.Stats(str(files[0]))
+    assert any(func[2] == "_busy_parse" for func in stats.stats)
+
+
+def test_sampling_and_tracemalloc(tmp_path):
+    print("测试采样剖析和tracemalloc快照...")
+    profiling.configure(
+        ProfileConfig(
+            directory=str(tmp_path), mode="sample", interval=0.001, tracemalloc=True
+        )
+    )
+    try:
+        asyncio.run(fake_search(50000))
+    finally:
+        profiling.configure(ProfileConfig())
+
+    suffixes = sorted(p.name.split(".", 1)[1] for p in tmp_path.iterdir())
+    assert suffixes == ["collapsed", "tracemalloc.txt"]
+
+
+def test_disabled_by_default(monkeypatch):
+    monkeypatch.delenv("MCP_SCHOLAR_PROFILE_DIR", raising=False)
+    config = profiling.configure(None)
+    assert not config.enabled
+    assert not config.matches("scholar_search")
@@ -0,0 +1,141 @@
+import asyncio
+import random
+import time
+import httpx
+import pytest
+from mcp_scholar import ranking
+from mcp_scholar.ranking import (
+    bm25_rerank,
+    bm25_scores,
+    normalize_doi,
+    reciprocal_rank_fusion,
+)
+from mcp_scholar.scholar import search_scholar
+from mcp_scholar.server import multi_search
+
+
+def _paper(paper_id, doi=""):
+    return {"paper_id": paper_id, "doi": doi, "title": paper_id}
+
+
+def test_rrf_merges_and_deduplicates():
+    print("测试倒数排名融合和去重...")
+    merged = reciprocal_rank_fusion(
+        [
+            ("transformer", [_paper("W1"), _paper("W2", "10.1/x"), _paper("W3")]),
+            # W4和W2是同一篇论文的不同OpenAlex记录，通过DOI去重
+            ("attention", [_paper("W3"), _paper("W4", "https://doi.org/10.1/X")]),
+            ("self attention", [_paper("W3")]),
+        ]
+    )
+    merged_ids = [p["paper_id"] for p in merged]
+    assert merged_ids == ["W3", "W2", "W1"]
+    assert merged[1]["matched_queries"] == ["transformer", "attention"]
+    assert merged[0]["matched_queries"] == [
+        "transformer",
+        "attention",
+        "self attention",
+    ]
+    assert merged[0]["rrf_score"] > merged[1]["rrf_score"]
+
+
+def test_rrf_doi_dedup():
+    assert normalize_doi("https://doi.org/10.1/ABC") == "10.1/abc"
+    merged = reciprocal_rank_fusion(
+        [
+            ("a", [_paper("W1", "https://doi.org/10.1/abc")]),
+            ("b", [_paper("W9", "10.1/ABC")]),
+        ],
+        limit=5,
+    )
+    assert len(merged) == 1
+    assert merged[0]["matched_queries"] == ["a", "b"]
+
+
+def test_multi_search_tool(work, install_mock):
+    print("测试多查询搜索工具...")
+    works = {
+        "transformer": [dict(work, id="https://openalex.org/W1")],
+        "attention": [
+            dict(work, id="https://openalex.org/W2", title="Attention", doi="10.1/b"),
+            dict(work, id="https://openalex.org/W1"),
+        ],
+    }
+
+    def handler(request):
+        url = str(request.url)
+        if "/works/doi:" in url:
+            return httpx.Response(404)
+        query = "attention" if "attention" in url.lower() else "transformer"
+        return httpx.Response(200, json={"results": works[query]})
+
+    calls = install_mock(handler)
+    result = asyncio.run(
+        multi_search(None, ["transformer", "Attention", "attention "], count=5)
+    )
+
+    assert result["status"] == "success"
+    assert result["queries"] == ["transformer", "Attention"]
+    papers = {p["paper_id"]: p for p in result["papers"]}
+    assert set(papers) == {"W1", "W2"}
+    assert papers["W1"]["matched_queries"] == ["transformer", "Attention"]
+    assert result["papers"][0]["paper_id"] == "W1"
+    assert len([url for url in calls if "/works/doi:" not in url]) == 2
+
+
+def test_bm25_rerank(monkeypatch):
+    print("测试BM25重排序...")
+    papers = [
+        {"title": "Graph databases", "abstract": "storage engines"},
+        {"title": "Graph attention networks", "abstract": "attention over graphs"},
+        {"title": "Attention", "abstract": "a survey of attention"},
+        {"title": "图神经网络", "abstract": "注意力机制"},
+    ]
+    reranked = bm25_rerank("graph attention", papers, limit=2)
+    assert [p["title"] for p in reranked] == [
+        "Graph attention networks",
+        "Attention",
+    ]
+    assert bm25_rerank("注意力", papers)[0]["title"] == "图神经网络"
+
+    # 没有NumPy时结果相同
+    documents = [f"{p['title']} {p['abstract']}" for p in papers]
+    with_numpy = bm25_scores("graph attention", documents)
+    monkeypatch.setattr(ranking, "optional_numpy", lambda: None)
+    without_numpy = bm25_scores("graph attention", documents)
+    assert with_numpy == pytest.approx(without_numpy)
+    # "graphs"不算命中"graph"
+    assert without_numpy[0] > 0 and without_numpy[3] == 0
+
+
+def test_bm25_scores_500_candidates_fast():
+    print("测试500篇候选论文的BM25打分耗时...")
+    words = [f"w{i}" for i in range(3000)] + ["graph", "attention"]
+    rng = random.Random(0)
+    papers = [
+        {
+            "title": " ".join(rng.choices(words, k=12)),
+            "abstract": " ".join(rng.choices(words, k=200)),
+        }
+        for _ in range(500)
+    ]
+    bm25_rerank("graph attention networks", papers)
+    started = time.perf_counter()
+    bm25_rerank("graph attention networks", papers, limit=10)
+    # 目标是个位数毫秒，这里留出余量避免在慢机器上误报
+    assert time.perf_counter() - started < 0.05
+
+
+def test_search_rerank_fetches_larger_pool(monkeypatch, work, install_mock):
+    print("测试重排序时获取更大的候选集...")
+    works = [
+        dict(work, id="https://openalex.org/W1", title="Unrelated title", doi=None),
+        dict(work, id="https://openalex.org/W2", title="Graph attention", doi=None),
+    ]
+    calls = install_mock(lambda request: httpx.Response(200, json={"results": works}))
+    monkeypatch.setenv("MCP_SCHOLAR_RERANK_POOL", "50")
+
+    results = asyncio.run(search_scholar("graph attention", 1, rerank=True))
+
+    assert [p["paper_id"] for p in results] == ["W2"]
+    assert "per_page=50" in calls[0]
@@ -0,0 +1,185 @@
+import asyncio
+import time
+import httpx
+import pytest
+from mcp_scholar import deadline
+from mcp_scholar.deadline import DeadlineExceeded
+from mcp_scholar.metrics import metrics
+from mcp_scholar.scheduler import BACKGROUND, AimdWindow, Scheduler, parse_weights
+from mcp_scholar.upstream import RateLimiter
+
+
+def _scheduler(concurrency=1, weights=None, rate=0):
+    limiter = RateLimiter(rate)
+    return Scheduler(lambda: limiter, concurrency=concurrency, weights=weights)
+
+
+def _recorder(order, name, seconds=0.01):
+    async def send():
+        await asyncio.sleep(seconds)
+        order.append(name)
+        return name
+
+    return send
+
+
+def test_sessions_share_fairly():
+    print("测试不同会话的上游请求公平排队...")
+    order = []
+
+    async def run():
+        scheduler = _scheduler(weights=parse_weights("heavy=1,light=1,bad=x"))
+        jobs = [
+            scheduler.request(_recorder(order, f"heavy{i}"), session="heavy")
+            for i in range(6)
+        ]
+        jobs += [
+            scheduler.request(_recorder(order, f"light{i}"), session="light")
+            for i in range(2)
+        ]
+        return await asyncio.gather(*jobs)
+
+    asyncio.run(run())
+    # 后到的会话不用等前一个会话的所有请求执行完
+    assert order[:4] == ["heavy0", "light0", "heavy1", "light1"]
+    assert len(order) == 8
+
+
+def test_session_weights():
+    order = []
+
+    async def run():
+        scheduler = _scheduler(weights={"gold": 2})
+        jobs = [
+            scheduler.request(_recorder(order, f"gold{i}"), session="gold")
+            for i in range(4)
+        ]
+        jobs += [
+            scheduler.request(_recorder(order, f"free{i}"), session="free")
+            for i in range(4)
+        ]
+        await asyncio.gather(*jobs)
+
+    asyncio.run(run())
+    # 权重为2的会话分得两倍的名额
+    assert sum(name.startswith("gold") for name in order[:6]) == 4
+
+
+def test_interactive_preempts_background():
+    print("测试交互请求抢占后台请求...")
+    metrics.reset()
+    order = []
+    attempts = []
+
+    async def slow_background():
+        attempts.append("bulk")
+        await asyncio.sleep(0.3)
+        order.append("bulk")
+        return "bulk"
+
+    async def run():
+        scheduler = _scheduler(concurrency=1)
+        bulk = asyncio.ensure_future(
+            scheduler.request(slow_background, priority=BACKGROUND)
+        )
+        await asyncio.sleep(0.05)
+        queued_bulk = asyncio.ensure_future(
+            scheduler.request(_recorder(order, "bulk2"), priority=BACKGROUND)
+        )
+        await asyncio.sleep(0)
+        interactive = await scheduler.request(_recorder(order, "search"))
+        return interactive, await bulk, await queued_bulk
+
+    results = asyncio.run(run())
+    # 交互请求不用等正在执行的后台请求，被抢占的后台请求重试后仍然完成
+    assert order[0] == "search"
+    assert results == ("search", "bulk", "bulk2")
+    assert attempts == ["bulk", "bulk"]
+    assert metrics.counter("upstream.preempted") == 1
+
+
+def test_interactive_gets_tokens_first():
+    order = []
+
+    async def run():
+        scheduler = _scheduler(concurrency=4, rate=20)
+        scheduler._get_limiter()._tokens = 0
+        jobs = [
+            scheduler.request(_recorder(order, f"bulk{i}", 0), priority=BACKGROUND)
+            for i in range(2)
+        ]
+        jobs.append(scheduler.request(_recorder(order, "search", 0)))
+        await asyncio.gather(*jobs)
+
+    asyncio.run(run())
+    assert order[0] == "search"
+
+
+def test_queue_wait_respects_budget():
+    async def run():
+        scheduler = _scheduler(concurrency=1)
+        blocker = asyncio.ensure_future(scheduler.request(_recorder([], "slow", 1)))
+        await asyncio.sleep(0)
+        with deadline.budget(0.1):
+            with pytest.raises(DeadlineExceeded):
+                await scheduler.request(
+                    _recorder([], "late"), timeout=deadline.remaining
+                )
+        await blocker
+        return scheduler.stats()
+
+    stats = asyncio.run(run())
+    assert stats == {
+        "window": 1,
+        "running": 0,
+        "queued_interactive": 0,
+        "queued_background": 0,
+    }
+
+
+def test_aimd_window():
+    print("测试并发窗口的加性增、乘性减...")
+    window = AimdWindow(minimum=2, maximum=16)
+    assert window.limit == 8
+    now = time.monotonic()
+    # 窗口用满时每轮加1
+    for _ in range(9):
+        window.on_success(0.1, now, in_flight=8)
+    assert window.limit == 9
+    # 窗口没用满时不增大
+    window.on_success(0.1, now, in_flight=1)
+    assert window.limit == 9
+
+    window.on_congestion("throttled", time.monotonic())
+    assert window.limit == 4
+    # 同一轮内更早发出的请求不会让窗口再次缩小
+    window.on_congestion("throttled", now)
+    assert window.limit == 4
+    # 延迟远高于基线时温和地缩小
+    window.on_success(2.0, time.monotonic(), in_flight=4)
+    assert window.limit == 3
+    for _ in range(5):
+        window.on_congestion("timeout", time.monotonic())
+    assert window.limit == 2
+    assert metrics.snapshot()["gauges"]["upstream.concurrency_window"] == 2
+
+
+def test_throttling_shrinks_scheduler_window():
+    async def run():
+        scheduler = _scheduler(concurrency=8)
+
+        async def throttled():
+            return httpx.Response(429)
+
+        async def timed_out():
+            raise httpx.ReadTimeout("timeout")
+
+        await scheduler.request(throttled)
+        after_throttle = scheduler.window.limit
+        await asyncio.sleep(0.01)
+        with pytest.raises(httpx.ReadTimeout):
+            await scheduler.request(timed_out)
+        return after_throttle, scheduler.stats()["window"]
+
+    after_throttle, after_timeout = asyncio.run(run())
+    assert after_throttle == 2 and after_timeout == 1
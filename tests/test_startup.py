@@ -0,0 +1,120 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+# 冷启动预算（秒）：从启动进程到收到initialize响应，慢速CI可通过环境变量放宽
+STARTUP_BUDGET = float(os.environ.get("MCP_SCHOLAR_STARTUP_BUDGET", "3.0"))
+
+INITIALIZE_REQUEST = {
+    "jsonrpc": "2.0",
+    "id": 1,
+    "method": "initialize",
+    "params": {
+        "protocolVersion": "2024-11-05",
+        "capabilities": {},
+        "clientInfo": {"name": "startup-test", "version": "0.0.0"},
+    },
+}
+
+
+def _run_python(code, cwd):
+    return subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+
+
+def test_package_import_is_lazy(tmp_path):
+    print("测试导入包时不加载服务模块...")
+    result = _run_python(
+        "import sys, mcp_scholar; "
+        "print(sorted(m for m in ('mcp_scholar.server', 'mcp', 'httpx', 'dotenv') "
+        "if m in sys.modules))",
+        tmp_path,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]"
+
+
+def test_scholar_import_has_no_side_effects(tmp_path):
+    print("测试导入scholar模块时不读取配置...")
+    result = _run_python(
+        "import sys, logging, mcp_scholar.scholar; "
+        "print('dotenv' in sys.modules, logging.getLogger().handlers)",
+        tmp_path,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "False []"
+    assert result.stderr == ""
+
+
+def test_server_import_skips_optional_subsystems(tmp_path):
+    print("测试导入服务模块时不加载可选子系统...")
+    result = _run_python(
+        "import sys, mcp_scholar.server; "
+        "print(sorted(m for m in ('mcp_scholar.export', 'mcp_scholar.coauthors', "
+        "'mcp_scholar.workers', 'mcp_scholar.watch', 'mcp_scholar.health', "
+        "'mcp_scholar.monitor', 'pyarrow') if m in sys.modules))",
+        tmp_path,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]"
+
+
+def test_time_to_initialize_response(tmp_path):
+    print("测试冷启动到initialize响应的耗时...")
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-c", "from mcp_scholar import cli_main; cli_main()"],
+        cwd=tmp_path,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    try:
+        proc.stdin.write(json.dumps(INITIALIZE_REQUEST) + "\n")
+        proc.stdin.flush()
+        line = proc.stdout.readline()
+        elapsed = time.perf_counter() - start
+    finally:
+        proc.kill()
+        proc.wait()
+
+    print(f"冷启动耗时: {elapsed:.3f}s (预算 {STARTUP_BUDGET}s)")
+    response = json.loads(line)
+    assert response["id"] == 1
+    assert response["result"]["serverInfo"]["name"] == "ScholarServer"
+    assert elapsed < STARTUP_BUDGET
+
+
+def test_server_main_exit_code_on_failure():
+    print("测试网络服务启动失败时返回非零退出码...")
+    from mcp_scholar.server import main
+
+    # SSE只支持单个工作进程
+    assert main(["--transport", "sse", "--workers", "2"]) == 1
+
+
+def test_stdio_exit_code_and_debug(monkeypatch):
+    print("测试STDIO服务启动失败时返回非零退出码，调试模式默认关闭...")
+    from mcp_scholar import server
+
+    def fail():
+        raise RuntimeError("stdio unavailable")
+
+    monkeypatch.setattr(server.mcp, "run", fail)
+    monkeypatch.delenv("MCP_SCHOLAR_DEBUG", raising=False)
+    assert server.cli_main() == 1
+    assert server.mcp.settings.debug is False
+
+    monkeypatch.setattr(server.mcp, "run", lambda: None)
+    monkeypatch.setenv("MCP_SCHOLAR_DEBUG", "1")
+    assert server.cli_main() == 0
+    assert server.mcp.settings.debug is True
+    server.mcp.settings.debug = False
@@ -0,0 +1,299 @@
+import asyncio
+import json
+import os
+import random
+import time
+import httpx
+from mcp_scholar import store
+from mcp_scholar.scholar import get_paper_detail, parse_profile, search_scholar
+from mcp_scholar.store import WorkStore
+
+CONCEPTS = [{"display_name": "Transformer", "score": 0.9}]
+
+
+def test_put_get_and_reopen(tmp_path, make_work):
+    print("测试原始work记录的写入、读取和重新打开...")
+    path = str(tmp_path / "works.dat")
+    works = WorkStore(path)
+    assert works.put_many([make_work(1), make_work(2, concepts=CONCEPTS)]) == 2
+    # 内容没有变化时不重复写入
+    assert works.put_many([make_work(1)]) == 0
+    size = os.path.getsize(path)
+    assert works.put_many([make_work(1, cited_by_count=200)]) == 1
+    assert os.path.getsize(path) > size
+
+    assert works.get("W1")["cited_by_count"] == 200
+    assert works.get("W2")["concepts"] == CONCEPTS
+    assert works.get("W3") is None
+    assert works.get("W1", max_age=-1) is None
+
+    # 另一个实例（例如另一个工作进程）扫描记录头重建索引
+    other = WorkStore(path)
+    assert len(other) == 2 and other.get("W1")["cited_by_count"] == 200
+    works.put_many([make_work(3)])
+    assert other.get("W3")["title"] == "Paper 3"
+
+
+def test_truncated_tail_recovered(tmp_path, make_work):
+    path = str(tmp_path / "works.dat")
+    WorkStore(path).put_many([make_work(1)])
+    with open(path, "ab") as f:
+        f.write(b"\x02\x02\x00")
+
+    works = WorkStore(path)
+    assert works.put_many([make_work(2)]) == 1
+    assert works.get("W1")["title"] == "Paper 1"
+    assert WorkStore(path).get("W2")["title"] == "Paper 2"
+
+
+def test_zlib_fallback_and_size(monkeypatch, tmp_path, make_work):
+    print("测试没有zstandard时使用zlib，以及压缩后的大小...")
+    monkeypatch.setattr(store, "zstandard", None)
+    works = WorkStore(str(tmp_path / "works.dat"))
+    assert works.stats()["codec"] == "zlib"
+
+    rng = random.Random(0)
+    words = [f"word{i}" for i in range(500)]
+    batch = [
+        make_work(
+            i,
+            abstract_inverted_index={
+                w: [j] for j, w in enumerate(rng.sample(words, 150))
+            },
+            concepts=CONCEPTS,
+        )
+        for i in range(2000)
+    ]
+    started = time.perf_counter()
+    works.put_many(batch)
+    for i in range(0, 2000, 7):
+        assert works.get(f"W{i}")["title"] == f"Paper {i}"
+    assert time.perf_counter() - started < 5
+    raw = sum(len(json.dumps(w).encode()) for w in batch)
+    assert works.stats()["bytes"] < raw / 2
+
+
+def test_detail_reuses_search_payload(tmp_path, make_work, install_mock):
+    print("测试论文详情直接使用搜索时保存的原始记录...")
+    store.set_store(WorkStore(str(tmp_path / "works.dat")))
+    work = make_work(
+        7, concepts=CONCEPTS, open_access={"oa_url": "https://example.org/7.pdf"}
+    )
+    calls = install_mock(lambda request: httpx.Response(200, json={"results": [work]}))
+
+    async def run():
+        await search_scholar("paper", 1)
+        searched = len(calls)
+        detail = await get_paper_detail("W7")
+        return searched, detail
+
+    searched, detail = asyncio.run(run())
+    store.set_store(None)
+
+    assert len(calls) == searched
+    assert detail["concepts"] == "Transformer"
+    assert detail["pdf_url"] == "https://example.org/7.pdf"
+
+
+def _age_records(monkeypatch, works, seconds):
+    """以seconds秒之前的获取时间写入记录"""
+    real_time = time.time
+    monkeypatch.setattr(time, "time", lambda: real_time() - seconds)
+    works_store = store.get_store()
+    works_store.put_many(works)
+    monkeypatch.setattr(time, "time", real_time)
+    return works_store
+
+
+def test_patch_keeps_static_fetch_time(monkeypatch, tmp_path, work, make_work):
+    print("测试只合并易变字段，静态字段的获取时间不变...")
+    store.set_store(WorkStore(str(tmp_path / "works.dat")))
+    works = _age_records(
+        monkeypatch, [make_work(1, concepts=CONCEPTS), make_work(2)], 7200
+    )
+    fetched_at = works.get_entry("W1").fetched_at
+    assert works.stale_keys(None, 86400, 3600) == ["W1", "W2"]
+
+    patch = {"id": "https://openalex.org/W1", "cited_by_count": 321}
+    assert works.patch_many([patch, {"id": "W9", "cited_by_count": 1}]) == 1
+    assert works.get("W1")["cited_by_count"] == 321
+    assert works.get("W1")["concepts"] == CONCEPTS
+    assert works.get_entry("W1").fetched_at == fetched_at
+    # 引用量没有变化时不算作更新，但记下刷新时间
+    unchanged = {"id": "W2", "cited_by_count": work["cited_by_count"]}
+    assert works.patch_many([unchanged]) == 0
+    assert works.stale_keys(None, 86400, 3600) == []
+    # 静态字段过期的记录需要整条重新获取，不参与刷新
+    assert works.stale_keys(None, 3600, 0) == []
+    store.set_store(None)
+
+
+def test_refresh_time_survives_reopen(monkeypatch, tmp_path, work, make_work):
+    print("测试易变字段的刷新时间在重新打开存储后仍然有效...")
+    path = str(tmp_path / "works.dat")
+    store.set_store(WorkStore(path))
+    works = _age_records(monkeypatch, [make_work(1), make_work(2)], 7200)
+    fetched_at = works.get_entry("W1").fetched_at
+    unchanged = {"id": "W1", "cited_by_count": work["cited_by_count"]}
+    changed = {"id": "W2", "cited_by_count": 99}
+    assert works.patch_many([unchanged, changed]) == 1
+    store.set_store(None)
+
+    # 模拟定时任务的下一次运行：新进程只能从文件中得到刷新时间
+    reopened = WorkStore(path)
+    assert reopened.stale_keys(None, 86400, 3600) == []
+    assert reopened.get_entry("W1").fetched_at == fetched_at
+    assert reopened.refreshed_at("W1") > fetched_at
+    assert reopened.get("W2")["cited_by_count"] == 99
+    reopened.close()
+
+
+def test_detail_refreshes_stale_citations(
+    monkeypatch, tmp_path, make_work, install_mock
+):
+    print("测试论文详情只刷新过期的引用量...")
+    monkeypatch.setenv("MCP_SCHOLAR_WORK_STORE_VOLATILE_TTL", "3600")
+    store.set_store(WorkStore(str(tmp_path / "works.dat")))
+    _age_records(monkeypatch, [make_work(7, concepts=CONCEPTS)], 7200)
+    counts = [{"year": 2024, "cited_by_count": 40}]
+    calls = install_mock(
+        lambda request: httpx.Response(
+            200,
+            json={
+                "results": [
+                    {
+                        "id": "https://openalex.org/W7",
+                        "cited_by_count": 555,
+                        "counts_by_year": counts,
+                    }
+                ]
+            },
+        ),
+    )
+
+    async def run():
+        return await get_paper_detail("W7"), await get_paper_detail("W7")
+
+    first, second = asyncio.run(run())
+    saved = store.get_store().get("W7")
+    store.set_store(None)
+
+    assert len(calls) == 1
+    assert "filter=openalex:W7" in calls[0]
+    assert "select=id,cited_by_count,counts_by_year" in calls[0]
+    assert first["citations"] == second["citations"] == 555
+    assert first["concepts"] == "Transformer"
+    assert saved["counts_by_year"] == counts
+
+
+def test_refresh_stale_batches_ids(monkeypatch, tmp_path, make_work, install_mock):
+    print("测试批量刷新引用量，每个请求最多50个ID...")
+    from mcp_scholar.refresh import refresh_stale
+
+    monkeypatch.setenv("MCP_SCHOLAR_WORK_STORE_VOLATILE_TTL", "3600")
+    monkeypatch.setenv("MCP_SCHOLAR_WORK_STORE_COMPACT_RATIO", "0.3")
+    store.set_store(WorkStore(str(tmp_path / "works.dat")))
+    _age_records(monkeypatch, [make_work(i) for i in range(120)], 7200)
+
+    def handler(request):
+        ids = request.url.params["filter"].removeprefix("openalex:").split("|")
+        return httpx.Response(
+            200,
+            json={"results": [{"id": key, "cited_by_count": 1} for key in ids]},
+        )
+
+    calls = install_mock(handler)
+    result = asyncio.run(refresh_stale())
+    works = store.get_store()
+    store.set_store(None)
+
+    assert result["stale"] == 120 and result["refreshed"] == 120
+    assert len(calls) == 3
+    assert works.get("W119")["cited_by_count"] == 1
+    assert works.stale_keys(None, 86400, 3600) == []
+    # 每条记录都被新记录取代，约一半的字节无用，超过比例后压缩了数据文件
+    assert result["compacted"] > 0 and works.stats()["dead_bytes"] == 0
+
+
+def test_unchanged_refresh_and_compact(monkeypatch, tmp_path, work, make_work):
+    print("测试引用量没变时只追加刷新标记，以及压缩数据文件...")
+    path = str(tmp_path / "works.dat")
+    store.set_store(WorkStore(path))
+    works = _age_records(monkeypatch, [make_work(i) for i in range(20)], 7200)
+    other = WorkStore(path)
+    size = os.path.getsize(path)
+    unchanged = [
+        {"id": f"W{i}", "cited_by_count": work["cited_by_count"]} for i in range(20)
+    ]
+    for _ in range(3):
+        assert works.patch_many(unchanged) == 0
+    # 每条刷新标记只有几十字节，不重复写入整条记录
+    assert os.path.getsize(path) - size < 3 * 20 * 40
+    assert works.stale_keys(None, 86400, 3600) == []
+
+    works.patch_many([{"id": "W3", "cited_by_count": 7}])
+    assert works.stats()["dead_bytes"] > 0
+    assert works.compact() > 0
+    assert works.stats()["dead_bytes"] == 0
+    assert os.path.getsize(path) < size + 200
+    assert works.get("W3")["cited_by_count"] == 7
+    assert works.stale_keys(None, 86400, 3600) == []
+    # 压缩前打开的实例发现文件被替换，重新扫描后照常读写
+    assert other.get("W3")["cited_by_count"] == 7
+    other.put_many([make_work(20)])
+    assert works.get("W20")["title"] == "Paper 20"
+    reopened = WorkStore(path)
+    assert len(reopened) == 21 and reopened.stale_keys(None, 86400, 3600) == []
+    other.close()
+    reopened.close()
+    store.set_store(None)
+
+
+def test_projected_record_keeps_full_record(tmp_path, make_work, install_mock):
+    print("测试列表请求的部分记录不覆盖完整记录...")
+    path = str(tmp_path / "works.dat")
+    store.set_store(WorkStore(path))
+    full = make_work(5, concepts=CONCEPTS, referenced_works=["W1", "W2"])
+    listed = [make_work(5, cited_by_count=999), make_work(6)]
+    calls = install_mock(
+        lambda request: httpx.Response(
+            200,
+            json=full if request.url.path == "/works/W5" else {"results": listed},
+        ),
+    )
+
+    async def run():
+        await get_paper_detail("W5")
+        await search_scholar("paper", 2)
+
+    asyncio.run(run())
+    store.set_store(None)
+
+    works = WorkStore(path)
+    assert "select=" in calls[1]
+    assert works.get("W5")["referenced_works"] == ["W1", "W2"]
+    assert works.get_entry("W5").projected is False
+    # 没有完整记录时仍保存部分记录
+    assert works.get_entry("W6").projected is True
+
+
+def test_profile_papers_use_shared_parser(tmp_path, make_work, install_mock):
+    print("测试学者论文与搜索共用解析并写入本地存储...")
+    store.set_store(WorkStore(str(tmp_path / "works.dat")))
+    venue = {"source": {"display_name": "NeurIPS"}}
+    install_mock(
+        lambda request: httpx.Response(
+            200,
+            json=(
+                {"id": "https://openalex.org/A1"}
+                if request.url.path.startswith("/authors/")
+                else {"results": [make_work(8, primary_location=venue)]}
+            ),
+        ),
+    )
+    papers = asyncio.run(parse_profile("A1", top_n=1))
+    works = store.get_store()
+    store.set_store(None)
+
+    assert papers[0]["paper_id"] == "W8" and papers[0]["venue"] == "NeurIPS"
+    assert works.get_entry("W8").projected is True
@@ -0,0 +1,95 @@
+import asyncio
+import json
+from mcp_scholar import tracing
+from mcp_scholar.tracing import JsonlExporter, OtlpHttpExporter, Span, traced
+
+
+class ListExporter:
+    """收集导出span的测试用导出器"""
+
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+
+def test_nested_spans_share_trace():
+    print("测试嵌套span...")
+    exporter = ListExporter()
+    tracer = tracing.configure(exporter, sample_rate=1.0)
+
+    @traced("scholar.fake")
+    async def fake_scholar():
+        with tracing.span("http.get", url_template="/works") as span:
+            span.set_attributes(status_code=200, response_bytes=10)
+        with tracing.span("parse.json"):
+            pass
+
+    async def fake_tool():
+        with tracing.span("tool.fake"):
+            await asyncio.gather(fake_scholar(), fake_scholar())
+
+    asyncio.run(fake_tool())
+    tracer.flush()
+    tracing.configure(None)
+
+    by_name = {}
+    for span in exporter.spans:
+        by_name.setdefault(span.name, []).append(span)
+
+    root = by_name["tool.fake"][0]
+    assert root.parent_id is None
+    assert len(by_name["scholar.fake"]) == 2
+    assert all(s.parent_id == root.span_id for s in by_name["scholar.fake"])
+    assert all(s.trace_id == root.trace_id for s in exporter.spans)
+    http_span = by_name["http.get"][0]
+    assert http_span.attributes["status_code"] == 200
+    assert http_span.parent_id in {s.span_id for s in by_name["scholar.fake"]}
+
+
+def test_unsampled_traces_are_not_exported():
+    print("测试采样率为0时不导出...")
+    exporter = ListExporter()
+    tracer = tracing.configure(exporter, sample_rate=0.0)
+
+    with tracing.span("tool.fake") as root:
+        with tracing.span("http.get") as child:
+            child.set_attribute("status_code", 200)
+
+    tracer.flush()
+    tracing.configure(None)
+    assert root is tracing.NOOP_SPAN
+    assert exporter.spans == []
+
+
+def test_error_recorded_on_span():
+    exporter = ListExporter()
+    tracer = tracing.configure(exporter)
+    try:
+        with tracing.span("tool.fail"):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    tracer.flush()
+    tracing.configure(None)
+    assert exporter.spans[0].error == "ValueError: boom"
+
+
+def test_jsonl_and_otlp_encoding(tmp_path):
+    span = Span("http.get", "a" * 32, "b" * 16)
+    span.set_attributes(url_template="/works/{paper_id}", status_code=200)
+    span.end_ns = span.start_ns + 1_000_000
+
+    path = tmp_path / "traces.jsonl"
+    JsonlExporter(str(path)).export([span])
+    record = json.loads(path.read_text(encoding="utf-8").strip())
+    assert record["name"] == "http.get"
+    assert record["duration_ms"] == 1.0
+
+    payload = json.loads(OtlpHttpExporter("http://localhost")._encode([span]))
+    otlp_span = payload["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert otlp_span["parentSpanId"] == "b" * 16
+    assert {"key": "status_code", "value": {"intValue": "200"}} in otlp_span[
+        "attributes"
+    ]
@@ -0,0 +1,55 @@
+import asyncio
+import httpx
+from mcp_scholar.server import research_trends
+
+GROUPS = {
+    "publication_year": [
+        {"key": "2023", "key_display_name": "2023", "count": 40},
+        {"key": "2020", "key_display_name": "2020", "count": 10},
+        {"key": "2021", "key_display_name": "2021", "count": 25},
+    ],
+    "primary_location.source.id": [
+        {"key": "https://openalex.org/S1", "key_display_name": "NeurIPS", "count": 30},
+        {"key": "https://openalex.org/S2", "key_display_name": "ICML", "count": 20},
+        {"key": "unknown", "key_display_name": "unknown", "count": 25},
+    ],
+}
+
+
+def _handler(request):
+    field = request.url.params["group_by"]
+    return httpx.Response(
+        200, json={"meta": {"count": 75}, "group_by": GROUPS.get(field, [])}
+    )
+
+
+def test_trends_histograms(install_mock):
+    print("测试按年份和期刊统计论文分布...")
+    calls = install_mock(_handler)
+
+    result = asyncio.run(
+        research_trends(None, "graph neural", year_start=2019, top_n=1)
+    )
+
+    assert result["status"] == "success" and result["total_works"] == 75
+    # 缺少的年份补0，起始年份不早于有数据的第一年
+    assert result["histograms"]["year"] == {
+        "2020": 10,
+        "2021": 25,
+        "2022": 0,
+        "2023": 40,
+    }
+    assert result["histograms"]["venue"] == [
+        {"id": "S1", "name": "NeurIPS", "count": 30}
+    ]
+    # 每个维度一个小请求，查询和年份过滤与搜索相同
+    assert len(calls) == 2
+    assert all(
+        "filter=title.search:graph+neural,publication_year:%3E2018" in url
+        for url in calls
+    )
+
+
+def test_trends_rejects_unknown_dimension():
+    result = asyncio.run(research_trends(None, "graph", dimensions=["author"]))
+    assert result["status"] == "error"
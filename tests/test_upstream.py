@@ -0,0 +1,118 @@
+import asyncio
+import time
+import httpx
+from mcp_scholar.cache import ResponseCache
+from mcp_scholar.scholar import search_scholar
+from mcp_scholar.upstream import RateLimiter, SharedRateLimiter
+
+
+def test_search_uses_cache(work, install_mock):
+    print("测试上游响应缓存...")
+    calls = install_mock(lambda request: httpx.Response(200, json={"results": [work]}))
+
+    async def run():
+        first = await search_scholar("attention", 1)
+        second = await search_scholar("attention", 1)
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first == second
+    assert first[0]["title"] == "Attention Is All You Need"
+    assert first[0]["abstract"] == "The dominant models"
+    # 搜索请求和DOI摘要补全请求各只发出一次
+    assert len(calls) == 2
+
+
+def test_disk_cache_shared_between_instances(tmp_path):
+    print("测试磁盘缓存在多个实例间共享...")
+    path = str(tmp_path / "cache.sqlite")
+
+    async def run():
+        writer = ResponseCache(path=path)
+        await writer.set("https://api.openalex.org/works/W1", 200, "json", b"{}")
+        reader = ResponseCache(path=path)
+        return await reader.get("https://api.openalex.org/works/W1")
+
+    entry = asyncio.run(run())
+    assert entry is not None and entry.body == b"{}"
+
+
+def test_rate_limiter_spaces_requests():
+    limiter = RateLimiter(rate=20, burst=1)
+
+    async def run():
+        start = time.monotonic()
+        for _ in range(5):
+            await limiter.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) >= 0.18
+
+
+def test_shared_rate_limiter_budget(tmp_path):
+    print("测试跨进程共享的速率预算...")
+    path = str(tmp_path / "rate_limit")
+    # 两个实例模拟两个工作进程，共享同一个令牌桶
+    first = SharedRateLimiter(path, rate=1, burst=2)
+    second = SharedRateLimiter(path, rate=1, burst=2)
+    assert first._take() == 0
+    assert second._take() == 0
+    assert first._take() > 0.5
+
+
+def test_shared_rate_limiter_does_not_block_on_lock(tmp_path):
+    print("测试共享速率预算的文件锁被占用时不阻塞...")
+    import fcntl
+    import os
+
+    path = str(tmp_path / "rate_limit")
+    limiter = SharedRateLimiter(path, rate=1, burst=2)
+    # 另一个打开的文件描述符持有锁，模拟其他进程正在更新状态
+    other = os.open(path, os.O_RDWR)
+    fcntl.flock(other, fcntl.LOCK_EX)
+    try:
+        started = time.monotonic()
+        assert limiter._take() == SharedRateLimiter.LOCK_RETRY
+        assert time.monotonic() - started < 0.5
+    finally:
+        fcntl.flock(other, fcntl.LOCK_UN)
+        os.close(other)
+    # 锁被占用时没有取走令牌，桶内仍有两个
+    assert limiter._take() == 0
+    assert limiter._take() == 0
+    assert limiter._take() > 0.5
+
+
+def test_cancellation_reaches_concurrent_enrichment(make_work, install_mock):
+    print("测试取消工具调用会取消并发的摘要补全请求...")
+    from mcp_scholar.metrics import metrics
+    from mcp_scholar.server import scholar_search
+
+    works = [make_work(i, doi=f"10.1/{i}") for i in range(3)]
+
+    async def handler(request):
+        if "/works/doi:" in str(request.url):
+            # 补全请求一直挂起，直到被取消
+            await asyncio.sleep(30)
+        return httpx.Response(200, json={"results": works})
+
+    install_mock(handler)
+    metrics.reset()
+
+    async def run():
+        task = asyncio.create_task(scholar_search(None, "attention", 3))
+        await asyncio.sleep(0.2)
+        started = time.monotonic()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return time.monotonic() - started
+
+    elapsed = asyncio.run(run())
+
+    assert elapsed < 1
+    assert metrics.counter("tool.cancelled", tool="scholar_search") == 1
+    assert metrics.counter("upstream.cancelled") == 3
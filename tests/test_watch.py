@@ -0,0 +1,128 @@
+import asyncio
+import json
+from datetime import timedelta
+import httpx
+from mcp_scholar import watch
+from mcp_scholar.scholar import build_search_url
+from mcp_scholar.server import watch_check, watch_delete, watch_list, watch_save
+from mcp_scholar.watch import WatchStore
+
+
+def test_search_url_single_filter():
+    print("测试搜索URL把所有过滤条件合并到一个filter参数...")
+    url = build_search_url(
+        "graph neural",
+        10,
+        sort_by="date",
+        year_start=2020,
+        year_end=2023,
+        filters=["from_publication_date:2024-01-01"],
+    )
+    assert url.count("filter=") == 1
+    assert (
+        "filter=title.search:graph+neural,publication_year:>2019,"
+        "publication_year:<2024,from_publication_date:2024-01-01" in url
+    )
+    assert url.endswith("&sort=publication_date:desc")
+
+    fuzzy = build_search_url("graph", 5, fuzzy_search=True)
+    assert "?search=graph" in fuzzy and "filter=" not in fuzzy
+
+
+def test_watch_returns_only_new_papers(tmp_path, make_work, install_mock):
+    print("测试保存的查询只返回新论文...")
+    watch.set_store(WatchStore(str(tmp_path / "watches.json")))
+    feed = {"results": [make_work(1), make_work(2)], "meta": {"next_cursor": None}}
+    calls = install_mock(lambda request: httpx.Response(200, json=feed))
+
+    async def run():
+        saved = await watch_save(None, "gnn", "graph neural", backfill_days=7)
+        first = await watch_check(None, "gnn")
+        feed["results"] = [make_work(3), make_work(1), make_work(2)]
+        second = await watch_check(None, "gnn")
+        listed = await watch_list(None)
+        return saved, first, second, listed
+
+    saved, first, second, listed = asyncio.run(run())
+
+    today = watch._today()
+    assert saved["watch"]["since"] == (today - timedelta(days=7)).isoformat()
+    assert [p["paper_id"] for p in first["new_papers"]] == ["W1", "W2"]
+    assert [p["paper_id"] for p in second["new_papers"]] == ["W3"]
+    # 第二次检查从上次检查日期往前回看3天，而不是从头开始
+    assert second["since"] == (today - timedelta(days=3)).isoformat()
+    assert f"from_publication_date:{second['since']}" in calls[1]
+    # 检查不使用响应缓存，每次检查只有一个小请求
+    assert len(calls) == 2 and second["requests"] == 1
+    assert listed["watches"][0]["seen_count"] == 3
+
+    state = json.loads((tmp_path / "watches.json").read_text(encoding="utf-8"))
+    assert state["gnn"]["last_checked"] == today.isoformat()
+    watch.set_store(None)
+
+
+def test_watch_pagination_and_delete(monkeypatch, tmp_path, make_work, install_mock):
+    print("测试保存的查询翻页和删除...")
+    watch.set_store(WatchStore(str(tmp_path / "watches.json")))
+    monkeypatch.setattr(watch, "PAGE_SIZE", 2)
+    monkeypatch.setenv("MCP_SCHOLAR_WATCH_MAX_PAGES", "2")
+    pages = {
+        "*": {"results": [make_work(1), make_work(2)], "meta": {"next_cursor": "c2"}},
+        "c2": {"results": [make_work(3), make_work(4)], "meta": {"next_cursor": "c3"}},
+    }
+
+    def handler(request):
+        return httpx.Response(200, json=pages[request.url.params["cursor"]])
+
+    install_mock(handler)
+
+    async def run():
+        await watch_save(None, "gnn", "graph neural")
+        result = await watch_check(None, "gnn")
+        deleted = await watch_delete(None, "gnn")
+        missing = await watch_check(None, "gnn")
+        return result, deleted, missing
+
+    result, deleted, missing = asyncio.run(run())
+    watch.set_store(None)
+
+    assert result["total_new"] == 4 and result["requests"] == 2
+    assert result["truncated"] is True
+    assert deleted["status"] == "success"
+    assert missing["status"] == "error"
+
+
+def test_truncated_check_resumes(monkeypatch, tmp_path, make_work, install_mock):
+    print("测试被页数上限截断的检查在下一次继续取完剩下的论文...")
+    watch.set_store(WatchStore(str(tmp_path / "watches.json")))
+    monkeypatch.setattr(watch, "PAGE_SIZE", 2)
+    monkeypatch.setenv("MCP_SCHOLAR_WATCH_MAX_PAGES", "2")
+    pages = {
+        "*": {"results": [make_work(1), make_work(2)], "meta": {"next_cursor": "c2"}},
+        "c2": {"results": [make_work(3), make_work(4)], "meta": {"next_cursor": "c3"}},
+        "c3": {"results": [make_work(5)], "meta": {"next_cursor": None}},
+    }
+    calls = install_mock(
+        lambda request: httpx.Response(200, json=pages[request.url.params["cursor"]])
+    )
+
+    async def run():
+        await watch_save(None, "gnn", "graph neural", backfill_days=30)
+        first = await watch_check(None, "gnn")
+        pending = (await watch_list(None))["watches"][0]
+        second = await watch_check(None, "gnn")
+        listed = await watch_list(None)
+        return first, pending, second, listed
+
+    first, pending, second, listed = asyncio.run(run())
+    watch.set_store(None)
+
+    assert first["truncated"] is True and first["total_new"] == 4
+    # 截断时不推进检查日期
+    assert pending["pending"] is True and pending["last_checked"] == ""
+    assert [p["paper_id"] for p in second["new_papers"]] == ["W5"]
+    assert second["truncated"] is False and second["since"] == first["since"]
+    assert "cursor=c3" in calls[2]
+    state = listed["watches"][0]
+    assert state["pending"] is False
+    assert state["last_checked"] == watch._today().isoformat()
@@ -0,0 +1,78 @@
+import asyncio
+import functools
+import json
+import time
+import httpx
+from mcp_scholar import tracing, workers
+from mcp_scholar.coauthors import _work_coauthors
+from mcp_scholar.metrics import metrics
+from mcp_scholar.scholar import parse_work, search_scholar
+
+
+def _page(make_work, count):
+    works = [make_work(i) for i in range(count)]
+    return json.dumps({"meta": {"next_cursor": "abc"}, "results": works}).encode()
+
+
+def test_large_pages_parsed_in_thread_pool(monkeypatch, make_work, install_mock):
+    print("测试大响应交给解析工作池...")
+    monkeypatch.setenv("MCP_SCHOLAR_PARSE_OFFLOAD_BYTES", "1")
+    workers.set_pool(None)
+    metrics.reset()
+    install_mock(lambda request: httpx.Response(200, content=_page(make_work, 3)))
+    papers = asyncio.run(search_scholar("paper", 3))
+    workers.set_pool(None)
+
+    assert [p["title"] for p in papers] == ["Paper 0", "Paper 1", "Paper 2"]
+    assert metrics.counter("parse.offloaded", pool="thread") == 1
+
+
+def test_small_pages_parsed_inline(make_work):
+    pool = workers.ParsePool("thread", offload_bytes=1 << 20)
+    data, parsed, raw = asyncio.run(
+        pool.parse(_page(make_work, 2), parse_work, keep_raw=True)
+    )
+    assert pool._executor is None
+    assert data == {"meta": {"next_cursor": "abc"}}
+    assert parsed[1]["paper_id"] == "W1" and raw[1]["title"] == "Paper 1"
+
+
+def test_process_pool_returns_compact_records(work, make_work):
+    pool = workers.ParsePool("process", workers=1, offload_bytes=0)
+    parser = functools.partial(_work_coauthors, target="author.id:A1")
+    try:
+        data, parsed, raw = asyncio.run(pool.parse(_page(make_work, 2), parser))
+    finally:
+        pool.shutdown()
+    assert raw is None and data["meta"]["next_cursor"] == "abc"
+    assert parsed[0][0] == work["publication_year"]
+
+
+class _ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+
+def test_thread_pool_spans_stay_in_trace(make_work):
+    print("测试工作线程中的span属于调用方的链路...")
+    exporter = _ListExporter()
+    tracer = tracing.configure(exporter)
+    pool = workers.ParsePool("thread", offload_bytes=0)
+
+    async def run():
+        with tracing.span("tool.fake"):
+            await pool.parse(_page(make_work, 3), parse_work)
+
+    try:
+        asyncio.run(run())
+        tracer.flush()
+    finally:
+        tracing.configure(None)
+        pool.shutdown()
+    names = [span.name for span in exporter.spans]
+    assert "parse.offload" in names and "parse.abstract" in names
+    assert len({span.trace_id for span in exporter.spans}) == 1
+    assert sum(span.parent_id is None for span in exporter.spans) == 1